@@ -0,0 +1,275 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from src.detector import load_config, load_detector_from_config, MODEL_KEY_MAP
+from src.camera_worker import drop_ignored, ensure_dir, RESIZE_DIM
+from src.detection_cache import DetectionCache
+from src.tracker import SortTracker
+
+_END_OF_FILE = None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Audit recorded videos for violations faster than real time and write a per-file timeline.")
+    parser.add_argument("videos", nargs="*", help="Video files or glob patterns (default: the file entries of camera_feeds)")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--model", default=None, choices=sorted(MODEL_KEY_MAP.values()), help="Model key under 'models' (default: detection_model from config)")
+    parser.add_argument("--stride", type=int, default=None, help="Run detection on every Nth frame (default: audit.stride or 5)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Frames per inference batch (default: audit.batch_size or 8)")
+    parser.add_argument("--decoders", type=int, default=None, help="Files decoded in parallel (default: audit.decoders or 4)")
+    parser.add_argument("--output", default=None, help="Output directory (default: audit.output_dir or 'audit')")
+    parser.add_argument("--no-crops", action="store_true", help="Do not save a crop for each violating person")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the detection cache and run the model on every frame")
+    return parser.parse_args()
+
+def resolve_videos(patterns, config):
+    """Expands glob patterns; without any, falls back to the local files listed in camera_feeds."""
+    if not patterns:
+        patterns = [feed for feed in config.get('camera_feeds', []) if isinstance(feed, str) and os.path.isfile(feed)]
+    videos = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        videos.extend(path for path in matches if path not in videos)
+    return videos
+
+class _FileAudit:
+    """Tracker and timeline state for one video file."""
+    def __init__(self, path, output_dir, config, fps, total_frames):
+        self.path = path
+        self.output_dir = output_dir
+        self.fps = fps
+        self.total_frames = total_frames
+        self.tracker = SortTracker.from_config(config)
+        self.processed = 0
+        self.track_classes = {}
+        self.violations = []
+        self.segments = []
+        self.open_segment = None
+
+    def add(self, frame_index, frame, tracked, class_names, save_crops):
+        """Records one processed frame's tracker output in the timeline."""
+        self.processed += 1
+        time_sec = round(frame_index / self.fps, 2)
+        detections = tracked.detections
+        for track_id, class_id in zip(detections.track_ids.tolist(), detections.class_ids.tolist()):
+            self.track_classes[track_id] = class_names.get(class_id, str(class_id))
+
+        new_ids = set(tracked.new_violations)
+        for index in np.flatnonzero(tracked.violations):
+            track_id = int(detections.track_ids[index])
+            if track_id not in new_ids:
+                continue
+            entry = {"track_id": track_id, "time_sec": time_sec, "frame": frame_index,
+                     "confidence": round(float(detections.confs[index]), 3)}
+            if save_crops:
+                x1, y1, x2, y2 = np.clip(detections.boxes[index], 0, None).astype(int)
+                crop = frame[y1:y2, x1:x2]
+                if crop.size:
+                    entry["crop"] = os.path.join("crops", f"track{track_id}_frame{frame_index}.jpg")
+                    cv2.imwrite(os.path.join(self.output_dir, entry["crop"]), crop)
+            self.violations.append(entry)
+
+        # Consecutive processed frames with at least one violating person form a segment
+        violating_ids = detections.track_ids[tracked.violations].tolist()
+        if violating_ids:
+            if self.open_segment is None:
+                self.open_segment = {"start_sec": time_sec, "end_sec": time_sec, "peak_violations": 0, "track_ids": []}
+                self.segments.append(self.open_segment)
+            segment = self.open_segment
+            segment["end_sec"] = time_sec
+            segment["peak_violations"] = max(segment["peak_violations"], len(violating_ids))
+            segment["track_ids"] = sorted(set(segment["track_ids"]) | set(violating_ids))
+        else:
+            self.open_segment = None
+
+    def report(self, stride):
+        tracks_by_class = {}
+        for label in self.track_classes.values():
+            tracks_by_class[label] = tracks_by_class.get(label, 0) + 1
+        return {
+            "source": self.path,
+            "fps": self.fps,
+            "frames": self.total_frames,
+            "duration_sec": round(self.total_frames / self.fps, 2),
+            "stride": stride,
+            "processed_frames": self.processed,
+            "unique_tracks": len(self.track_classes),
+            "tracks_by_class": tracks_by_class,
+            "violation_tracks": len(self.violations),
+            "violations": self.violations,
+            "segments": self.segments,
+        }
+
+def decode_worker(jobs, frames, stride, resize_dim, stop_event):
+    """Decodes the files handed out through 'jobs', putting every stride-th frame on the 'frames' queue."""
+    while not stop_event.is_set():
+        try:
+            file_index, path = jobs.get_nowait()
+        except queue.Empty:
+            return
+        cap = cv2.VideoCapture(path)
+        frame_index = -1
+        while not stop_event.is_set():
+            frame_index += 1
+            # Skipped frames are only demuxed, not decoded
+            if frame_index % stride:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.put((file_index, frame_index, cv2.resize(frame, resize_dim)))
+        cap.release()
+        frames.put((file_index, _END_OF_FILE, None))
+
+def run_audit(videos, detector_settings, config, output_dir, stride, batch_size, decoders, save_crops, detection_cache=None):
+    model = detector_settings['model']
+    confidence = detector_settings['confidence']
+    class_lookup = detector_settings['class_lookup']
+    class_names = dict(enumerate(class_lookup.names))
+    resize_dim = tuple(config.get('resize_dim', RESIZE_DIM))
+    # Cached boxes go down to the cache's floor and the audit threshold is applied afterwards
+    low_confidence = detection_cache is not None and detector_settings.get('pipeline') is None
+    infer_confidence = min(confidence, detection_cache.min_confidence) if low_confidence else confidence
+    segments = {}
+
+    audits = {}
+    used_names = set()
+    jobs = queue.Queue()
+    for file_index, path in enumerate(videos):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"🔴 [ERROR] Could not open video file: {path}")
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in used_names:
+            name = f"{name}_{file_index}"
+        used_names.add(name)
+        file_dir = os.path.join(output_dir, name)
+        ensure_dir(os.path.join(file_dir, "crops") if save_crops else file_dir)
+        audits[file_index] = _FileAudit(path, file_dir, config, fps, total_frames)
+        if detection_cache:
+            # Same resolution key as a camera thread without ROI, so live runs and audits share entries
+            segments[file_index] = detection_cache.open(path, [[resize_dim[1], resize_dim[0]], None], infer_confidence)
+        jobs.put((file_index, path))
+
+    # A bounded queue keeps decoders from running far ahead of inference
+    frames = queue.Queue(maxsize=batch_size * 4)
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=decode_worker, args=(jobs, frames, stride, resize_dim, stop_event), daemon=True)
+               for _ in range(max(1, min(decoders, len(audits))))]
+    for thread in threads:
+        thread.start()
+
+    reports = []
+    remaining = len(audits)
+    try:
+        while remaining:
+            # Fill a batch with frames from any file; end-of-file markers ride along in order
+            items = [frames.get()]
+            while len([item for item in items if item[1] is not _END_OF_FILE]) < batch_size:
+                try:
+                    items.append(frames.get_nowait())
+                except queue.Empty:
+                    break
+
+            cached = {}
+            if detection_cache:
+                for index, (file_index, frame_index, _) in enumerate(items):
+                    segment = segments.get(file_index)
+                    if frame_index is not _END_OF_FILE and segment is not None:
+                        detections = detection_cache.lookup(segment, frame_index, confidence)
+                        if detections is not None:
+                            cached[index] = detections
+            batch = [item[2] for index, item in enumerate(items) if item[1] is not _END_OF_FILE and index not in cached]
+            results = iter(model.infer(batch, infer_confidence) if batch else [])
+            for index, (file_index, frame_index, frame) in enumerate(items):
+                audit = audits[file_index]
+                if frame_index is _END_OF_FILE:
+                    report = audit.report(stride)
+                    with open(os.path.join(audit.output_dir, "timeline.json"), 'w') as f:
+                        json.dump(report, f, indent=2)
+                    print(f"[INFO] {audit.path}: {report['violation_tracks']} violating person(s) in "
+                          f"{len(report['segments'])} segment(s), {report['processed_frames']} frames analysed.")
+                    reports.append(report)
+                    remaining -= 1
+                    continue
+                detections = cached.get(index)
+                if detections is None:
+                    detections = drop_ignored(next(results), class_lookup)
+                    if segments.get(file_index) is not None:
+                        segments[file_index].put(frame_index, detections, infer_confidence)
+                if low_confidence:
+                    detections = detections.filter(detections.confs >= confidence)
+                violation_mask = class_lookup.violation_mask(detections.class_ids)
+                tracked = audit.tracker.update(detections, violation_mask)
+                audit.add(frame_index, frame, tracked, class_names, save_crops)
+    finally:
+        stop_event.set()
+        # Unblock decoders waiting on a full queue
+        while any(thread.is_alive() for thread in threads):
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    return reports
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+    if not config:
+        raise SystemExit("🔴 [FATAL] Could not load configuration.")
+    if args.model:
+        config['detection_model'] = next(name for name, key in MODEL_KEY_MAP.items() if key == args.model)
+
+    audit_config = config.get('audit', {})
+    stride = max(1, args.stride or audit_config.get('stride', 5))
+    batch_size = max(1, args.batch_size or audit_config.get('batch_size', 8))
+    decoders = max(1, args.decoders or audit_config.get('decoders', 4))
+    output_dir = args.output or audit_config.get('output_dir', 'audit')
+    save_crops = not args.no_crops and audit_config.get('save_crops', True)
+
+    videos = resolve_videos(args.videos, config)
+    if not videos:
+        raise SystemExit("🔴 [FATAL] No video files to audit.")
+
+    detector_settings, config = load_detector_from_config(config=config)
+    if not detector_settings:
+        raise SystemExit("🔴 [FATAL] Could not load detector.")
+
+    detection_cache = None if args.no_cache else DetectionCache.from_config(config)
+    print(f"[INFO] Auditing {len(videos)} file(s): stride {stride}, batch size {batch_size}, {decoders} decoder(s)"
+          f"{', detection cache enabled' if detection_cache else ''}.")
+    start = time.perf_counter()
+    reports = run_audit(videos, detector_settings, config, output_dir, stride, batch_size, decoders, save_crops,
+                        detection_cache)
+    wall_time = time.perf_counter() - start
+
+    footage_sec = sum(report['duration_sec'] for report in reports)
+    summary = {
+        "files": len(reports),
+        "footage_sec": round(footage_sec, 2),
+        "wall_time_sec": round(wall_time, 2),
+        "speedup_vs_realtime": round(footage_sec / wall_time, 2) if wall_time else None,
+        "violation_tracks": sum(report['violation_tracks'] for report in reports),
+        "detection_cache": detection_cache.stats() if detection_cache else None,
+        "timelines": [{"source": report['source'], "violation_tracks": report['violation_tracks'],
+                       "segments": len(report['segments'])} for report in reports],
+    }
+    ensure_dir(output_dir)
+    with open(os.path.join(output_dir, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from src.detector import load_config, load_detector_from_config, MODEL_KEY_MAP
+from src.camera_worker import camera_loop
+from src.frame_store import LocalFrameStore
+from src.metrics import SampleRecorder
+from src.worker_services import start_worker_services, stop_worker_services
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+BENCHMARK_CLIPS = [
+    "data/helmet_detection.mp4",
+    "data/helmet_detection(1).mp4",
+    "data/helmet_detection(2).mp4",
+    "data/helmet_testing.mp4",
+    "data/testing_helmet.mp4",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay the bundled clips through the camera pipeline headlessly and report throughput.")
+    parser.add_argument("--cameras", type=int, default=4, help="Number of simulated cameras (clips are reused round-robin)")
+    parser.add_argument("--model", default="helmet", choices=sorted(MODEL_KEY_MAP.values()), help="Model key under 'models'")
+    parser.add_argument("--resolution", default=None, help="Frame resize resolution as WIDTHxHEIGHT (default: resize_dim or 640x480)")
+    parser.add_argument("--imgsz", type=int, default=None, help="Model input size")
+    parser.add_argument("--backend", default=None, choices=["ultralytics", "onnx"], help="Detector backend (default: from config)")
+    parser.add_argument("--quantize", default=None, choices=["int8"], help="Quantize the ONNX backend")
+    parser.add_argument("--inference-mode", default=None, choices=["per_thread", "batched"])
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured run time in seconds")
+    parser.add_argument("--paced", action="store_true", help="Replay clips at their native frame rate instead of as fast as possible")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file as well")
+    return parser.parse_args()
+
+def build_config(args, base_config, evidence_dir):
+    """Derives the benchmark config from config.yaml and the command-line overrides."""
+    config = copy.deepcopy(base_config)
+    model_name = next(name for name, key in MODEL_KEY_MAP.items() if key == args.model)
+    config['detection_model'] = model_name
+    config['camera_feeds'] = [BENCHMARK_CLIPS[i % len(BENCHMARK_CLIPS)] for i in range(args.cameras)]
+
+    model_config = config.setdefault('models', {}).setdefault(args.model, {})
+    if args.backend:
+        model_config['backend'] = args.backend
+    if args.quantize:
+        model_config['quantize'] = args.quantize
+    if args.imgsz:
+        model_config['imgsz'] = args.imgsz
+    if args.resolution:
+        config['resize_dim'] = [int(v) for v in args.resolution.lower().split("x")]
+    if args.inference_mode:
+        config['inference_mode'] = args.inference_mode
+
+    config['capture'] = dict(config.get('capture', {}), pace_files=args.paced)
+    # Keep benchmark evidence out of the real logs/ and violations/ directories
+    config['evidence'] = dict(config.get('evidence', {}),
+                              output_dir=os.path.join(evidence_dir, "violations"),
+                              log_path=os.path.join(evidence_dir, "alerts.log"))
+    config['violation_store'] = dict(config.get('violation_store', {}), db_path=os.path.join(evidence_dir, "violations.db"))
+    config['clips'] = dict(config.get('clips', {}), output_dir=os.path.join(evidence_dir, "clips"))
+    return config
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+def run_benchmark(config, duration):
+    """Runs one camera_loop thread per camera for 'duration' seconds and returns the report."""
+    detector_settings, config = load_detector_from_config(config=config)
+    if not detector_settings:
+        raise SystemExit("🔴 [FATAL] Could not load detector.")
+
+    # Warm-up pass so model initialisation is not counted as pipeline latency
+    import cv2
+    cap = cv2.VideoCapture(config['camera_feeds'][0])
+    ret, frame = cap.read()
+    cap.release()
+    if ret:
+        detector_settings['model'].infer([frame], detector_settings['confidence'])
+
+    num_cameras = len(config['camera_feeds'])
+    lock = threading.Lock()
+    recorder = SampleRecorder()
+    frame_store = LocalFrameStore()
+    shared_data = {
+        'frame_store': frame_store,
+        'lock': lock,
+        'stop_events': [threading.Event() for _ in range(num_cameras)],
+        'violation_status': {i: False for i in range(num_cameras)},
+        'roi_coords': {},
+        'config': config,
+        'metrics': recorder,
+    }
+    services = start_worker_services(detector_settings, config, shared_data, num_cameras)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    threads = []
+    for i, stream_url in enumerate(config['camera_feeds']):
+        thread = threading.Thread(target=camera_loop, args=(i, stream_url, detector_settings, shared_data), daemon=True)
+        threads.append(thread)
+        thread.start()
+
+    time.sleep(duration)
+    # Taken while the cameras are still running, so the last scheduling window is a full one
+    scheduler_report = shared_data['scheduler'].snapshot() if shared_data.get('scheduler') else None
+    for event in shared_data['stop_events']:
+        event.set()
+    for thread in threads:
+        thread.join(timeout=10)
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    stop_worker_services(services)
+
+    per_camera = {}
+    total_frames = 0
+    for i in range(num_cameras):
+        frames = recorder.count(i, 'frame')
+        total_frames += frames
+        per_camera[i] = {
+            "source": config['camera_feeds'][i],
+            "frames": frames,
+            "fps": frames / wall_time,
+            "frames_dropped": recorder.gauge(i, 'frames_dropped', 0),
+        }
+
+    return {
+        "model": config['detection_model'],
+        "backend": config['models'][MODEL_KEY_MAP[config['detection_model']]].get('backend', 'ultralytics'),
+        "cameras": num_cameras,
+        "resolution": list(config.get('resize_dim', [640, 480])),
+        "inference_mode": config.get('inference_mode', 'per_thread'),
+        "duration_sec": wall_time,
+        "frames_processed": total_frames,
+        "aggregate_fps": total_frames / wall_time,
+        "cpu_percent": 100.0 * cpu_time / wall_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "per_camera": per_camera,
+        "frame_store": frame_store.stats(),
+        "detection_cache": shared_data['detection_cache'].stats() if shared_data.get('detection_cache') else None,
+        "scheduler": scheduler_report,
+        "stages": recorder.stage_summary(),
+    }
+
+def main():
+    args = parse_args()
+    base_config = load_config(args.config)
+    if not base_config:
+        raise SystemExit("🔴 [FATAL] Could not load configuration.")
+
+    with tempfile.TemporaryDirectory(prefix="helmet-bench-") as evidence_dir:
+        config = build_config(args, base_config, evidence_dir)
+        report = run_benchmark(config, args.duration)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from src.alarm import CentralAlarm
+from src.camera_manager import CameraManager
+from src.detector import load_config, load_detector_from_config, is_violation_model
+from src.frame_store import LocalFrameStore
+from src.worker_services import start_worker_services, stop_worker_services
+
+def plan_assignment(cameras, nodes, current, costs, tolerance=0.25, pinned=()):
+    """
+    Assigns camera ids to nodes. 'nodes' maps node id to capacity (e.g. CPU
+    cores), 'current' is the previous {cam_id: node_id} and 'costs' the
+    measured load of each camera (busy fraction of one core). Cameras stay on
+    their live node where possible; cameras of departed nodes go to the least
+    loaded nodes, heaviest first; then cameras are moved off the busiest node
+    while it is more than 'tolerance' above the average load per capacity
+    and a move lowers the peak. Cameras in 'pinned' (e.g. moved recently)
+    are not moved for balance. Returns the new {cam_id: node_id}.
+    """
+    if not nodes:
+        return {}
+    known = [costs[cam_id] for cam_id in cameras if costs.get(cam_id)]
+    default_cost = sum(known) / len(known) if known else 1.0
+    cost = {cam_id: costs.get(cam_id) or default_cost for cam_id in cameras}
+
+    assignment = {cam_id: node for cam_id, node in current.items() if node in nodes and cam_id in cost}
+    load = {node: 0.0 for node in nodes}
+    for cam_id, node in assignment.items():
+        load[node] += cost[cam_id]
+
+    def relative(node, extra=0.0):
+        return (load[node] + extra) / nodes[node]
+
+    for cam_id in sorted((c for c in cameras if c not in assignment), key=lambda c: -cost[c]):
+        node = min(nodes, key=lambda n: relative(n, cost[cam_id]))
+        assignment[cam_id] = node
+        load[node] += cost[cam_id]
+
+    average = sum(load.values()) / sum(nodes.values())
+    for _ in range(len(cameras)):
+        busiest = max(nodes, key=relative)
+        idlest = min(nodes, key=relative)
+        peak = relative(busiest)
+        if busiest == idlest or peak <= average * (1 + tolerance):
+            break
+        candidates = [cam_id for cam_id, node in assignment.items() if node == busiest and cam_id not in pinned]
+        best = min(candidates, default=None,
+                   key=lambda c: max(relative(busiest, -cost[c]), relative(idlest, cost[c])))
+        if best is None or max(relative(busiest, -cost[best]), relative(idlest, cost[best])) >= peak:
+            break
+        assignment[best] = idlest
+        load[busiest] -= cost[best]
+        load[idlest] += cost[best]
+    return assignment
+
+class _Node:
+    """What the coordinator knows about one worker node."""
+    def __init__(self, node_id, capacity, now):
+        self.node_id = node_id
+        self.capacity = max(0.1, float(capacity))
+        self.joined = now
+        self.last_seen = now
+        self.cameras = {}  # cam_id -> {'fps', 'busy'} as last reported
+        self.system_load = None
+
+class ClusterCoordinator:
+    """
+    Hands the cameras of 'camera_feeds' to worker nodes and merges their
+    violation flags into one alarm decision.
+    Workers POST /heartbeat every 'heartbeat_sec' with their per-camera load
+    and violation flags and get their current camera list back; a node that
+    misses heartbeats for 'node_timeout_sec' is dropped and its cameras are
+    reassigned. Assignments are recomputed with plan_assignment() whenever a
+    node joins or leaves, and every 'rebalance_sec' from the reported load.
+    GET /status returns nodes, assignment and violation state as JSON.
+    """
+    def __init__(self, camera_feeds, host="127.0.0.1", port=8500, node_timeout_sec=5.0, rebalance_sec=30.0,
+                 imbalance_tolerance=0.25, violation_status=None, changed_event=None):
+        self.camera_feeds = list(camera_feeds)
+        self.node_timeout_sec = node_timeout_sec
+        self.rebalance_sec = rebalance_sec
+        self.imbalance_tolerance = imbalance_tolerance
+        self.violation_status = violation_status if violation_status is not None else {}
+        self.changed_event = changed_event or threading.Event()
+
+        self.nodes = {}
+        self.assignment = {}
+        self.costs = {}
+        self.moved_at = {}
+        self.reassignments = 0
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+        for cam_id in range(len(self.camera_feeds)):
+            self.violation_status[cam_id] = False
+
+        coordinator = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/status":
+                    self.send_error(404)
+                    return
+                self._reply(200, coordinator.status())
+
+            def do_POST(self):
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    message = json.loads(self.rfile.read(length) or b"{}")
+                    if self.path == "/heartbeat":
+                        self._reply(200, coordinator.heartbeat(message))
+                    elif self.path == "/leave":
+                        coordinator.leave(message['node_id'])
+                        self._reply(200, {"ok": True})
+                    else:
+                        self.send_error(404)
+                except (KeyError, ValueError) as e:
+                    self._reply(400, {"error": str(e)})
+
+            def log_message(self, format, *args):
+                pass  # Heartbeats would flood the log
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+
+    @classmethod
+    def from_config(cls, config, violation_status=None, changed_event=None):
+        cluster_config = config.get('cluster', {})
+        return cls(config.get('camera_feeds', []),
+                   host=cluster_config.get('host', '127.0.0.1'),
+                   port=cluster_config.get('port', 8500),
+                   node_timeout_sec=cluster_config.get('node_timeout_sec', 5.0),
+                   rebalance_sec=cluster_config.get('rebalance_sec', 30.0),
+                   imbalance_tolerance=cluster_config.get('imbalance_tolerance', 0.25),
+                   violation_status=violation_status, changed_event=changed_event)
+
+    def _reassign(self, reason, now=None):
+        """Recomputes the assignment under the lock and logs the cameras that moved."""
+        capacities = {node_id: node.capacity for node_id, node in self.nodes.items()}
+        previous = self.assignment
+        now = time.time() if now is None else now
+        # A camera that just moved has not been measured on its new node yet; leave it there for a while
+        pinned = {cam_id for cam_id, moved_at in self.moved_at.items() if now - moved_at < 2 * self.rebalance_sec}
+        self.assignment = plan_assignment(list(range(len(self.camera_feeds))), capacities, previous, self.costs,
+                                          self.imbalance_tolerance, pinned)
+        moved = {cam_id: node for cam_id, node in self.assignment.items() if previous.get(cam_id) != node}
+        for cam_id in moved:
+            # A camera's first placement is no move; pinning it would keep later nodes from taking a share
+            if cam_id in previous:
+                self.moved_at[cam_id] = now
+        if moved:
+            self.reassignments += 1
+            print(f"[CLUSTER] {reason}: " + ", ".join(f"cam {cam_id} -> {node}" for cam_id, node in sorted(moved.items())))
+        for cam_id in range(len(self.camera_feeds)):
+            if cam_id not in self.assignment:
+                self._set_violation(cam_id, False)
+
+    def _set_violation(self, cam_id, value):
+        if self.violation_status.get(cam_id, False) != value:
+            self.violation_status[cam_id] = value
+            self.changed_event.set()
+
+    def heartbeat(self, message, now=None):
+        """Handles a worker heartbeat: registers new nodes, stores load and violation flags, returns its cameras."""
+        node_id = str(message['node_id'])
+        now = time.time() if now is None else now
+        with self._lock:
+            node = self.nodes.get(node_id)
+            if node is None:
+                node = self.nodes[node_id] = _Node(node_id, message.get('capacity', 1), now)
+                print(f"[CLUSTER] Node {node_id} joined (capacity {node.capacity:g}).")
+                self._reassign(f"node {node_id} joined", now)
+            node.last_seen = now
+            node.system_load = message.get('system_load')
+            node.cameras = {int(cam_id): stats for cam_id, stats in (message.get('cameras') or {}).items()}
+            for cam_id, stats in node.cameras.items():
+                if self.assignment.get(cam_id) == node_id and stats.get('busy'):
+                    self.costs[cam_id] = stats['busy']
+            # Only the node that currently owns a camera may change its flag
+            for cam_id, violating in (message.get('violations') or {}).items():
+                cam_id = int(cam_id)
+                if self.assignment.get(cam_id) == node_id:
+                    self._set_violation(cam_id, bool(violating))
+            cameras = {str(cam_id): self.camera_feeds[cam_id]
+                       for cam_id, owner in sorted(self.assignment.items()) if owner == node_id}
+        return {"cameras": cameras}
+
+    def leave(self, node_id, now=None):
+        with self._lock:
+            if self.nodes.pop(str(node_id), None) is not None:
+                print(f"[CLUSTER] Node {node_id} left.")
+                self._reassign(f"node {node_id} left", now)
+
+    def expire_nodes(self, now=None):
+        """Drops the nodes that missed their heartbeats for 'node_timeout_sec' and reassigns their cameras."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [node_id for node_id, node in self.nodes.items() if now - node.last_seen > self.node_timeout_sec]
+            for node_id in expired:
+                print(f"🔴 [ERROR] Node {node_id} missed its heartbeats; reassigning its cameras.")
+                del self.nodes[node_id]
+                self._reassign(f"node {node_id} lost", now)
+        return expired
+
+    def rebalance(self, now=None):
+        """Recomputes the assignment from the reported load."""
+        with self._lock:
+            self._reassign("load rebalance", now)
+
+    def status(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "nodes": {node_id: {"capacity": node.capacity, "last_seen_sec": round(now - node.last_seen, 2),
+                                    "system_load": node.system_load,
+                                    "cameras": {str(cam_id): stats for cam_id, stats in sorted(node.cameras.items())}}
+                          for node_id, node in self.nodes.items()},
+                "assignment": {str(cam_id): node for cam_id, node in sorted(self.assignment.items())},
+                "unassigned": [cam_id for cam_id in range(len(self.camera_feeds)) if cam_id not in self.assignment],
+                "violations": {str(cam_id): bool(self.violation_status.get(cam_id, False))
+                               for cam_id in range(len(self.camera_feeds))},
+                "reassignments": self.reassignments,
+            }
+
+    def run(self):
+        """Serves the HTTP API and drops silent nodes; rebalances by load every 'rebalance_sec'."""
+        host, port = self.httpd.server_address[:2]
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.5}, daemon=True).start()
+        print(f"[INFO] Cluster coordinator listening on http://{host}:{port} for {len(self.camera_feeds)} camera(s).")
+        last_rebalance = time.time()
+        while not self.stop_event.wait(min(1.0, self.node_timeout_sec / 2)):
+            now = time.time()
+            self.expire_nodes(now)
+            if now - last_rebalance >= self.rebalance_sec:
+                last_rebalance = now
+                self.rebalance(now)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        print("[INFO] Cluster coordinator stopped.")
+
+    def stop(self):
+        self.stop_event.set()
+
+class _LoadMeter:
+    """
+    Metrics sink of a worker node: measures each camera's frame rate and busy
+    time (seconds of frame processing per second) for its heartbeats, and
+    forwards everything to an optional MetricsRegistry.
+    """
+    def __init__(self, registry=None):
+        self.registry = registry
+        self._frames = {}
+        self._busy = {}
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, cam_id, stage, seconds):
+        if stage == 'frame':
+            with self._lock:
+                self._frames[cam_id] = self._frames.get(cam_id, 0) + 1
+                self._busy[cam_id] = self._busy.get(cam_id, 0.0) + seconds
+        if self.registry:
+            self.registry.observe(cam_id, stage, seconds)
+
+    def set_gauge(self, cam_id, name, value):
+        if self.registry:
+            self.registry.set_gauge(cam_id, name, value)
+
+    def collect(self, cam_ids):
+        """Returns {cam_id: {'fps', 'busy'}} since the last call and starts a new window."""
+        now = time.time()
+        with self._lock:
+            elapsed = max(now - self._window_start, 1e-6)
+            stats = {str(cam_id): {"fps": round(self._frames.get(cam_id, 0) / elapsed, 2),
+                                   "busy": round(self._busy.get(cam_id, 0.0) / elapsed, 4)}
+                     for cam_id in cam_ids}
+            self._frames, self._busy = {}, {}
+            self._window_start = now
+        return stats
+
+class ClusterWorker:
+    """
+    A worker node: runs whichever cameras the coordinator assigns to it.
+    Sends a heartbeat every 'heartbeat_sec', or immediately when one of its
+    cameras' violation flag changes, and starts or stops camera threads to
+    match the camera list in the reply. Keeps its cameras running if the
+    coordinator is briefly unreachable.
+    """
+    def __init__(self, coordinator_url, node_id, detector_settings, config, capacity=None, heartbeat_sec=1.0,
+                 metrics=None):
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.node_id = node_id
+        self.capacity = capacity or os.cpu_count() or 1
+        self.heartbeat_sec = heartbeat_sec
+        self.load_meter = _LoadMeter(metrics)
+        self.session = requests.Session()
+        self.stop_event = threading.Event()
+
+        self.shared_data = {
+            'frame_store': LocalFrameStore(),
+            'lock': threading.Lock(),
+            'stop_events': {},
+            'violation_status': {},
+            'violation_onsets': {},
+            'violation_changed': threading.Event(),
+            'roi_coords': {},
+            'config': config,
+            'metrics': self.load_meter,
+        }
+        # Services are sized for the whole site; this node may be given any of its cameras
+        self.services = start_worker_services(detector_settings, config, self.shared_data,
+                                              max(1, len(config.get('camera_feeds', []))))
+        self.manager = CameraManager(detector_settings, self.shared_data)
+
+    def _heartbeat(self):
+        running = self.manager.running()
+        with self.shared_data['lock']:
+            violations = {str(cam_id): bool(flag) for cam_id, flag in self.shared_data['violation_status'].items()}
+        message = {
+            "node_id": self.node_id,
+            "capacity": self.capacity,
+            "system_load": round(os.getloadavg()[0], 2) if hasattr(os, "getloadavg") else None,
+            "cameras": self.load_meter.collect(running),
+            "violations": violations,
+        }
+        response = self.session.post(f"{self.coordinator_url}/heartbeat", json=message, timeout=2.0)
+        response.raise_for_status()
+        return {int(cam_id): url for cam_id, url in response.json().get('cameras', {}).items()}
+
+    def run(self):
+        print(f"[INFO] Worker node {self.node_id} (capacity {self.capacity}) reporting to {self.coordinator_url}.")
+        reachable = True
+        while not self.stop_event.is_set():
+            try:
+                cameras = self._heartbeat()
+                if not reachable:
+                    print(f"[INFO] Coordinator {self.coordinator_url} reachable again.")
+                reachable = True
+                started, stopped = self.manager.apply(cameras)
+                if started or stopped:
+                    print(f"[CLUSTER] Node {self.node_id} now runs cameras {sorted(cameras)}.")
+            except (requests.RequestException, ValueError) as e:
+                if reachable:
+                    print(f"🔴 [ERROR] Coordinator {self.coordinator_url} unreachable, keeping current cameras: {e}")
+                reachable = False
+            # A violation change is reported right away instead of at the next heartbeat
+            changed = self.shared_data['violation_changed']
+            changed.wait(timeout=self.heartbeat_sec)
+            changed.clear()
+
+        # Leave first, so the coordinator hands the cameras on while this node shuts down
+        try:
+            self.session.post(f"{self.coordinator_url}/leave", json={"node_id": self.node_id}, timeout=2.0)
+        except requests.RequestException:
+            pass
+        self.manager.stop_all()
+        stop_worker_services(self.services)
+        print(f"[INFO] Worker node {self.node_id} stopped.")
+
+    def stop(self):
+        self.stop_event.set()
+        self.shared_data['violation_changed'].set()
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def run_until_interrupted(service, extra_stop=None):
+    """Runs a service's loop in the foreground until Ctrl+C or SIGTERM."""
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    thread = threading.Thread(target=service.run, daemon=True)
+    thread.start()
+    try:
+        # Sleep rather than join: a join interrupted by the signal would wrongly mark the thread as finished
+        while thread.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("[EXIT] Interrupted. Shutting down...")
+    finally:
+        service.stop()
+        if extra_stop:
+            extra_stop()
+        thread.join(timeout=10)
+
+def start_coordinator(config):
+    """Builds the coordinator and, for the helmet model, the alarm fed by the merged violation flags."""
+    violation_status = {}
+    changed_event = threading.Event()
+    coordinator = ClusterCoordinator.from_config(config, violation_status, changed_event)
+    alarm_system = None
+    if is_violation_model(config):
+        alarm_system = CentralAlarm(config, violation_status, changed_event=changed_event)
+        threading.Thread(target=alarm_system.run, daemon=True).start()
+    return coordinator, alarm_system
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Spread the cameras of config.yaml over several worker nodes.")
+    parser.add_argument("--config", default="config/config.yaml")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("coordinator", help="Assign cameras to workers and run the central alarm")
+    worker_parser = subparsers.add_parser("worker", help="Run the cameras assigned by the coordinator")
+    worker_parser.add_argument("--coordinator", default=None, help="Coordinator URL (default: cluster.host/port)")
+    worker_parser.add_argument("--node-id", default=None, help="Unique node name (default: hostname-pid)")
+    worker_parser.add_argument("--capacity", type=float, default=None, help="Relative node capacity (default: CPU count)")
+    local_parser = subparsers.add_parser("local", help="Coordinator plus several worker processes on this machine")
+    local_parser.add_argument("--workers", type=int, default=2)
+    status_parser = subparsers.add_parser("status", help="Print the coordinator's status")
+    status_parser.add_argument("--coordinator", default=None)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+    if not config:
+        raise SystemExit("🔴 [FATAL] Could not load configuration.")
+    cluster_config = config.get('cluster', {})
+    default_url = f"http://{cluster_config.get('host', '127.0.0.1')}:{cluster_config.get('port', 8500)}"
+
+    if args.command == "status":
+        print(json.dumps(requests.get(f"{args.coordinator or default_url}/status", timeout=5).json(), indent=2))
+        return
+
+    if args.command == "worker":
+        detector_settings, config = load_detector_from_config(config=config)
+        if not detector_settings:
+            raise SystemExit("🔴 [FATAL] Could not load detector.")
+        worker = ClusterWorker(args.coordinator or default_url, args.node_id or f"{socket.gethostname()}-{os.getpid()}",
+                               detector_settings, config, args.capacity, cluster_config.get('heartbeat_sec', 1.0))
+        run_until_interrupted(worker)
+        return
+
+    coordinator, alarm_system = start_coordinator(config)
+    workers = []
+    if args.command == "local":
+        # Each worker is a separate process with its own model, like a separate machine
+        workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--config", args.config, "worker",
+                                     "--coordinator", default_url, "--node-id", f"local-{i}", "--capacity", "1"])
+                   for i in range(args.workers)]
+
+    def stop_workers():
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if alarm_system:
+            alarm_system.stop()
+
+    run_until_interrupted(coordinator, stop_workers)
+
+if __name__ == '__main__':
+    main()
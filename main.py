@@ -1,9 +1,17 @@
+import time
+_START_TIME = time.time()  # Time-to-first-frame is measured from here, including imports and model loading
 import cv2
 import threading
-import time
-from src.detector import load_detector_from_config
-from src.camera_worker import camera_loop
+from src.detector import load_config, load_detector_from_config, is_violation_model
+from src.camera_manager import CameraManager
 from src.alarm import CentralAlarm
+from src.frame_store import LocalFrameStore
+from src.mosaic import MosaicRenderer
+from src.metrics import MetricsRegistry, MetricsServer
+from src.stream_server import StreamServer
+from src.process_pool import CameraProcessPool
+from src.worker_services import start_worker_services, stop_worker_services
+from src.config_reloader import ConfigReloader, camera_title
 
 # --- ROI Drawing State ---
 # These are global to be accessible by the mouse callback
@@ -62,157 +70,402 @@ def mouse_callback(event, x, y, flags, param):
         drawing_state["cam_id"] = -1
 
 
-def main():
+def stop_events_of(shared_data):
+    """The stop events of all cameras; a list in process mode, a dict keyed by camera id in threads mode."""
+    events = shared_data['stop_events']
+    return list(events.values()) if isinstance(events, dict) else list(events)
+
+def run_stopped(shared_data):
+    """True once every camera of the run has been asked to stop."""
+    return all(event.is_set() for event in stop_events_of(shared_data))
+
+def stop_all_cameras(shared_data):
+    for event in stop_events_of(shared_data):
+        event.set()
+
+def run_window_display(shared_data, window_names, num_cameras):
     """
-    Main function to initialize and run the multi-camera detection application.
+    Shows every camera in its own window, plus an ROI window per camera with an ROI set.
+    'window_names' may change while running (config reload): windows are opened
+    for new cameras and closed for removed or renamed ones.
     """
-    print("[INFO] Main script started.")
-    # Load configuration and the selected detector model
-    detector_settings, config = load_detector_from_config()
-    if not detector_settings:
-        print("🔴 [FATAL] Could not load detector. Exiting.")
+    roi_windows_created = set() # Keep track of created ROI windows
+    open_windows = {}  # cam_id -> name of the window shown for it
+
+    while True:
+        # Exit loop if all windows have been closed by the user
+        if not window_names:
+            print("[INFO] All camera windows closed. Exiting main loop.")
+            stop_all_cameras(shared_data) # Ensure all threads are stopped
+            break
+        # Exit loop if the run was stopped from outside (e.g. by the pipeline service)
+        if run_stopped(shared_data):
+            break
+
+        for i, name in list(open_windows.items()):
+            if window_names.get(i) != name:
+                for window in (name, f"ROI for {name}"):
+                    try:
+                        cv2.destroyWindow(window)
+                    except cv2.error:
+                        pass
+                roi_windows_created.discard(i)
+                del open_windows[i]
+        for i, name in list(window_names.items()):
+            if i not in open_windows:
+                cv2.namedWindow(name)
+                cv2.setMouseCallback(name, mouse_callback, param=(i, shared_data['roi_coords'], window_names))
+                open_windows[i] = name
+
+        # Use a copy of keys to allow safe dictionary modification during iteration
+        active_camera_ids = list(window_names.keys())
+
+        for i in active_camera_ids:
+            name = window_names.get(i)
+            if not name: continue
+
+            # Check for main window closure BEFORE showing it
+            is_main_window_open = True
+            try:
+                if cv2.getWindowProperty(name, cv2.WND_PROP_VISIBLE) < 1:
+                    is_main_window_open = False
+            except cv2.error:
+                is_main_window_open = False
+            
+            if not is_main_window_open:
+                print(f"Window for '{name}' closed by user. Stopping thread {i}.")
+                shared_data['stop_events'][i].set()
+                del window_names[i]
+                continue 
+
+            # If the main window is open, display its frame
+            frame, roi_frame, _ = shared_data['frame_store'].latest(i)
+            if frame is not None:
+                # The published buffer is shared with the camera thread; copy only when drawing on it
+                if drawing_state["drawing"] and drawing_state["cam_id"] == i:
+                    frame = frame.copy()
+                    start, end = drawing_state["start_point"], drawing_state["temp_end_point"]
+                    cv2.rectangle(frame, start, end, (0, 255, 255), 2)
+                cv2.imshow(name, frame)
+
+            # --- ROI window logic ---
+            roi_name = f"ROI for {name}"
+            is_roi_supposed_to_be_active = False
+            with shared_data['lock']:
+                if i in shared_data['roi_coords']:
+                    is_roi_supposed_to_be_active = True
+
+            if is_roi_supposed_to_be_active:
+                if roi_frame is not None:
+                    if i not in roi_windows_created:
+                        cv2.namedWindow(roi_name)
+                        roi_windows_created.add(i)
+                    
+                    is_roi_window_actually_open = True
+                    try:
+                        if cv2.getWindowProperty(roi_name, cv2.WND_PROP_VISIBLE) < 1:
+                            is_roi_window_actually_open = False
+                    except cv2.error:
+                        is_roi_window_actually_open = False
+
+                    if is_roi_window_actually_open:
+                        cv2.imshow(roi_name, roi_frame)
+                    else:
+                        # User closed the window, so we change the state
+                        print(f"ROI window for '{name}' closed. Reverting to full frame.")
+                        roi_windows_created.discard(i)
+                        with shared_data['lock']:
+                            if i in shared_data['roi_coords']:
+                                del shared_data['roi_coords'][i]
+                        shared_data['frame_store'].clear_roi(i)
+        
+        key = cv2.waitKey(30) & 0xFF
+        if key == ord('q'):
+            print("[INFO] 'q' pressed. Shutting down all streams.")
+            stop_all_cameras(shared_data)
+            break
+
+def mosaic_mouse_callback(event, x, y, flags, param):
+    """
+    Mouse callback for the mosaic window. Maps the click to the camera tile
+    under the cursor and forwards it, in frame coordinates, to mouse_callback.
+    A right click clears the ROI of the camera under the cursor.
+    """
+    renderer, roi_dict, window_names, frame_store = param
+    if drawing_state["drawing"]:
+        location = renderer.locate(x, y, drawing_state["cam_id"])
+    else:
+        location = renderer.locate(x, y)
+    if location is None:
+        return
+    cam_id, frame_x, frame_y = location
+
+    if event == cv2.EVENT_RBUTTONDOWN:
+        if cam_id in roi_dict:
+            del roi_dict[cam_id]
+            frame_store.clear_roi(cam_id)
+            print(f"[INFO] ROI cleared for Cam {cam_id}")
+        return
+    mouse_callback(event, frame_x, frame_y, flags, (cam_id, roi_dict, window_names))
+
+def run_mosaic_display(shared_data, window_names, num_cameras, config):
+    """
+    Shows all cameras tiled in a single window. Only tiles with a new frame
+    are redrawn, and the window is only refreshed when something changed.
+    The grid is rebuilt when a config reload adds, removes or renames cameras.
+    """
+    frame_store = shared_data['frame_store']
+    window_name = config.get('display', {}).get('mosaic', {}).get('window_title', "Helmet Detection")
+    cv2.namedWindow(window_name)
+    renderer = None
+
+    while not run_stopped(shared_data):
+        try:
+            if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
+                print("[INFO] Mosaic window closed. Exiting main loop.")
+                break
+        except cv2.error:
+            break
+
+        # One tile per camera id; ids without a camera stay empty
+        titles = [window_names.get(i) for i in range(max(window_names, default=-1) + 1)]
+        if renderer is None or titles != renderer.titles:
+            renderer = MosaicRenderer.from_config(config, len(titles), titles)
+            cv2.setMouseCallback(window_name, mosaic_mouse_callback,
+                                 param=(renderer, shared_data['roi_coords'], window_names, frame_store))
+            print(f"[INFO] Mosaic display: {renderer.columns}x{renderer.rows} grid of {renderer.tile_w}x{renderer.tile_h} tiles.")
+
+        changed = renderer.render(frame_store)
+        if drawing_state["drawing"] and drawing_state["cam_id"] >= 0:
+            renderer.draw_rectangle(drawing_state["cam_id"], drawing_state["start_point"],
+                                    drawing_state["temp_end_point"], (0, 255, 255))
+            changed = True
+        if changed:
+            cv2.imshow(window_name, renderer.canvas)
+
+        key = cv2.waitKey(30) & 0xFF
+        if key == ord('q'):
+            print("[INFO] 'q' pressed. Shutting down all streams.")
+            break
+
+    stop_all_cameras(shared_data)
+
+def run_headless(shared_data, num_cameras):
+    """Runs without any windows until Ctrl+C; frames are only available through the stream server."""
+    print("[INFO] Running headless. Press Ctrl+C to stop.")
+    try:
+        while not run_stopped(shared_data):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("[INFO] Interrupted. Shutting down all streams.")
+    stop_all_cameras(shared_data)
+
+def report_time_to_first_frame(run, since):
+    """
+    Waits for the first published frame of every camera and records the time
+    since 'since' (the process start for main.py, the RUN request for the
+    service) in run['time_to_first_frame'].
+    """
+    frame_store = run['shared_data']['frame_store']
+    first = None
+    pending = set(range(run['num_cameras']))
+    while pending and not run_stopped(run['shared_data']):
+        for i in [i for i in pending if frame_store.sequence(i) > 0]:
+            pending.discard(i)
+            if first is None:
+                first = time.time() - since
+        time.sleep(0.01)
+    if first is None:
         return
+    every = None if pending else time.time() - since
+    run['time_to_first_frame'] = {"first_camera_sec": round(first, 3),
+                                  "all_cameras_sec": None if every is None else round(every, 3)}
+    every_text = "n/a" if every is None else f"{every:.2f}s"
+    print(f"[INFO] Time to first frame: {first:.2f}s (all {run['num_cameras']} cameras: {every_text})")
+
+def start_pipeline(config, detector_settings=None, since=None, config_path="config/config.yaml"):
+    """
+    Starts the metrics endpoint, worker services, alarm, camera threads (or
+    processes) and stream server for one run. 'detector_settings' may be an
+    already loaded detector; in threads mode it is loaded when missing.
+    In threads mode, with 'hot_reload.enabled', changes to 'config_path'
+    are applied to the running pipeline.
+    Returns the run state used by run_display() and stop_pipeline(), or None.
+    """
+    use_processes = config.get('execution_mode', 'threads') == 'processes'
+
+    # In process mode every worker process loads its own copy of the model
+    if not use_processes and detector_settings is None:
+        detector_settings, config = load_detector_from_config(config=config)
+        if not detector_settings:
+            print("🔴 [FATAL] Could not load detector. Exiting.")
+            return None
 
     camera_feeds = config.get('camera_feeds', [])
     num_cameras = len(camera_feeds)
     if num_cameras == 0:
         print("🔴 [FATAL] No camera feeds found in config.yaml. Exiting.")
-        return
-    print(f"[INFO] Found {num_cameras} camera feeds. Starting threads...")
-
-    # Initialize shared resources for threading
-    shared_data = {
-        'frame_dict': {},
-        'roi_frame_dict': {},
-        'lock': threading.Lock(),
-        'stop_events': [threading.Event() for _ in range(num_cameras)],
-        'violation_status': {i: False for i in range(num_cameras)},
-        'roi_coords': {},
-        'config': config
-    }
+        return None
+
+    # Per-stage latency histograms served on a local /metrics endpoint
+    metrics = None
+    metrics_server = None
+    metrics_config = config.get('metrics', {})
+    if metrics_config.get('enabled', False):
+        metrics = MetricsRegistry()
+        metrics_server = MetricsServer(metrics, metrics_config.get('host', '127.0.0.1'), metrics_config.get('port', 9100))
+        threading.Thread(target=metrics_server.run, daemon=True).start()
+
+    process_pool = None
+    services = []
+    camera_manager = None
+    if use_processes:
+        print(f"[INFO] Found {num_cameras} camera feeds. Starting worker processes...")
+        process_pool = CameraProcessPool(config, config_path=config_path)
+        shared_data = process_pool.shared_data
+    else:
+        print(f"[INFO] Found {num_cameras} camera feeds. Starting threads...")
+        # Initialize shared resources for threading
+        lock = threading.Lock()
+        shared_data = {
+            'frame_store': LocalFrameStore(),
+            'lock': lock,
+            'stop_events': {},  # Filled per camera by the CameraManager
+            'violation_status': {},
+            'violation_onsets': {},
+            'violation_changed': threading.Event(),
+            'roi_coords': {},
+            'config': config,
+            'detector_settings': detector_settings,
+            'metrics': metrics
+        }
+        camera_manager = CameraManager(detector_settings, shared_data)
+        # Batched inference server and evidence writer, when configured
+        services = start_worker_services(detector_settings, config, shared_data, num_cameras)
 
     # Conditionally start the centralized alarm system
     alarm_system = None
     alarm_thread = None
-    if detector_settings.get('perform_violation_check', False):
+    if is_violation_model(config):
         print("[INFO] Helmet detection model selected. Starting alarm system.")
-        alarm_system = CentralAlarm(config, shared_data['violation_status'])
+        alarm_system = CentralAlarm(config, shared_data['violation_status'], metrics,
+                                    shared_data['violation_onsets'], shared_data['violation_changed'])
         alarm_thread = threading.Thread(target=alarm_system.run, daemon=True)
         alarm_thread.start()
     else:
         print("[INFO] Non-helmet model selected. Alarm system is disabled.")
 
+    if process_pool:
+        process_pool.start()
+    else:
+        # Start a worker thread for each camera feed
+        for i, stream_url in enumerate(camera_feeds):
+            camera_manager.start_camera(i, stream_url)
 
-    # Start a worker thread for each camera feed
-    threads = []
-    for i, stream_url in enumerate(camera_feeds):
-        thread = threading.Thread(target=camera_loop, args=(i, stream_url, detector_settings, shared_data), daemon=True)
-        threads.append(thread)
-        thread.start()
+    window_names = {i: camera_title(config, i) for i in range(num_cameras)}
+    display_mode = config.get('display', {}).get('mode', 'windows')
 
-    # Main display loop
-    window_names = {i: (config.get('camera_titles', [])[i] or f"Camera {i}") for i in range(num_cameras)}
-    roi_windows_created = set() # Keep track of created ROI windows
-    for i, name in window_names.items():
-        cv2.namedWindow(name)
-        cv2.setMouseCallback(name, mouse_callback, param=(i, shared_data['roi_coords'], window_names))
-    print("[INFO] All threads started. Starting frame display loop.")
-    
-    try:
-        while True:
-            # Exit loop if all windows have been closed by the user
-            if not window_names:
-                print("[INFO] All camera windows closed. Exiting main loop.")
-                for i in range(num_cameras): # Ensure all threads are stopped
-                    shared_data['stop_events'][i].set()
-                break
+    # MJPEG streams of the annotated frames; always on in headless mode
+    stream_server = None
+    if display_mode == 'headless' or config.get('stream_server', {}).get('enabled', False):
+        stream_server = StreamServer.from_config(config, shared_data['frame_store'], num_cameras,
+                                                 [window_names[i] for i in range(num_cameras)], metrics)
+        threading.Thread(target=stream_server.run, daemon=True).start()
 
-            # Use a copy of keys to allow safe dictionary modification during iteration
-            active_camera_ids = list(window_names.keys())
+    run = {
+        'config': config,
+        'shared_data': shared_data,
+        'num_cameras': num_cameras,
+        'detector_settings': detector_settings,
+        'camera_manager': camera_manager,
+        'services': services,
+        'process_pool': process_pool,
+        'alarm_system': alarm_system,
+        'alarm_thread': alarm_thread,
+        'metrics_server': metrics_server,
+        'stream_server': stream_server,
+        'window_names': window_names,
+        'display_mode': display_mode,
+        'time_to_first_frame': None,
+        'config_reloader': None,
+        'restart': False,
+    }
+    threading.Thread(target=report_time_to_first_frame, args=(run, since or time.time()), daemon=True).start()
 
-            for i in active_camera_ids:
-                name = window_names.get(i)
-                if not name: continue
+    # Apply config.yaml edits (cameras, thresholds, model, alarm) without a restart
+    if config.get('hot_reload', {}).get('enabled', False) and use_processes:
+        print("[INFO] Config hot reload is not available in process mode; changes apply on the next start.")
+    elif not use_processes:
+        run['config_reloader'] = ConfigReloader.from_config(config, config_path, run)
+        if run['config_reloader']:
+            threading.Thread(target=run['config_reloader'].run, daemon=True).start()
+    return run
 
-                # Check for main window closure BEFORE showing it
-                is_main_window_open = True
-                try:
-                    if cv2.getWindowProperty(name, cv2.WND_PROP_VISIBLE) < 1:
-                        is_main_window_open = False
-                except cv2.error:
-                    is_main_window_open = False
-                
-                if not is_main_window_open:
-                    print(f"Window for '{name}' closed by user. Stopping thread {i}.")
-                    shared_data['stop_events'][i].set()
-                    del window_names[i]
-                    continue 
-
-                # If the main window is open, display its frame
-                with shared_data['lock']:
-                    frame = shared_data['frame_dict'].get(i)
-                if frame is not None:
-                    display_frame = frame.copy()
-                    if drawing_state["drawing"] and drawing_state["cam_id"] == i:
-                        start, end = drawing_state["start_point"], drawing_state["temp_end_point"]
-                        cv2.rectangle(display_frame, start, end, (0, 255, 255), 2)
-                    cv2.imshow(name, display_frame)
-
-                # --- ROI window logic ---
-                roi_name = f"ROI for {name}"
-                is_roi_supposed_to_be_active = False
-                with shared_data['lock']:
-                    if i in shared_data['roi_coords']:
-                        is_roi_supposed_to_be_active = True
-
-                if is_roi_supposed_to_be_active:
-                    with shared_data['lock']:
-                        roi_frame = shared_data['roi_frame_dict'].get(i)
-
-                    if roi_frame is not None:
-                        if i not in roi_windows_created:
-                            cv2.namedWindow(roi_name)
-                            roi_windows_created.add(i)
-                        
-                        is_roi_window_actually_open = True
-                        try:
-                            if cv2.getWindowProperty(roi_name, cv2.WND_PROP_VISIBLE) < 1:
-                                is_roi_window_actually_open = False
-                        except cv2.error:
-                            is_roi_window_actually_open = False
+def request_stop(run):
+    """Asks every camera of a run to stop; the display loop then returns."""
+    stop_all_cameras(run['shared_data'])
 
-                        if is_roi_window_actually_open:
-                            cv2.imshow(roi_name, roi_frame)
-                        else:
-                            # User closed the window, so we change the state
-                            print(f"ROI window for '{name}' closed. Reverting to full frame.")
-                            roi_windows_created.discard(i)
-                            with shared_data['lock']:
-                                if i in shared_data['roi_coords']:
-                                    del shared_data['roi_coords'][i]
-                                if i in shared_data['roi_frame_dict']:
-                                    del shared_data['roi_frame_dict'][i]
-            
-            key = cv2.waitKey(30) & 0xFF
-            if key == ord('q'):
-                print("[INFO] 'q' pressed. Shutting down all streams.")
-                for i in range(num_cameras):
-                    shared_data['stop_events'][i].set()
-                break
-    
-    finally:
-        # Cleanup all resources
-        print("[EXIT] Cleaning up resources...")
-        if alarm_system:
-            alarm_system.stop()
-        if alarm_thread and alarm_thread.is_alive():
-            alarm_thread.join(timeout=2)
-        for i, thread in enumerate(threads):
-            shared_data['stop_events'][i].set()
-            if thread.is_alive():
-                thread.join(timeout=2)
+def run_display(run):
+    """Runs the configured display (windows, mosaic or headless) until the user or request_stop() ends the run."""
+    shared_data, num_cameras = run['shared_data'], run['num_cameras']
+    print("[INFO] All threads started. Starting frame display loop.")
+    if run['display_mode'] == 'headless':
+        run_headless(shared_data, num_cameras)
+    elif run['display_mode'] == 'mosaic':
+        run_mosaic_display(shared_data, run['window_names'], num_cameras, run['config'])
+    else:
+        run_window_display(shared_data, run['window_names'], num_cameras)
+
+def stop_pipeline(run):
+    """Stops everything start_pipeline() started."""
+    # Cleanup all resources
+    print("[EXIT] Cleaning up resources...")
+    shared_data = run['shared_data']
+    if run['config_reloader']:
+        run['config_reloader'].stop()
+    if run['alarm_system']:
+        run['alarm_system'].stop()
+    if run['alarm_thread'] and run['alarm_thread'].is_alive():
+        run['alarm_thread'].join(timeout=2)
+    if run['camera_manager']:
+        stop_all_cameras(shared_data)
+        run['camera_manager'].stop_all()
+    if run['process_pool']:
+        run['process_pool'].stop()
+    stop_worker_services(run['services'])
+    if run['metrics_server']:
+        run['metrics_server'].stop()
+    if run['stream_server']:
+        run['stream_server'].stop()
+    if run['display_mode'] != 'headless':
         cv2.destroyAllWindows()
-        print("[INFO] Main script finished.")
+
+def main():
+    """
+    Main function to initialize and run the multi-camera detection application.
+    """
+    print("[INFO] Main script started.")
+    config = load_config()
+    if not config:
+        print("🔴 [FATAL] Could not load configuration. Exiting.")
+        return
+
+    detector_settings = None
+    since = _START_TIME
+    while True:
+        run = start_pipeline(config, detector_settings, since)
+        if run is None:
+            return
+        try:
+            run_display(run)
+        finally:
+            stop_pipeline(run)
+        # A config reload that cannot be applied in place hands over its new config and loaded model
+        if not run['restart']:
+            break
+        config, detector_settings, since = run['config'], run['detector_settings'], time.time()
+        print("[INFO] Restarting the pipeline with the reloaded configuration.")
+    print("[INFO] Main script finished.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
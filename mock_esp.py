@@ -1,16 +1,25 @@
+import argparse
+from datetime import datetime
 from flask import Flask
 
 app = Flask(__name__)
 
+def _timestamp():
+    return datetime.now().strftime("%H:%M:%S.%f")[:-3]
+
 @app.route('/buzz_on')
 def buzz_on():
-    print("✅ --- ALARM RECEIVED: BUZZER ON --- ✅")
+    print(f"✅ [{_timestamp()}] --- ALARM RECEIVED: BUZZER ON --- ✅")
     return "Buzzer is now ON", 200
 
 @app.route('/buzz_off')
 def buzz_off():
-    print("❌ --- ALARM RECEIVED: BUZZER OFF --- ❌")
+    print(f"❌ [{_timestamp()}] --- ALARM RECEIVED: BUZZER OFF --- ❌")
     return "Buzzer is now OFF", 200
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000) # localhost:5000 pr routes check krega
\ No newline at end of file
+    # Run several instances on different ports to simulate one ESP per alarm zone
+    parser = argparse.ArgumentParser(description="Mock ESP buzzer for testing the alarm system.")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    app.run(host='0.0.0.0', port=args.port, threaded=True) # localhost:5000 pr routes check krega
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# OpenCV, the model backends and the pipeline are imported by the preload
+# thread, so the control endpoint answers before torch has finished loading.
+CONFIG_PATH = "config/config.yaml"
+
+def read_service_config(config_path=CONFIG_PATH):
+    """The 'service' section of config.yaml, read without importing the pipeline."""
+    import yaml
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    return config.get('service', {})
+
+class PipelineService:
+    """
+    Keeps the detection pipeline's process, imports and loaded model alive
+    between runs, so RUN after a stop, a shift change or a config edit only
+    reconnects the cameras instead of reloading torch and the weights.
+    The model is loaded and warmed up on a blank frame once at start-up, and
+    reloaded only when the model part of config.yaml changes; every other
+    setting is re-read from the file on each start.
+    A local HTTP endpoint controls it: POST /start, /stop, /restart and
+    /shutdown, GET /status (JSON with the run state and time-to-first-frame).
+    The main thread owns the display windows, so it runs the display loop of
+    the active run and cleans the run up when it ends.
+    """
+    def __init__(self, config_path=CONFIG_PATH, host="127.0.0.1", port=8765, warmup=True):
+        self.config_path = config_path
+        self.warmup = warmup
+        self.pipeline = None
+        self.detector = None
+        self.detector_settings = None
+        self.model_key = None
+        self.load_error = None
+        self.run_state = None
+        self.runs = 0
+        self.last_time_to_first_frame = None
+        self.ready = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        service = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/status":
+                    self.send_error(404)
+                    return
+                self._reply(200, service.status())
+
+            def do_POST(self):
+                commands = {"/start": service.start, "/stop": service.stop_run, "/restart": service.restart,
+                            "/shutdown": service.shutdown}
+                command = commands.get(self.path)
+                if command is None:
+                    self.send_error(404)
+                    return
+                ok, message = command()
+                self._reply(200 if ok else 409, dict(service.status(), ok=ok, message=message))
+
+            def log_message(self, format, *args):
+                pass  # Status polls would flood the log
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+
+    @classmethod
+    def from_config(cls, config_path=CONFIG_PATH):
+        service_config = read_service_config(config_path)
+        return cls(config_path,
+                   host=service_config.get('host', '127.0.0.1'),
+                   port=service_config.get('port', 8765),
+                   warmup=service_config.get('warmup', True))
+
+    def _preload(self):
+        """Imports the pipeline and loads (and warms up) the configured model in the background."""
+        start = time.time()
+        try:
+            import main as pipeline
+            from src import detector
+            self.pipeline, self.detector = pipeline, detector
+            config = pipeline.load_config(self.config_path)
+            if config and config.get('execution_mode', 'threads') != 'processes':
+                self._load_model(config)
+            print(f"[SERVICE] Ready in {time.time() - start:.2f}s.")
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"🔴 [ERROR] Service preload failed: {e}")
+        self.ready.set()
+
+    def _load_model(self, config):
+        """Loads the model of 'config' unless the one already loaded matches it. Returns the detector settings or None."""
+        key = self.detector.model_config_key(config)
+        if self.detector_settings is not None and key == self.model_key:
+            # Same model: only the settings read from the rest of the config change
+            self.detector_settings['confidence'] = config.get('confidence_threshold', 0.5)
+            if self.detector_settings.get('pipeline') is not None:
+                for cam_id in range(len(config.get('camera_feeds', []))):
+                    self.detector_settings['pipeline'].reset(cam_id)
+            print("[SERVICE] Reusing the loaded model.")
+            return self.detector_settings
+        detector_settings, _ = self.detector.load_detector_from_config(config=config)
+        if not detector_settings:
+            return None
+        if self.warmup:
+            self.detector.warm_up_detector(detector_settings, config)
+        self.detector_settings, self.model_key = detector_settings, key
+        return detector_settings
+
+    def start(self):
+        """Starts a run with the current config.yaml. A running run is left alone."""
+        requested = time.time()
+        self.ready.wait()
+        if self.pipeline is None:
+            return False, f"pipeline failed to load: {self.load_error}"
+        with self._lock:
+            if self.run_state is not None:
+                return False, "already running"
+            config = self.pipeline.load_config(self.config_path)
+            if not config:
+                return False, "could not load configuration"
+            detector_settings = None
+            # In process mode every worker process loads its own copy of the model
+            if config.get('execution_mode', 'threads') != 'processes':
+                detector_settings = self._load_model(config)
+                if detector_settings is None:
+                    return False, "could not load detector"
+            self.runs += 1
+            print(f"[SERVICE] Starting run {self.runs}.")
+            run = self.pipeline.start_pipeline(config, detector_settings, since=requested, config_path=self.config_path)
+            if run is None:
+                return False, "could not start the pipeline"
+            self.idle.clear()
+            self.run_state = run
+        return True, "started"
+
+    def stop_run(self, timeout=15.0):
+        """Stops the active run and waits for the main thread to clean it up."""
+        run = self.run_state
+        if run is None:
+            return True, "not running"
+        print(f"[SERVICE] Stopping run {self.runs}.")
+        self.pipeline.request_stop(run)
+        if not self.idle.wait(timeout):
+            return False, "run did not stop in time"
+        return True, "stopped"
+
+    def restart(self):
+        """Stops the active run, if any, and starts a new one with the current config."""
+        ok, message = self.stop_run()
+        if not ok:
+            return ok, message
+        return self.start()
+
+    def shutdown(self):
+        """Stops the active run and the service."""
+        self.stop_run()
+        self.stop_event.set()
+        return True, "shutting down"
+
+    def status(self):
+        run = self.run_state
+        return {"ready": self.ready.is_set(),
+                "running": run is not None,
+                "runs": self.runs,
+                "model_loaded": self.detector_settings is not None,
+                "cameras": run['num_cameras'] if run else 0,
+                "time_to_first_frame": run['time_to_first_frame'] if run else self.last_time_to_first_frame}
+
+    def _finish(self, run):
+        """Cleans up an ended run on the main thread."""
+        self.pipeline.stop_pipeline(run)
+        self.last_time_to_first_frame = run['time_to_first_frame']
+        if run['detector_settings'] is not None:
+            # Keep the model a config reload swapped in, so the next start does not load it again
+            self.detector_settings = run['detector_settings']
+            self.model_key = self.detector.model_config_key(run['config'])
+        with self._lock:
+            self.run_state = None
+        self.idle.set()
+        print(f"[SERVICE] Run {self.runs} finished. Waiting for the next start.")
+
+    def run(self):
+        """Serves the control endpoint and runs the display of each started run on the calling (main) thread."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        threading.Thread(target=self._preload, daemon=True).start()
+        host, port = self.httpd.server_address[:2]
+        print(f"[SERVICE] Pipeline service listening on http://{host}:{port}")
+        try:
+            while not self.stop_event.is_set():
+                run = self.run_state
+                if run is None:
+                    time.sleep(0.1)
+                    continue
+                if run['display_mode'] != 'headless':
+                    # Returns when the windows are closed, 'q' is pressed or /stop sets the stop events
+                    self.pipeline.run_display(run)
+                else:
+                    while not self.stop_event.is_set() and not self.pipeline.run_stopped(run['shared_data']):
+                        time.sleep(0.1)
+                self.pipeline.request_stop(run)
+                self._finish(run)
+                if run['restart'] and not self.stop_event.is_set():
+                    # A config reload that could not be applied in place; the new model is already loaded
+                    self.start()
+        except KeyboardInterrupt:
+            print("[SERVICE] Interrupted.")
+            if self.run_state is not None:
+                self.pipeline.request_stop(self.run_state)
+                self._finish(self.run_state)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        print("[SERVICE] Pipeline service stopped.")
+
+def send_command(command, host="127.0.0.1", port=8765, timeout=30.0):
+    """Sends a control command ('start', 'stop', 'restart', 'shutdown' or 'status') to a running service."""
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+    method = "GET" if command == "status" else "POST"
+    request = Request(f"http://{host}:{port}/{command}", data=b"{}" if method == "POST" else None, method=method)
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except HTTPError as e:
+        return json.loads(e.read() or b"{}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Long-lived helmet detection pipeline service.")
+    parser.add_argument("command", nargs="?", default="serve", choices=["serve", "start", "stop", "restart", "shutdown", "status"],
+                        help="'serve' runs the service; the others send a command to a running one")
+    parser.add_argument("--config", default=CONFIG_PATH, help="Path to config.yaml")
+    parser.add_argument("--start", action="store_true", help="With 'serve': start a run as soon as the model is loaded")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # --config is relative to where the command was run; paths inside config.yaml
+    # (models, logs, violations) are relative to the project root
+    args.config = os.path.abspath(args.config)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.command != "serve":
+        service_config = read_service_config(args.config)
+        try:
+            reply = send_command(args.command, service_config.get('host', '127.0.0.1'), service_config.get('port', 8765))
+        except OSError as e:
+            print(f"🔴 [ERROR] Pipeline service is not reachable: {e}")
+            sys.exit(1)
+        print(json.dumps(reply, indent=2))
+        sys.exit(0 if reply.get('ok', True) else 1)
+
+    service = PipelineService.from_config(args.config)
+    if args.start:
+        threading.Thread(target=service.start, daemon=True).start()
+    service.run()
+
+if __name__ == '__main__':
+    main()
@@ -1,98 +1,263 @@
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import serial
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-class CentralAlarm:
+class HttpBuzzer:
     """
-    Manages the buzzer state based on violation statuses from all cameras.
-    The buzzer turns on if any camera reports a violation and only turns
-    off when all cameras are clear.
+    Buzzer on an ESP reachable over WiFi. Commands go through one persistent
+    keep-alive session, with retries and exponential backoff on failures.
     """
-    def __init__(self, config, violation_status):
-        self.config = config
-        self.violation_status = violation_status  # Shared dictionary {cam_id: bool}
-        self.buzzer_state = False
-        self.stop_event = threading.Event()
+    def __init__(self, esp_ip, retries=2, backoff=0.1, timeout=1.0):
+        self.base_url = esp_ip if esp_ip.startswith("http") else f"http://{esp_ip}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff,
+                      status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+
+    def __str__(self):
+        return self.base_url
+
+    def send(self, state):
+        url = f"{self.base_url}/buzz_{'on' if state else 'off'}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except Exception as e:
+            print(f"🔴 [ALARM] WiFi request failed: {e}")
+            return False
+        if not response.ok:
+            print(f"🔴 [ALARM] WiFi command to {url} was rejected: HTTP {response.status_code}")
+            return False
+        print(f" [ALARM] WiFi command sent to {url}")
+        return True
+
+    def close(self):
+        self.session.close()
+
+class SerialBuzzer:
+    """
+    Buzzer on an ESP connected over a serial port. Writes are retried with
+    exponential backoff, reopening the port if the write fails.
+    """
+    def __init__(self, port, retries=2, backoff=0.1):
+        self.port = port
+        self.retries = retries
+        self.backoff = backoff
         self.ser = None
-        self.serial_lock = threading.Lock()
-        
-        # Initialize serial port if WiFi is not used
-        if not self.config.get('use_wifi', True):
-            self._init_serial()
+        self.lock = threading.Lock()
+        self._open()
+
+    def __str__(self):
+        return self.port
 
-    def _init_serial(self):
+    def _open(self):
         """Initializes the serial connection."""
-        port = self.config.get('serial_port')
-        if not port:
-            print("[ALARM] Serial port not configured.")
-            return
         try:
-            self.ser = serial.Serial(port, 115200, timeout=1)
-            print(f"[ALARM] Serial connected on {port}")
+            if self.ser and self.ser.is_open:
+                self.ser.close()
+            self.ser = serial.Serial(self.port, 115200, timeout=1)
+            print(f"[ALARM] Serial connected on {self.port}")
         except Exception as e:
             self.ser = None
-            print(f"🔴 [ALARM] Failed to open serial port {port}: {e}")
-
-    def _send_command(self, state):
-        """Sends the 'on' or 'off' command via WiFi or Serial."""
-        command_str = 'on' if state else 'off'
-        
-        if self.config.get('use_wifi', True):
-            esp_ip = self.config.get('esp_ip')
-            if not esp_ip:
-                print("🔴 [ALARM] WiFi is enabled but ESP IP is not configured.")
-                return
-            try:
-                url = f"http://{esp_ip}/buzz_{command_str}"
-                requests.get(url, timeout=1)
-                print(f" [ALARM] WiFi command sent to {url}")
-            except Exception as e:
-                print(f"🔴 [ALARM] WiFi request failed: {e}")
-        else:
-            if self.ser and self.ser.is_open:
-                cmd = f"buzz_{command_str}\n".encode()
+            print(f"🔴 [ALARM] Failed to open serial port {self.port}: {e}")
+
+    def send(self, state):
+        cmd = f"buzz_{'on' if state else 'off'}\n".encode()
+        with self.lock:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.backoff * (2 ** (attempt - 1)))
+                    self._open()
+                if not (self.ser and self.ser.is_open):
+                    continue
                 try:
-                    with self.serial_lock:
-                        self.ser.write(cmd)
-                    print(f" [ALARM] Serial command sent: {cmd.strip()}")
+                    self.ser.write(cmd)
+                    self.ser.flush()
+                    print(f" [ALARM] Serial command sent to {self.port}: {cmd.strip()}")
+                    return True
                 except Exception as e:
                     print(f"🔴 [ALARM] Serial write failed: {e}")
-            else:
-                print(" [ALARM] Serial port not open, can't send command.")
+        print(f" [ALARM] Serial port {self.port} not open, can't send command.")
+        return False
+
+    def close(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+            print(f"[INFO] Serial port {self.port} closed.")
+
+class AlarmZone:
+    """A buzzer together with the cameras that drive it. 'cameras' of None means all cameras."""
+    def __init__(self, name, device, cameras=None):
+        self.name = name
+        self.device = device
+        self.cameras = cameras
+        self.buzzer_state = False
+
+    def camera_ids(self, violation_status):
+        return [cam_id for cam_id, _ in violation_status.items()] if self.cameras is None else self.cameras
+
+def build_alarm_zones(config, devices=None):
+    """
+    Builds the alarm zones from 'alarm_zones' in the config. Each zone has a
+    'name', a list of 'cameras' and either 'esp_ip' (WiFi) or 'serial_port'.
+    Without 'alarm_zones', a single zone for all cameras is built from the
+    top-level 'use_wifi', 'esp_ip' and 'serial_port' keys. Zones that share
+    a device share one connection. 'devices' maps ('http', ip) and
+    ('serial', port) to open connections, which are reused and added to.
+    """
+    alarm_config = config.get('alarm', {})
+    retries = alarm_config.get('retries', 2)
+    backoff = alarm_config.get('backoff_sec', 0.1)
+    timeout = alarm_config.get('timeout_sec', 1.0)
+
+    zone_configs = config.get('alarm_zones') or [{
+        'name': 'default',
+        'cameras': None,
+        'esp_ip': config.get('esp_ip') if config.get('use_wifi', True) else None,
+        'serial_port': None if config.get('use_wifi', True) else config.get('serial_port'),
+    }]
+
+    devices = {} if devices is None else devices
+    zones = []
+    for index, zone_config in enumerate(zone_configs):
+        name = zone_config.get('name', f"zone{index}")
+        esp_ip = zone_config.get('esp_ip')
+        port = zone_config.get('serial_port')
+        if esp_ip:
+            key = ('http', esp_ip)
+            if key not in devices:
+                devices[key] = HttpBuzzer(esp_ip, retries, backoff, timeout)
+        elif port:
+            key = ('serial', port)
+            if key not in devices:
+                devices[key] = SerialBuzzer(port, retries, backoff)
+        else:
+            print(f"🔴 [ALARM] Zone '{name}' has neither 'esp_ip' nor 'serial_port' configured.")
+            continue
+        zones.append(AlarmZone(name, devices[key], zone_config.get('cameras')))
+    return zones
+
+class CentralAlarm:
+    """
+    Manages the buzzer state based on violation statuses from all cameras.
+    The buzzer turns on if any camera reports a violation and only turns
+    off when all cameras are clear.
+    With several alarm zones, each buzzer follows only its own cameras.
+    Camera workers set 'changed_event' when their status flips, so the alarm
+    reacts immediately instead of polling; commands to different buzzers
+    are sent concurrently.
+    """
+    def __init__(self, config, violation_status, metrics=None, violation_onsets=None, changed_event=None):
+        self.config = config
+        self.violation_status = violation_status  # Shared dictionary {cam_id: bool}
+        self.metrics = metrics
+        self.violation_onsets = violation_onsets  # {cam_id: time.time() when the violation started}
+        self.changed_event = changed_event or threading.Event()
+        self.stop_event = threading.Event()
+        # Fallback re-check interval in case a change notification is missed
+        self.poll_interval = config.get('alarm', {}).get('poll_interval_sec', 1.0)
+
+        self.devices = {}
+        self.zones = build_alarm_zones(config, self.devices)
+        self._zones_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.zones)), thread_name_prefix="alarm")
+
+    @property
+    def buzzer_state(self):
+        return any(zone.buzzer_state for zone in self.zones)
+
+    def notify(self):
+        """Wakes up the alarm loop after a camera's violation status changed."""
+        self.changed_event.set()
+
+    def _send_zone(self, zone, state, command_start):
+        """Sends 'state' to the zone's buzzer. Returns True if the device took the command."""
+        if not zone.device.send(state):
+            return False
+        if self.metrics:
+            self.metrics.observe('alarm', 'alarm_command', time.perf_counter() - command_start)
+            if state and self.violation_onsets is not None:
+                onsets = [self.violation_onsets[cam_id] for cam_id in zone.camera_ids(self.violation_status)
+                          if self.violation_status.get(cam_id, False) and self.violation_onsets[cam_id]]
+                if onsets:
+                    self.metrics.observe('alarm', 'alarm_chain', time.time() - min(onsets))
+        return True
+
+    def _update_zones(self):
+        """
+        Sends a command to every zone whose desired buzzer state changed,
+        concurrently. A zone's state only changes once its command went
+        through, so a failed command is sent again on the next check.
+        """
+        futures = []
+        command_start = time.perf_counter()
+        with self._zones_lock:
+            for zone in self.zones:
+                is_any_violation = any(self.violation_status.get(cam_id, False) for cam_id in zone.camera_ids(self.violation_status))
+                if is_any_violation != zone.buzzer_state:
+                    if is_any_violation:
+                        print(f" [ALARM] Violation detected! Turning buzzer ON ({zone.name}).")
+                    else:
+                        print(f" [ALARM] All streams clear. Turning buzzer OFF ({zone.name}).")
+                    futures.append((zone, is_any_violation,
+                                    self.executor.submit(self._send_zone, zone, is_any_violation, command_start)))
+            for zone, state, future in futures:
+                if future.result():
+                    zone.buzzer_state = state
+
+    def reload(self, config):
+        """
+        Rebuilds the alarm zones from a changed config while the alarm keeps
+        running. Connections to devices that are still configured are kept,
+        along with their buzzer state; devices that are gone are turned off
+        and closed.
+        """
+        with self._zones_lock:
+            devices = dict(self.devices)
+            zones = build_alarm_zones(config, devices)
+            for zone in zones:
+                zone.buzzer_state = any(old.buzzer_state for old in self.zones if old.device is zone.device)
+            used = {id(zone.device) for zone in zones}
+            for device in self.devices.values():
+                if id(device) not in used:
+                    if any(old.buzzer_state for old in self.zones if old.device is device):
+                        device.send(False)
+                    device.close()
+            self.zones = zones
+            self.devices = {key: device for key, device in devices.items() if id(device) in used}
+        print(f"[ALARM] Alarm zones reloaded: {len(zones)} zone(s).")
+        self.changed_event.set()
 
     def run(self):
         """
-        The main loop for the alarm thread. Periodically checks the shared
-        violation status and updates the buzzer accordingly.
+        The main loop for the alarm thread. Wakes up on every violation status
+        change (or after the poll interval) and updates the buzzers.
         """
-        print("[INFO] Central Alarm System started.")
+        print(f"[INFO] Central Alarm System started with {len(self.zones)} zone(s).")
         while not self.stop_event.is_set():
+            self.changed_event.wait(timeout=self.poll_interval)
+            self.changed_event.clear()
+            if self.stop_event.is_set():
+                break
             try:
-                # Check if any value in the dictionary is True
-                is_any_violation = any(self.violation_status.values())
-
-                if is_any_violation and not self.buzzer_state:
-                    print(" [ALARM] Violation detected! Turning buzzer ON.")
-                    self._send_command(True)
-                    self.buzzer_state = True
-                elif not is_any_violation and self.buzzer_state:
-                    print(" [ALARM] All streams clear. Turning buzzer OFF.")
-                    self._send_command(False)
-                    self.buzzer_state = False
-
+                self._update_zones()
             except Exception as e:
                 print(f"🔴 [ERROR] Unhandled error in alarm loop: {e}")
 
-            time.sleep(1) # Check status every second
-
         print("[INFO] Central Alarm System stopping...")
-        if self.buzzer_state: # Ensure buzzer is off on exit
-            self._send_command(False)
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-            print("[INFO] Serial port closed.")
+        for zone in self.zones:
+            if zone.buzzer_state:  # Ensure buzzers are off on exit
+                zone.device.send(False)
+                zone.buzzer_state = False
+        self.executor.shutdown(wait=True)
+        for device in {id(zone.device): zone.device for zone in self.zones}.values():
+            device.close()
 
     def stop(self):
         """Signals the alarm thread to stop."""
-        self.stop_event.set()
\ No newline at end of file
+        self.stop_event.set()
+        self.changed_event.set()
@@ -0,0 +1,297 @@
+import argparse
+import ast
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from src.detections import Detections, box_iou, non_max_suppression
+
+DEFAULT_CALIBRATION_VIDEOS = "data/*.mp4"
+
+class UltralyticsBackend:
+    """
+    Runs a model through ultralytics (PyTorch). This is the reference backend
+    and the one used when a model has no 'backend' key in config.yaml.
+    """
+    name = "ultralytics"
+
+    def __init__(self, model_path, imgsz=None):
+        # Imported here so ONNX-only deployments do not pay for torch at start-up
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.imgsz = imgsz
+
+    def infer(self, frames, confidence, imgsz=None):
+        """Runs one forward pass over a list of frames. Returns one Detections per frame."""
+        kwargs = {}
+        if imgsz or self.imgsz:
+            kwargs['imgsz'] = imgsz or self.imgsz
+        results = self.model.predict(
+            source=frames,
+            conf=confidence,
+            stream=False,
+            verbose=False,
+            **kwargs)
+        return [Detections.from_array(result.boxes.data.cpu().numpy()) for result in results]
+
+class OnnxBackend:
+    """
+    Runs an exported YOLO ONNX model through ONNX Runtime on the CPU.
+    Frames are letterboxed to the model's input size and stacked into one
+    batch; the raw output is decoded and filtered with NumPy.
+    Other execution providers (e.g. OpenVINOExecutionProvider) can be selected
+    with the 'providers' list of the model's config entry.
+    """
+    name = "onnx"
+
+    def __init__(self, onnx_path, names=None, imgsz=640, providers=None, iou_threshold=0.45, threads=0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ["CPUExecutionProvider"]) if p in available] or ["CPUExecutionProvider"]
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.onnx_path = onnx_path
+        self.iou_threshold = iou_threshold
+
+        # ultralytics stores the class names and input size in the model metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else (names or {})
+        if 'imgsz' in metadata:
+            imgsz = ast.literal_eval(metadata['imgsz'])
+        self.imgsz = imgsz if isinstance(imgsz, int) else int(max(imgsz))
+
+        input_shape = self.session.get_inputs()[0].shape
+        self.dynamic_batch = not isinstance(input_shape[0], int)
+
+    def _letterbox(self, frame):
+        """Resizes a frame to fit the square model input, padding the rest. Returns (image, gain, pad_x, pad_y)."""
+        h, w = frame.shape[:2]
+        gain = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * gain)), int(round(h * gain))
+        pad_x, pad_y = (self.imgsz - new_w) // 2, (self.imgsz - new_h) // 2
+        image = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else frame
+        image = cv2.copyMakeBorder(image, pad_y, self.imgsz - new_h - pad_y, pad_x, self.imgsz - new_w - pad_x,
+                                   cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return image, gain, pad_x, pad_y
+
+    def preprocess(self, frames):
+        """Letterboxes a list of BGR frames into one NCHW float32 RGB blob."""
+        letterboxed = [self._letterbox(frame) for frame in frames]
+        blob = cv2.dnn.blobFromImages([item[0] for item in letterboxed], 1 / 255.0, swapRB=True)
+        return blob, [item[1:] for item in letterboxed]
+
+    def _decode(self, pred, confidence, frame_shape, gain, pad_x, pad_y):
+        """Decodes one (4 + num_classes, N) prediction into Detections in frame coordinates."""
+        pred = pred.T
+        scores = pred[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(scores)), class_ids]
+        keep = confs >= confidence
+        if not keep.any():
+            return Detections()
+        xywh, confs, class_ids = pred[keep, :4], confs[keep], class_ids[keep]
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+        kept = non_max_suppression(boxes, confs, class_ids, self.iou_threshold)
+        boxes = (boxes[kept] - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / gain
+        h, w = frame_shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        return Detections(boxes.astype(np.float32), confs[kept].astype(np.float32), class_ids[kept].astype(np.int32))
+
+    def infer(self, frames, confidence, imgsz=None):
+        """Runs one forward pass over a list of frames. Returns one Detections per frame."""
+        blob, transforms = self.preprocess(frames)
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(blob))])
+        return [self._decode(pred, confidence, frame.shape, *transform)
+                for pred, frame, transform in zip(outputs, frames, transforms)]
+
+def sample_video_frames(pattern=DEFAULT_CALIBRATION_VIDEOS, max_frames=200):
+    """Samples up to max_frames frames, evenly spread over all videos matching the glob pattern."""
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        return []
+    per_video = max(1, max_frames // len(paths))
+    frames = []
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        for index in np.linspace(0, total - 1, num=min(per_video, total), dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames[:max_frames]
+
+def export_onnx(model_path, imgsz=640):
+    """
+    Exports the PyTorch weights to ONNX next to the weights file, once.
+    The export is reused as long as it is newer than the weights.
+    """
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(model_path):
+        return onnx_path
+    from ultralytics import YOLO
+    print(f"[INFO] Exporting {model_path} to ONNX (imgsz {imgsz})...")
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    return str(exported)
+
+def quantize_int8(onnx_path, calibration_videos=DEFAULT_CALIBRATION_VIDEOS, calibration_frames=200):
+    """
+    Statically quantizes an ONNX model to INT8, calibrated on frames sampled
+    from the given videos. The result is cached next to the ONNX file.
+    """
+    int8_path = os.path.splitext(onnx_path)[0] + ".int8.onnx"
+    if os.path.exists(int8_path) and os.path.getmtime(int8_path) >= os.path.getmtime(onnx_path):
+        return int8_path
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    backend = OnnxBackend(onnx_path)
+    frames = sample_video_frames(calibration_videos, calibration_frames)
+    if not frames:
+        raise ValueError(f"No calibration frames found for '{calibration_videos}'")
+
+    class _FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            return {backend.input_name: backend.preprocess([frame])[0]}
+
+    print(f"[INFO] Quantizing {onnx_path} to INT8 with {len(frames)} calibration frames...")
+    quantize_static(onnx_path, int8_path, _FrameReader(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True)
+    return int8_path
+
+def load_backend(model_config, names=None):
+    """
+    Builds the inference backend for one entry of 'models' in config.yaml.
+    'backend' selects 'ultralytics' (default) or 'onnx'; ONNX models can also
+    set 'quantize: int8', 'providers', 'imgsz' and 'threads'.
+    """
+    model_path = model_config['model_path']
+    backend = model_config.get('backend', 'ultralytics')
+    imgsz = model_config.get('imgsz', 640)
+
+    if backend == 'ultralytics':
+        return UltralyticsBackend(model_path, model_config.get('imgsz'))
+    if backend == 'onnx':
+        onnx_path = export_onnx(model_path, imgsz)
+        if model_config.get('quantize') == 'int8':
+            onnx_path = quantize_int8(onnx_path,
+                                      model_config.get('calibration_videos', DEFAULT_CALIBRATION_VIDEOS),
+                                      model_config.get('calibration_frames', 200))
+        print(f"[INFO] Using ONNX Runtime backend: {onnx_path}")
+        return OnnxBackend(onnx_path, names=names, imgsz=imgsz,
+                           providers=model_config.get('providers'),
+                           threads=model_config.get('threads', 0))
+    raise ValueError(f"Unknown detector backend '{backend}'")
+
+def compare_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Compares a candidate backend's detections against the reference backend's,
+    frame by frame. The reference boxes are treated as ground truth.
+    Returns mAP@iou_threshold, box agreement (2 * matched / total boxes) and
+    the mean IoU of matched boxes.
+    """
+    records = []  # (conf, is_true_positive, class_id)
+    ref_counts = {}
+    matched_ious = []
+    total_ref = total_cand = 0
+
+    for ref, cand in zip(reference, candidate):
+        total_ref += len(ref)
+        total_cand += len(cand)
+        for class_id in ref.class_ids.tolist():
+            ref_counts[class_id] = ref_counts.get(class_id, 0) + 1
+        ious = box_iou(cand.boxes, ref.boxes)
+        ious[cand.class_ids[:, None] != ref.class_ids[None, :]] = 0
+        used = np.zeros(len(ref), dtype=bool)
+        for i in np.argsort(-cand.confs):
+            candidates = np.where(~used, ious[i], 0) if len(ref) else np.zeros(0)
+            j = int(candidates.argmax()) if len(candidates) else -1
+            is_match = j >= 0 and candidates[j] >= iou_threshold
+            if is_match:
+                used[j] = True
+                matched_ious.append(float(candidates[j]))
+            records.append((float(cand.confs[i]), is_match, int(cand.class_ids[i])))
+
+    average_precisions = []
+    for class_id, n_ref in ref_counts.items():
+        class_records = sorted((r for r in records if r[2] == class_id), key=lambda r: -r[0])
+        tp = np.cumsum([r[1] for r in class_records]) if class_records else np.zeros(0)
+        fp = np.cumsum([not r[1] for r in class_records]) if class_records else np.zeros(0)
+        recall = np.concatenate(([0.0], tp / n_ref, [1.0]))
+        precision = np.concatenate(([1.0], tp / np.maximum(tp + fp, 1e-9), [0.0]))
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        average_precisions.append(float(np.sum(np.diff(recall) * precision[1:])))
+
+    return {
+        "map": float(np.mean(average_precisions)) if average_precisions else 1.0,
+        "box_agreement": 2 * len(matched_ious) / (total_ref + total_cand) if (total_ref + total_cand) else 1.0,
+        "mean_iou": float(np.mean(matched_ious)) if matched_ious else 0.0,
+        "reference_boxes": total_ref,
+        "candidate_boxes": total_cand,
+    }
+
+def _timed_inference(backend, frames, confidence):
+    start = time.perf_counter()
+    detections = [backend.infer([frame], confidence)[0] for frame in frames]
+    return detections, (time.perf_counter() - start) / max(1, len(frames))
+
+def main():
+    """Validates a model's configured backend against the PyTorch reference and reports the speedup."""
+    parser = argparse.ArgumentParser(description="Validate a detector backend against the PyTorch reference.")
+    parser.add_argument("--model", required=True, help="Model key under 'models' in config.yaml (e.g. helmet)")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--videos", default=DEFAULT_CALIBRATION_VIDEOS)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--conf", type=float, default=None)
+    args = parser.parse_args()
+
+    from src.detector import load_config
+    config = load_config(args.config)
+    if not config or args.model not in config.get('models', {}):
+        print(f"🔴 [ERROR] Model '{args.model}' is not configured in {args.config}.")
+        return
+    model_config = config['models'][args.model]
+    confidence = args.conf if args.conf is not None else config.get('confidence_threshold', 0.5)
+
+    frames = sample_video_frames(args.videos, args.frames)
+    reference = UltralyticsBackend(model_config['model_path'], model_config.get('imgsz'))
+    candidate = load_backend(model_config)
+
+    ref_detections, ref_time = _timed_inference(reference, frames, confidence)
+    cand_detections, cand_time = _timed_inference(candidate, frames, confidence)
+    report = compare_detections(ref_detections, cand_detections)
+    report.update({
+        "model": args.model,
+        "backend": model_config.get('backend', 'ultralytics'),
+        "quantize": model_config.get('quantize'),
+        "frames": len(frames),
+        "reference_ms_per_frame": ref_time * 1000,
+        "candidate_ms_per_frame": cand_time * 1000,
+        "speedup": ref_time / cand_time if cand_time else 0.0,
+    })
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
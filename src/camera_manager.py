@@ -0,0 +1,84 @@
+import threading
+from src.camera_worker import camera_loop
+
+class CameraManager:
+    """
+    Starts and stops individual camera threads of one process while the rest
+    keep running, e.g. when a cluster coordinator hands cameras to this node
+    or config.yaml gains or loses a camera.
+    Every camera gets its own stop event in shared_data['stop_events'] (a dict
+    keyed by camera id). When a camera stops, its violation flag, ROI, latest
+    frame and scheduler share are dropped, so nothing holds on to a camera
+    that is gone.
+    """
+    def __init__(self, detector_settings, shared_data):
+        self.detector_settings = detector_settings
+        self.shared_data = shared_data
+        self.threads = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    def running(self):
+        """{cam_id: stream_url} of the camera threads that are alive."""
+        with self._lock:
+            return {cam_id: self.sources[cam_id] for cam_id, thread in self.threads.items() if thread.is_alive()}
+
+    def start_camera(self, cam_id, stream_url):
+        """Starts a camera thread. A camera already running the same stream is left alone. Returns True if started."""
+        with self._lock:
+            thread = self.threads.get(cam_id)
+            if thread is not None and thread.is_alive() and self.sources[cam_id] == stream_url:
+                return False
+        if cam_id in self.threads:
+            self.stop_camera(cam_id)
+
+        shared_data = self.shared_data
+        with shared_data['lock']:
+            shared_data['violation_status'][cam_id] = False
+            if shared_data.get('violation_onsets') is not None:
+                shared_data['violation_onsets'][cam_id] = 0.0
+        shared_data['stop_events'][cam_id] = threading.Event()
+        thread = threading.Thread(target=camera_loop, args=(cam_id, stream_url, self.detector_settings, shared_data),
+                                  daemon=True)
+        with self._lock:
+            self.threads[cam_id] = thread
+            self.sources[cam_id] = stream_url
+        thread.start()
+        print(f"[INFO] Camera {cam_id} started ({stream_url}).")
+        return True
+
+    def stop_camera(self, cam_id, timeout=5.0):
+        """Stops one camera thread and clears its violation flag."""
+        with self._lock:
+            thread = self.threads.pop(cam_id, None)
+            self.sources.pop(cam_id, None)
+        if thread is None:
+            return False
+        self.shared_data['stop_events'][cam_id].set()
+        thread.join(timeout=timeout)
+        with self.shared_data['lock']:
+            was_violating = self.shared_data['violation_status'].pop(cam_id, False)
+            self.shared_data['roi_coords'].pop(cam_id, None)
+        self.shared_data['frame_store'].remove(cam_id)
+        if self.shared_data.get('scheduler') is not None:
+            self.shared_data['scheduler'].remove(cam_id)
+        if was_violating and self.shared_data.get('violation_changed') is not None:
+            self.shared_data['violation_changed'].set()
+        print(f"[INFO] Camera {cam_id} stopped.")
+        return True
+
+    def apply(self, cameras):
+        """
+        Makes the running cameras match {cam_id: stream_url}: stops the ones not
+        listed (or whose stream changed) and starts the missing or dead ones.
+        Returns (started, stopped) lists of camera ids.
+        """
+        stopped = [cam_id for cam_id in list(self.threads) if cam_id not in cameras]
+        for cam_id in stopped:
+            self.stop_camera(cam_id)
+        started = [cam_id for cam_id, stream_url in sorted(cameras.items()) if self.start_camera(cam_id, stream_url)]
+        return started, stopped
+
+    def stop_all(self):
+        for cam_id in list(self.threads):
+            self.stop_camera(cam_id)
@@ -1,54 +1,100 @@
 import cv2
+import numpy as np
 import time
 import os
 from datetime import datetime
+from src.frame_grabber import FrameGrabber
+from src.motion import MotionGate
+from src.tracker import SortTracker
+from src.metrics import StageClock
+from src.detections import ClassLookup, Detections
+from src.model_pipeline import ModelPipeline
+from src.zones import ZoneMask
+from src.tiling import TiledDetector
 
 RESIZE_DIM = (640, 480)
 
-def run_detection(model, frame, confidence):
+def run_detection(model, frame, confidence, class_lookup=None, cam_id=None):
     """
-    Performs object detection on a single frame using the provided YOLO model.
+    Performs object detection on a single frame using the provided detector backend.
+    A multi-model pipeline also gets the camera id, for its per-model cadence.
     """
-    results = model.predict(
-        source=frame, 
-        conf=confidence,
-        stream=False, 
-        verbose=False)[0]
-    
-    detections = []
-    for box in results.boxes.data:
-        x1, y1, x2, y2, conf, cls = box.tolist()
-        class_id = int(cls)
-        class_name = results.names[class_id]
-        if class_name == "ignore":
-            continue
-        detections.append({
-            'box': [x1, y1, x2, y2],
-            'conf': conf,
-            'class': class_name
-        })
-    return detections
+    if isinstance(model, ModelPipeline):
+        detections = model.infer([frame], confidence, cam_ids=[cam_id])[0]
+    else:
+        detections = model.infer([frame], confidence)[0]
+    return drop_ignored(detections, class_lookup or ClassLookup(model.names))
+
+def drop_ignored(detections, class_lookup):
+    """Removes boxes of the 'ignore' class with one mask operation."""
+    return detections.filter(~class_lookup.ignore_mask(detections.class_ids))
+
+def frame_box(box, roi_rect):
+    """Converts a box detected inside the ROI crop to full-frame coordinates."""
+    if roi_rect is None:
+        return box
+    x, y = roi_rect[:2]
+    return box + np.array([x, y, x, y], dtype=box.dtype)
+
+def native_rect(roi_rect, frame_shape, resize_dim):
+    """Maps an (x, y, w, h) rectangle in display (resize_dim) coordinates to (x1, y1, x2, y2) on the native frame."""
+    frame_h, frame_w = frame_shape[:2]
+    sx, sy = frame_w / resize_dim[0], frame_h / resize_dim[1]
+    x, y, w, h = roi_rect
+    return int(x * sx), int(y * sy), min(frame_w, int(round((x + w) * sx))), min(frame_h, int(round((y + h) * sy)))
+
+def native_roi_crop(frame, roi_rect, resize_dim, max_side=640):
+    """
+    Cuts an ROI given in display (resize_dim) coordinates out of the
+    native-resolution frame, downscaling it only if it is larger than the
+    model input 'max_side'. Returns the crop and the (sx, sy) factors that
+    map boxes on the crop back to display ROI coordinates.
+    """
+    x1, y1, x2, y2 = native_rect(roi_rect, frame.shape, resize_dim)
+    crop = frame[y1:y2, x1:x2]
+    if crop.size and max_side and max(crop.shape[:2]) > max_side:
+        scale = max_side / max(crop.shape[:2])
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if not crop.size:
+        return crop, (1.0, 1.0)
+    return crop, (roi_rect[2] / crop.shape[1], roi_rect[3] / crop.shape[0])
+
+def run_tiled_detection(tiler, model, frame, confidence, class_lookup, roi_rect, resize_dim):
+    """
+    Detects on native-resolution tiles of the frame (or of its ROI) in one
+    batch and returns the boxes in display ROI coordinates, like run_detection.
+    """
+    region = native_rect(roi_rect, frame.shape, resize_dim) if roi_rect else None
+    def infer(images):
+        # Tiles are one batch of their own; a pipeline runs every model on every tile
+        return [drop_ignored(detections, class_lookup) for detections in model.infer(images, confidence)]
+
+    detections = tiler.detect(frame, infer, region)
+    detections = detections.scale(resize_dim[0] / frame.shape[1], resize_dim[1] / frame.shape[0])
+    return detections.offset(-roi_rect[0], -roi_rect[1]) if roi_rect else detections
 
 def ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def log_violation(cam_id, violation_count):
+def log_violation(cam_id, violation_count, track_id=None):
     ensure_dir("logs")
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    track_text = f" | New violation track: {track_id}" if track_id is not None else ""
     with open("logs/alerts.log", "a") as f:
         f.write(
-            f"[{now}] Camera {cam_id} | Violations in frame: {violation_count}\n")
+            f"[{now}] Camera {cam_id} | Violations in frame: {violation_count}{track_text}\n")
 
-def save_violation_images(frame, detection, cam_id, frame_count, violation_index):
+def save_violation_images(frame, box, cam_id, frame_count, violation_index):
     try:
         output_dir = "violations"
         ensure_dir(output_dir)
-        x1, y1, x2, y2 = map(int, detection['box'])
+        x1, y1, x2, y2 = map(int, box)
         cropped_image = frame[y1:y2, x1:x2]
         now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = os.path.join(output_dir, f"cam{cam_id}_{now}_frame{frame_count}_viol{violation_index}.jpg")
         cv2.imwrite(filename, cropped_image)
+        return filename
     except Exception as e:
         print(f"🔴 [ERROR] Cam {cam_id}: Could not save violation image: {e}")
 
@@ -56,23 +102,57 @@ def camera_loop(cam_id, stream_url, detector_settings, shared_data):
     """
     Main loop for a single camera thread.
     Handles frame grabbing, detection, and updating shared data structures.
+    A config reload may replace shared_data['detector_settings'] (new
+    threshold or model) and shared_data['config']; both are picked up
+    between frames.
     """
-    model = detector_settings['model']
-    threshold = detector_settings['confidence']
-    perform_violation_check = detector_settings['perform_violation_check']
-    no_helmet_class = detector_settings.get('no_helmet_class')
-
     config = shared_data['config']
     lock = shared_data['lock']
+    frame_store = shared_data['frame_store']
+    inference_server = shared_data.get('inference_server')
+    evidence_writer = shared_data.get('evidence_writer')
+    clip_recorder = shared_data.get('clip_recorder')
+    violation_store = shared_data.get('violation_store')
+    scheduler = shared_data.get('scheduler')
+    metrics = shared_data.get('metrics')
+    clock = StageClock(metrics, cam_id)
+    violation_onsets = shared_data.get('violation_onsets')
+    violation_changed = shared_data.get('violation_changed')
+    resize_dim = tuple(config.get('resize_dim', RESIZE_DIM))
     stop_event = shared_data['stop_events'][cam_id]
     
     image_save_cooldown = config.get('alarm_cooldown_sec', 15)
 
-    cap = cv2.VideoCapture(stream_url)
-    if not cap.isOpened():
+    capture_config = config.get('capture', {})
+    grabber = FrameGrabber(
+        cam_id, stream_url,
+        skip_decode=capture_config.get('skip_decode', False),
+        pace_files=capture_config.get('pace_files', True))
+    if not grabber.start():
         print(f"❌ [ERROR] Cannot open camera {cam_id} at {stream_url}")
         return
         
+    motion_gate = MotionGate.from_config(config, cam_id) if config.get('motion_gate', {}).get('enabled', False) else None
+    tracker_config = config.get('tracker', {})
+    tracker = SortTracker.from_config(config) if tracker_config.get('enabled', False) else None
+    detect_every = max(1, int(tracker_config.get('detect_every', 1))) if tracker else 1
+    roi_config = config.get('roi', {})
+    use_native_roi = roi_config.get('native_crop', True)
+    roi_max_side = roi_config.get('max_side', 640)
+    zone_mask = ZoneMask.from_config(config, cam_id, resize_dim)
+    tiler = TiledDetector.from_config(config, cam_id)
+    if tiler:
+        print(f"[INFO] Cam {cam_id}: tiled inference with {tiler.tile_size}px tiles, {tiler.overlap:.0%} overlap")
+    if zone_mask:
+        print(f"[INFO] Cam {cam_id}: detections limited to zones {zone_mask.names}")
+    # Local files replay cached detections; tiled inference keeps its own per-tile state and is not cached
+    cacheable = grabber.is_file and tiler is None
+    active_settings = None
+    cache_segment = None
+    cache_resolution = None
+    detections = None
+    last_roi = None
+
     frame_count = 0
     last_image_save_time = 0
     
@@ -80,78 +160,267 @@ def camera_loop(cam_id, stream_url, detector_settings, shared_data):
     
     while not stop_event.is_set():
         try:
-            ret, frame = cap.read()
+            # Bind the current detector settings; a reload swaps the whole dict, so a frame never mixes two models
+            current_settings = shared_data.get('detector_settings') or detector_settings
+            if current_settings is not active_settings:
+                model_changed = active_settings is not None and current_settings['model'] is not active_settings['model']
+                active_settings = current_settings
+                model = active_settings['model']
+                threshold = active_settings['confidence']
+                perform_violation_check = active_settings['perform_violation_check']
+                class_lookup = active_settings['class_lookup']
+                pipeline = active_settings.get('pipeline')
+                detection_cache = shared_data.get('detection_cache')
+                # The cache stores boxes down to its confidence floor, so the live threshold is applied after inference
+                low_confidence = detection_cache is not None and pipeline is None
+                infer_confidence = min(threshold, detection_cache.min_confidence) if low_confidence else threshold
+                if not cacheable:
+                    detection_cache = None
+                detector = (model, infer_confidence, class_lookup)
+                if model_changed:
+                    # Boxes, tracks and cached segments of the old model mean nothing to the new one
+                    detections = None
+                    cache_segment = cache_resolution = None
+                    if tracker:
+                        tracker.reset()
+                    if pipeline:
+                        pipeline.reset(cam_id)
+                    if tiler:
+                        tiler.reset()
+                    print(f"[INFO] Cam {cam_id}: switched to the reloaded model.")
+            if shared_data['config'] is not config:
+                config = shared_data['config']
+                image_save_cooldown = config.get('alarm_cooldown_sec', 15)
+
+            # Always process the newest frame; older unread frames are dropped by the grabber
+            clock.start()
+            ret, frame = grabber.read(timeout=1.0)
             if not ret:
-                print(f"⚠️  [WARNING] Camera {cam_id} disconnected. Retrying...")
-                time.sleep(2)
-                cap.release()
-                cap = cv2.VideoCapture(stream_url)
                 continue
+            frame_start = clock.lap('capture')
 
             frame_count += 1
             start_time = time.time()
-            resized_frame = cv2.resize(frame, RESIZE_DIM)
+            # Render straight into the frame store's back buffer; publishing then needs no copy
+            back_buffer = frame_store.begin_write(cam_id, (resize_dim[1], resize_dim[0], 3))
+            resized_frame = cv2.resize(frame, resize_dim, dst=back_buffer)
+            clock.lap('resize')
             
+            wait_start = time.perf_counter()
             with lock:
+                clock.since('lock_wait', wait_start)
                 roi = shared_data['roi_coords'].get(cam_id)
             
             process_frame = resized_frame
-            roi_display_frame = None
+            roi_rect = None
 
             if roi:
                 x, y, w, h = roi
-                x, y, w, h = max(0,x), max(0,y), min(w, RESIZE_DIM[0]-x), min(h, RESIZE_DIM[1]-y)
+                x, y, w, h = max(0,x), max(0,y), min(w, resize_dim[0]-x), min(h, resize_dim[1]-y)
                 process_frame = resized_frame[y:y+h, x:x+w]
+                roi_rect = (x, y, w, h)
                 cv2.rectangle(resized_frame, (x, y), (x + w, y + h), (255, 255, 0), 2)
             
             if process_frame.size == 0: continue
 
-            detections = run_detection(model, process_frame, threshold)
-            no_of_violations = 0
+            # Small ROIs are cut from the native frame, so the model is not fed an upscaled, downscaled image
+            model_input, input_scale = process_frame, None
+            if roi_rect and use_native_roi and not tiler and (frame.shape[1] > resize_dim[0] or frame.shape[0] > resize_dim[1]):
+                model_input, input_scale = native_roi_crop(frame, roi_rect, resize_dim, roi_max_side)
+                if model_input.size == 0:
+                    model_input, input_scale = process_frame, None
+            clock.lap('roi_crop')
+
+            # Previous detections and tracks are only valid for the same ROI
+            if roi != last_roi:
+                detections = None
+                last_roi = roi
+                if motion_gate:
+                    motion_gate.reset()
+                if tracker:
+                    tracker.reset()
+                if pipeline:
+                    pipeline.reset(cam_id)
+                if tiler:
+                    tiler.reset()
 
+            # Run detection every 'detect_every' frames, when the scheduler grants this camera a slot
+            # of the inference budget, and only when the motion gate sees a change
+            due = frame_count % detect_every == 0 and (scheduler is None or scheduler.admit(cam_id))
+            run_inference = detections is None or (due and (motion_gate is None or motion_gate.check(process_frame)))
+            if scheduler and run_inference:
+                # Only a frame that is really inferred uses up the camera's slot
+                scheduler.grant(cam_id)
+            clock.lap('motion_gate')
+            if run_inference:
+                if scheduler and not tiler:
+                    # Quiet cameras may run on a smaller model input
+                    scale = scheduler.input_scale(cam_id)
+                    if scale < 1.0:
+                        height, width = model_input.shape[:2]
+                        model_input = cv2.resize(model_input, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                                 interpolation=cv2.INTER_AREA)
+                        sx, sy = input_scale or (1.0, 1.0)
+                        input_scale = (sx * width / model_input.shape[1], sy * height / model_input.shape[0])
+                if detection_cache:
+                    resolution = [list(model_input.shape[:2]), list(roi_rect) if roi_rect else None]
+                    if resolution != cache_resolution:
+                        cache_segment = detection_cache.open(stream_url, resolution, infer_confidence)
+                        cache_resolution = resolution
+                cached = detection_cache.lookup(cache_segment, grabber.frame_index, threshold) if cache_segment else None
+                if cached is not None:
+                    result = cached
+                elif tiler:
+                    result = run_tiled_detection(tiler, model, frame, threshold, class_lookup, roi_rect, resize_dim)
+                elif inference_server:
+                    result = inference_server.infer(cam_id, model_input, detector)
+                else:
+                    result = run_detection(model, model_input, infer_confidence, class_lookup, cam_id)
+                if result is None:
+                    # A newer frame from this camera superseded this one in the inference batch:
+                    # keep the previous detections and carry the tracks forward as on a skipped frame
+                    run_inference = False
+                    if detections is None:
+                        detections = Detections()
+                else:
+                    detections = result
+                    if cache_segment and cached is None:
+                        cache_segment.put(grabber.frame_index, detections, infer_confidence)
+                    if low_confidence:
+                        detections = detections.filter(detections.confs >= threshold)
+                    if input_scale:
+                        detections = detections.scale(*input_scale)
+                    # Boxes outside every zone are gone before tracking, drawing and logging
+                    if zone_mask:
+                        detections = zone_mask.filter(detections, *(roi_rect[:2] if roi_rect else (0, 0)))
+                clock.lap('inference')
+            violation_mask = class_lookup.violation_mask(detections.class_ids)
+
+            new_violation_ids = []
+            if tracker:
+                # Violations are confirmed per track; skipped frames carry boxes forward
+                tracked = tracker.update(detections, violation_mask) if run_inference else tracker.predict()
+                display_detections = tracked.detections
+                display_violations = tracked.violations
+                new_violation_ids = tracked.new_violations
+            else:
+                display_detections = detections
+                display_violations = violation_mask
+
+            no_of_violations = 0
             if perform_violation_check:
-                current_violations = [det for det in detections if det['class'] == no_helmet_class]
-                no_of_violations = len(current_violations)
+                no_of_violations = int(display_violations.sum())
                 violation_in_frame = no_of_violations > 0
 
+                wait_start = time.perf_counter()
                 with lock:
+                    clock.since('lock_wait', wait_start)
+                    status_changed = violation_in_frame != shared_data['violation_status'][cam_id]
+                    # Remember when this violation started, for alarm latency metrics
+                    if violation_in_frame and status_changed and violation_onsets is not None:
+                        violation_onsets[cam_id] = time.time()
                     shared_data['violation_status'][cam_id] = violation_in_frame
+                # Wake up the alarm right away instead of waiting for its next check
+                if status_changed and violation_changed is not None:
+                    violation_changed.set()
                 
-                if violation_in_frame:
+                if tracker:
+                    # One record and one evidence crop per newly confirmed track
+                    for track_id in new_violation_ids:
+                        index = np.flatnonzero(display_detections.track_ids == track_id)[0]
+                        box = display_detections.boxes[index]
+                        if not violation_store:
+                            # alerts.log is only the record when the violation database is disabled
+                            (evidence_writer.log_violation if evidence_writer else log_violation)(cam_id, no_of_violations, track_id)
+                        if evidence_writer:
+                            evidence = evidence_writer.save_violation_image(process_frame, box, cam_id, frame_count, track_id)
+                        else:
+                            evidence = save_violation_images(process_frame, box, cam_id, frame_count, track_id)
+                        if violation_store:
+                            violation_store.record(cam_id, frame_box(box, roi_rect), display_detections.confs[index],
+                                                   class_lookup.names[display_detections.class_ids[index]], track_id, evidence)
+                        if clip_recorder:
+                            clip_recorder.trigger(cam_id, f"track{track_id}")
+                elif violation_in_frame:
                     current_time = time.time()
                     if current_time - last_image_save_time > image_save_cooldown:
-                        log_violation(cam_id, no_of_violations)
-                        for index, det in enumerate(current_violations):
-                            save_violation_images(process_frame, det, cam_id, frame_count, index + 1)
+                        violations = detections.filter(violation_mask)
+                        if not violation_store:
+                            (evidence_writer.log_violation if evidence_writer else log_violation)(cam_id, no_of_violations)
+                        for index, box in enumerate(violations.boxes):
+                            if evidence_writer:
+                                evidence = evidence_writer.save_violation_image(process_frame, box, cam_id, frame_count, index + 1)
+                            else:
+                                evidence = save_violation_images(process_frame, box, cam_id, frame_count, index + 1)
+                            if violation_store:
+                                violation_store.record(cam_id, frame_box(box, roi_rect), violations.confs[index],
+                                                       class_lookup.names[violations.class_ids[index]], None, evidence)
+                        if clip_recorder:
+                            clip_recorder.trigger(cam_id)
                         last_image_save_time = current_time
+
+            if scheduler:
+                # People in view or a changing scene keep the camera's priority up
+                motion = len(detections) > 0 or (
+                    motion_gate is not None and motion_gate.last_changed_fraction >= motion_gate.min_changed_fraction)
+                scheduler.record(cam_id, run_inference, motion, no_of_violations > 0)
             
-            for det in detections:
-                x1, y1, x2, y2 = map(int, det['box'])
-                class_name = det['class']
-                label = f"{class_name.upper()} {det['conf']:.2f}"
+            clock.lap('postprocess')
+
+            if zone_mask:
+                zone_mask.draw(resized_frame)
+            boxes = display_detections.boxes.astype(np.int32)
+            track_ids = display_detections.track_ids if tracker else [None] * len(boxes)
+            for box, conf, class_id, is_violation, track_id in zip(boxes, display_detections.confs, display_detections.class_ids, display_violations, track_ids):
+                x1, y1, x2, y2 = box.tolist()
+                label = f"{class_lookup.labels[class_id]} {conf:.2f}"
+                if track_id is not None:
+                    label = f"#{track_id} {label}"
                 
-                color = (0, 0, 255) if perform_violation_check and class_name == no_helmet_class else (0, 255, 0)
+                color = (0, 0, 255) if is_violation else (0, 255, 0)
                 cv2.rectangle(process_frame, (x1, y1), (x2, y2), color, 2)
                 cv2.putText(process_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             
-            if roi:
-                roi_display_frame = process_frame
-
             fps = 1 / (time.time() - start_time) if (time.time() - start_time) > 0 else 0
             
             stat_text = f"FPS: {fps:.2f} | "
-            stat_text += f"Violations: {no_of_violations}" if perform_violation_check else f"Detections: {len(detections)}"
+            stat_text += f"Violations: {no_of_violations}" if perform_violation_check else f"Detections: {len(display_detections)}"
+            stat_text += f" | Dropped: {grabber.frames_dropped}"
+            if motion_gate:
+                stat_text += f" | Skipped: {motion_gate.skipped}/{motion_gate.skipped + motion_gate.inferred}"
+            if tiler:
+                stat_text += f" | Static tiles: {tiler.tiles_skipped}/{tiler.tiles_skipped + tiler.tiles_inferred}"
+            if scheduler:
+                schedule = scheduler.cameras.get(cam_id)
+                if schedule:
+                    stat_text += f" | Sched: {schedule.effective_fps:.1f}/{schedule.target_fps:.1f} fps"
+            if cache_segment:
+                stat_text += f" | Cached: {detection_cache.hits}/{detection_cache.hits + detection_cache.misses}"
 
             cv2.putText(resized_frame, stat_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            if clip_recorder:
+                clip_recorder.add_frame(cam_id, resized_frame)
+            clock.lap('draw')
             
-            with lock:
-                shared_data['frame_dict'][cam_id] = resized_frame.copy()
-                if roi_display_frame is not None:
-                    shared_data['roi_frame_dict'][cam_id] = roi_display_frame.copy()
+            # The ROI view is the ROI region of the published frame
+            frame_store.publish(cam_id, resized_frame, roi_rect)
+            clock.lap('publish')
+            clock.since('frame', frame_start)
+
+            if metrics:
+                metrics.set_gauge(cam_id, 'frames_captured', grabber.frames_read)
+                metrics.set_gauge(cam_id, 'frames_dropped', grabber.frames_dropped)
+                metrics.set_gauge(cam_id, 'violations', no_of_violations)
+                if motion_gate:
+                    metrics.set_gauge(cam_id, 'motion_inferred', motion_gate.inferred)
+                    metrics.set_gauge(cam_id, 'motion_skipped', motion_gate.skipped)
 
         except Exception as e:
             print(f"🔴 [ERROR] An error occurred in camera_loop for Cam {cam_id}: {e}")
             time.sleep(5)
 
     print(f"[INFO] Thread for Camera {cam_id} finished. Cleaning up.")
-    cap.release()
\ No newline at end of file
+    print(f"[INFO] Cam {cam_id}: {grabber.frames_read} frames captured, {grabber.frames_dropped} dropped.")
+    if motion_gate:
+        print(f"[INFO] Cam {cam_id}: motion gate inferred {motion_gate.inferred} frames, skipped {motion_gate.skipped}.")
+    grabber.stop()
\ No newline at end of file
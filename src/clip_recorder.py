@@ -0,0 +1,197 @@
+import cv2
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+
+class _CameraBuffer:
+    """
+    JPEG-compressed recent frames of one camera, bounded by a byte budget
+    together with the camera's raw frames still waiting for compression.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.frames = deque()  # (timestamp, jpeg bytes)
+        self.size = 0
+        self.queued = 0  # bytes of raw frames in the hand-off queue
+        self.last_added = 0.0
+        self.clip = None  # clip still collecting post-event frames
+
+    def append(self, timestamp, jpeg, keep_since):
+        self.frames.append((timestamp, jpeg))
+        self.size += len(jpeg)
+        # Enforce the memory budget first, then drop frames older than the pre-event window
+        while self.frames and (self.size + self.queued > self.budget_bytes or self.frames[0][0] < keep_since):
+            self.size -= len(self.frames.popleft()[1])
+
+class _Clip:
+    def __init__(self, cam_id, filename, start_time, end_time, frames):
+        self.cam_id = cam_id
+        self.filename = filename
+        self.start_time = start_time
+        self.end_time = end_time
+        self.frames = frames
+        self.size = sum(len(jpeg) for _, jpeg in frames)
+
+class ClipRecorder:
+    """
+    Keeps the last 'pre_sec' seconds of every camera as JPEG-compressed frames
+    and, when a violation is confirmed, saves a video clip running from
+    'pre_sec' before to 'post_sec' after it.
+    Camera threads only copy a frame into a hand-off queue; compression
+    happens on the recorder thread and clips are encoded on a separate writer
+    thread, so neither ever blocks detection. Each camera's buffer, together
+    with its raw frames still in the hand-off queue, is held under
+    'memory_budget_mb', and so is each clip still collecting frames; the
+    oldest frames are dropped to stay within it. Triggers that arrive while a clip
+    of that camera is still recording extend it instead of starting another.
+    """
+    def __init__(self, output_dir="clips", pre_sec=5.0, post_sec=5.0, record_fps=10, memory_budget_mb=32,
+                 jpeg_quality=75, max_clip_sec=60.0, metrics=None):
+        self.output_dir = output_dir
+        self.pre_sec = pre_sec
+        self.post_sec = post_sec
+        self.min_interval = 1.0 / record_fps if record_fps else 0.0
+        self.budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.max_clip_sec = max_clip_sec
+        self.metrics = metrics
+
+        self.buffers = {}
+        self.frames_dropped = 0
+        self.clips_written = 0
+
+        self._incoming = deque()
+        self._cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-writer")
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _buffer(self, cam_id):
+        buffer = self.buffers.get(cam_id)
+        if buffer is None:
+            buffer = self.buffers.setdefault(cam_id, _CameraBuffer(self.budget_bytes))
+        return buffer
+
+    def add_frame(self, cam_id, frame):
+        """Copies the annotated frame for the pre-event buffer, at most 'record_fps' times per second."""
+        now = time.time()
+        buffer = self._buffer(cam_id)
+        if now - buffer.last_added < self.min_interval:
+            return
+        buffer.last_added = now
+        with self._cond:
+            # Raw frames count against the camera's budget; drop its oldest waiting one, never a trigger
+            while buffer.queued and buffer.queued + frame.nbytes > self.budget_bytes:
+                for index, item in enumerate(self._incoming):
+                    if item[0] == 'frame' and item[1] == cam_id:
+                        del self._incoming[index]
+                        buffer.queued -= item[3].nbytes
+                        self.frames_dropped += 1
+                        break
+            self._incoming.append(('frame', cam_id, now, frame.copy()))
+            buffer.queued += frame.nbytes
+            self._cond.notify()
+
+    def trigger(self, cam_id, label="violation"):
+        """Requests a clip around the current moment for this camera."""
+        now = time.time()
+        stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d_%H-%M-%S")
+        filename = os.path.join(self.output_dir, f"cam{cam_id}_{stamp}_{label}.mp4")
+        with self._cond:
+            self._incoming.append(('trigger', cam_id, now, filename))
+            self._cond.notify()
+
+    def _start_clip(self, cam_id, timestamp, filename):
+        buffer = self._buffer(cam_id)
+        if buffer.clip is not None:
+            # Still recording a clip for this camera; keep it going instead
+            buffer.clip.end_time = min(timestamp + self.post_sec, buffer.clip.start_time + self.max_clip_sec)
+            return
+        frames = [item for item in buffer.frames if item[0] >= timestamp - self.pre_sec]
+        start_time = frames[0][0] if frames else timestamp
+        buffer.clip = _Clip(cam_id, filename, start_time, timestamp + self.post_sec, frames)
+
+    def _add_compressed(self, cam_id, timestamp, frame):
+        ok, jpeg = cv2.imencode('.jpg', frame, self.encode_params)
+        if not ok:
+            return
+        jpeg = jpeg.tobytes()
+        buffer = self._buffer(cam_id)
+        buffer.append(timestamp, jpeg, timestamp - self.pre_sec)
+
+        clip = buffer.clip
+        if clip is None:
+            return
+        if timestamp <= clip.end_time and clip.size + len(jpeg) <= self.budget_bytes:
+            clip.frames.append((timestamp, jpeg))
+            clip.size += len(jpeg)
+        else:
+            buffer.clip = None
+            self._writer.submit(self._write_clip, clip)
+
+    def _write_clip(self, clip):
+        """Decodes the clip's JPEG frames and encodes them as one video file."""
+        if not clip.frames:
+            return
+        try:
+            write_start = time.perf_counter()
+            duration = clip.frames[-1][0] - clip.frames[0][0]
+            fps = max(1.0, (len(clip.frames) - 1) / duration) if duration > 0 else 1.0
+            first = cv2.imdecode(np.frombuffer(clip.frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+            height, width = first.shape[:2]
+            writer = cv2.VideoWriter(clip.filename, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+            for _, jpeg in clip.frames:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+            writer.release()
+            self.clips_written += 1
+            print(f"[INFO] Cam {clip.cam_id}: saved violation clip {clip.filename} ({duration:.1f}s, {len(clip.frames)} frames)")
+            if self.metrics:
+                self.metrics.observe(clip.cam_id, 'clip_write', time.perf_counter() - write_start)
+        except Exception as e:
+            print(f"🔴 [ERROR] Cam {clip.cam_id}: Could not write violation clip {clip.filename}: {e}")
+
+    def run(self):
+        """The main loop for the recorder thread: compresses frames and collects clips."""
+        print("[INFO] Clip recorder started.")
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._incoming or self.stop_event.is_set(), timeout=1.0)
+                if not self._incoming and self.stop_event.is_set():
+                    break
+                items = list(self._incoming)
+                self._incoming.clear()
+            for kind, cam_id, timestamp, payload in items:
+                try:
+                    if kind == 'trigger':
+                        self._start_clip(cam_id, timestamp, payload)
+                    else:
+                        with self._cond:
+                            self._buffer(cam_id).queued -= payload.nbytes
+                        self._add_compressed(cam_id, timestamp, payload)
+                except Exception as e:
+                    print(f"🔴 [ERROR] Cam {cam_id}: Clip recorder failed: {e}")
+            if self.metrics:
+                for cam_id, buffer in list(self.buffers.items()):
+                    self.metrics.set_gauge(cam_id, 'clip_buffer_bytes', buffer.size)
+
+        # Save the clips still recording with whatever frames they have
+        for buffer in self.buffers.values():
+            if buffer.clip is not None:
+                self._writer.submit(self._write_clip, buffer.clip)
+                buffer.clip = None
+        self._writer.shutdown(wait=True)
+        print(f"[INFO] Clip recorder stopped: {self.clips_written} clips written, {self.frames_dropped} frames dropped.")
+
+    def stop(self):
+        """Signals the recorder thread to finish pending clips and stop."""
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify()
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from src.detection_cache import DetectionCache
+from src.detector import load_config, load_detector_from_config, model_config_key, warm_up_detector
+
+# Keys that are applied to a running pipeline; changes to any other key take effect on the next start
+CAMERA_KEYS = ('camera_feeds', 'camera_titles')
+ALARM_KEYS = ('esp_ip', 'use_wifi', 'serial_port', 'alarm_zones', 'alarm')
+LIVE_KEYS = CAMERA_KEYS + ALARM_KEYS + ('confidence_threshold', 'alarm_cooldown_sec', 'detection_model',
+                                       'pipeline_models', 'models', 'hot_reload', 'service')
+
+def camera_title(config, index):
+    """Title of the camera at 'index' in camera_feeds, falling back to 'Camera <index>'."""
+    titles = config.get('camera_titles') or []
+    return (titles[index] if index < len(titles) else None) or f"Camera {index}"
+
+def assign_camera_ids(current, camera_feeds):
+    """
+    Maps the new camera_feeds onto camera ids. A stream that is still
+    configured keeps its id (and its running thread); new streams take the
+    lowest free ids. 'current' is {cam_id: stream_url}. Returns {cam_id: index
+    in camera_feeds}.
+    """
+    ids_by_url = {}
+    for cam_id, url in sorted(current.items()):
+        ids_by_url.setdefault(url, []).append(cam_id)
+    assignment = {}
+    added = []
+    for index, url in enumerate(camera_feeds):
+        ids = ids_by_url.get(url)
+        if ids:
+            assignment[ids.pop(0)] = index
+        else:
+            added.append(index)
+    cam_id = 0
+    for index in added:
+        while cam_id in assignment:
+            cam_id += 1
+        assignment[cam_id] = index
+    return assignment
+
+def config_changes(old, new):
+    """Sorted top-level keys whose value differs between two configs, including added and removed keys."""
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+def needs_restart(running_settings, new_settings):
+    """
+    True if swapping in the detector 'new_settings' turns violation checking
+    on or off, which the running alarm and evidence services cannot follow.
+    """
+    return new_settings['perform_violation_check'] != running_settings['perform_violation_check']
+
+class ConfigReloader:
+    """
+    Watches config.yaml and applies what changed to a running threads-mode
+    pipeline, so saving settings in the GUI no longer needs a restart.
+    - camera_feeds / camera_titles: only the cameras that were added, removed
+      or whose stream changed are started or stopped; the others keep running.
+    - confidence_threshold and alarm_cooldown_sec: changed in place.
+    - detection_model / pipeline_models / models: the new model is loaded and
+      warmed up next to the running one, then swapped in; every camera moves
+      over on its next frame. If the swap turns violation checking on or off,
+      the pipeline is restarted instead (with the already loaded model), since
+      the alarm and evidence services depend on it.
+    - esp_ip / use_wifi / serial_port / alarm_zones / alarm: the alarm zones
+      are rebuilt.
+    Any other change is reported and takes effect on the next start.
+    The file is polled every 'poll_sec' and only read once its size and
+    mtime have settled, so a half-written file is never applied.
+    'run' is the run state returned by main.start_pipeline().
+    """
+    def __init__(self, config_path, run, poll_sec=1.0, settle_sec=0.2):
+        self.config_path = config_path
+        self.run_state = run
+        self.poll_sec = poll_sec
+        self.settle_sec = settle_sec
+        self.reloads = 0
+        self.stop_event = threading.Event()
+        self._stamp = self._file_stamp()
+
+    @classmethod
+    def from_config(cls, config, config_path, run):
+        """Builds the reloader from the 'hot_reload' config section, or returns None if it is disabled."""
+        reload_config = config.get('hot_reload', {})
+        if not reload_config.get('enabled', False):
+            return None
+        return cls(config_path, run, poll_sec=reload_config.get('poll_sec', 1.0))
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reads and applies the config if the file changed since the last check. Returns True if it was applied."""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        # Wait for the writer to finish before parsing
+        time.sleep(self.settle_sec)
+        if self._file_stamp() != stamp:
+            return False
+        self._stamp = stamp
+        config = load_config(self.config_path)
+        if not config:
+            print("⚠️  [WARNING] Changed config.yaml could not be loaded; keeping the running configuration.")
+            return False
+        return self.apply(config)
+
+    def apply(self, config):
+        """Applies the difference between the running config and 'config'."""
+        run = self.run_state
+        shared_data = run['shared_data']
+        old = run['config']
+        changed = config_changes(old, config)
+        if not changed:
+            return False
+        print(f"[RELOAD] config.yaml changed: {', '.join(changed)}")
+        start = time.time()
+
+        detector_settings = shared_data['detector_settings']
+        if model_config_key(config) != model_config_key(old):
+            # Load next to the running model; the cameras keep using the old one meanwhile
+            new_settings, _ = load_detector_from_config(config=config)
+            if not new_settings:
+                print("🔴 [ERROR] Could not load the new model; keeping the running configuration.")
+                return False
+            warm_up_detector(new_settings, config)
+            if needs_restart(detector_settings, new_settings):
+                self._restart(config, new_settings, "Violation checking changed")
+                return True
+            if shared_data.get('detection_cache') is not None:
+                # Cached detections are keyed by the model, so a new model gets its own cache entries
+                shared_data['detection_cache'] = DetectionCache.from_config(config)
+            detector_settings = new_settings
+        elif config.get('confidence_threshold', 0.5) != old.get('confidence_threshold', 0.5):
+            detector_settings = dict(detector_settings, confidence=config.get('confidence_threshold', 0.5))
+
+        # Swapping the references is atomic; camera threads pick both up at their next frame
+        shared_data['config'] = config
+        shared_data['detector_settings'] = detector_settings
+        run['config'] = config
+        run['detector_settings'] = detector_settings
+
+        if any(key in changed for key in CAMERA_KEYS):
+            self._apply_cameras(config)
+        if run['alarm_system'] and any(key in changed for key in ALARM_KEYS):
+            run['alarm_system'].reload(config)
+
+        pending = [key for key in changed if key not in LIVE_KEYS]
+        if pending:
+            print(f"[RELOAD] Not applied until the next start: {', '.join(pending)}")
+        self.reloads += 1
+        print(f"[RELOAD] Applied in {time.time() - start:.2f}s.")
+        return True
+
+    def _apply_cameras(self, config):
+        """Starts and stops only the cameras that changed, and updates the display titles."""
+        run = self.run_state
+        camera_feeds = config.get('camera_feeds', [])
+        manager = run['camera_manager']
+        assignment = assign_camera_ids(dict(manager.sources), camera_feeds)
+
+        window_names = run['window_names']
+        for cam_id in [cam_id for cam_id in list(window_names) if cam_id not in assignment]:
+            del window_names[cam_id]
+        started, stopped = manager.apply({cam_id: camera_feeds[index] for cam_id, index in assignment.items()})
+        for cam_id, index in assignment.items():
+            window_names[cam_id] = camera_title(config, index)
+        run['num_cameras'] = len(assignment)
+        if run['stream_server']:
+            run['stream_server'].set_titles([window_names.get(cam_id) for cam_id in range(max(assignment, default=-1) + 1)],
+                                           restarted=started)
+        print(f"[RELOAD] Cameras started: {started or 'none'}, stopped: {stopped or 'none'}, "
+              f"unchanged: {len(assignment) - len(started)}")
+
+    def _restart(self, config, detector_settings, reason):
+        """Ends the run and hands the new config and loaded model to the next one."""
+        print(f"[RELOAD] {reason}; restarting the pipeline with the new configuration.")
+        self.run_state.update(restart=True, config=config, detector_settings=detector_settings)
+        for event in list(self.run_state['shared_data']['stop_events'].values()):
+            event.set()
+        self.stop()
+
+    def run(self):
+        """The main loop for the config watcher thread."""
+        print(f"[INFO] Watching {self.config_path} for changes (every {self.poll_sec:g}s).")
+        while not self.stop_event.wait(self.poll_sec):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"🔴 [ERROR] Failed to apply config change: {e}")
+
+    def stop(self):
+        """Signals the watcher thread to stop."""
+        self.stop_event.set()
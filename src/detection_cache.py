@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from src.detections import Detections
+from src.detector import MODEL_KEY_MAP
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_MISSING = -1
+# Header of a segment's '.idx' file: magic, format version and the confidence floor its detections were stored at
+_HEADER = struct.Struct("<4sId")
+_MAGIC = b"DCIX"
+_VERSION = 1
+_weights_hashes = {}
+
+def _lock(f, shared=False, blocking=True):
+    """
+    Locks the open file 'f' against other processes. Returns False if
+    'blocking' is off and the lock is taken. Windows has no shared locks, so
+    there a shared lock is a no-op; a mapped file cannot be deleted there anyway.
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    if shared:
+        return True
+    f.seek(0)
+    try:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def _file_lock(path):
+    """Holds an exclusive lock on 'path', shared with other processes, while the block runs."""
+    with open(path, 'a+b') as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+def weights_hash(path):
+    """SHA-1 of a model weights file, computed once per (path, size, mtime). Non-file paths hash their name."""
+    if not os.path.isfile(path):
+        return hashlib.sha1(str(path).encode()).hexdigest()
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _weights_hashes:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _weights_hashes[key] = digest.hexdigest()
+    return _weights_hashes[key]
+
+def source_fingerprint(path):
+    """Identifies a video file by its absolute path, size and modification time."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def model_fingerprint(config):
+    """
+    Describes everything about the configured model(s) that changes the raw
+    detections: the weights hash, backend and input size of each model, plus
+    each stage's confidence and cadence for a multi-model pipeline.
+    """
+    def describe(model_key):
+        model_config = config['models'][model_key]
+        return [model_key, weights_hash(model_config['model_path']), model_config.get('backend', 'ultralytics'),
+                model_config.get('imgsz')]
+
+    pipeline_models = config.get('pipeline_models') or []
+    if pipeline_models:
+        default_confidence = config.get('confidence_threshold', 0.5)
+        return json.dumps([describe(stage['model']) + [stage.get('confidence', default_confidence), stage.get('every', 1)]
+                           for stage in pipeline_models])
+    return json.dumps(describe(MODEL_KEY_MAP[config.get('detection_model', '').strip()]))
+
+class _CacheSegment:
+    """
+    Cached detections of one (source, model, resolution) combination.
+    '<key>.idx' is a small header followed by a memory-mapped (frames, 2)
+    int64 array holding the first row and row count of every frame in
+    '<key>.dat', a flat file of float32 (x1, y1, x2, y2, conf, class) rows
+    that is only ever appended to and is read through a memory map, so a
+    lookup is two array slices.
+    The header records the confidence floor the detections are stored at,
+    set by whoever creates the segment. Several processes (camera workers,
+    audit.py) may share a segment: creating it and appending to it hold
+    '<key>.lock', so they never truncate each other's files or record the
+    same data offset, and every open segment holds a shared lock on its
+    '.idx' file, which eviction in another process respects.
+    """
+    def __init__(self, base_path, frame_count, max_bytes, confidence_floor):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        index_path, data_path = base_path + ".idx", base_path + ".dat"
+        with _file_lock(base_path + ".lock"):
+            floor = self._read_floor(index_path, frame_count)
+            if floor is None:
+                with open(index_path, 'wb') as f:
+                    f.write(_HEADER.pack(_MAGIC, _VERSION, confidence_floor))
+                    np.full((frame_count, 2), _MISSING, dtype=np.int64).tofile(f)
+                open(data_path, 'wb').close()
+                floor = confidence_floor
+            # Taken before '.lock' is released, so an evicting process cannot delete the files in between
+            self._in_use = open(index_path, 'rb')
+            _lock(self._in_use, shared=True)
+        self.confidence_floor = floor
+        self.index = np.memmap(index_path, dtype=np.int64, mode='r+', offset=_HEADER.size, shape=(frame_count, 2))
+        self._data_path = data_path
+        self._rows = os.path.getsize(data_path) // 24
+        self._data = None
+        self._mapped_rows = 0
+        self.full = False
+
+    @staticmethod
+    def _read_floor(index_path, frame_count):
+        """The confidence floor of an existing, well-formed index file, or None if it has to be created."""
+        if not os.path.exists(index_path) or os.path.getsize(index_path) != _HEADER.size + frame_count * 16:
+            return None
+        with open(index_path, 'rb') as f:
+            magic, version, floor = _HEADER.unpack(f.read(_HEADER.size))
+        return floor if magic == _MAGIC and version == _VERSION else None
+
+    def _view(self, end):
+        """Maps the data file again if rows up to 'end' were appended after it was last mapped."""
+        if end > self._mapped_rows:
+            rows = os.path.getsize(self._data_path) // 24
+            self._data = np.memmap(self._data_path, dtype=np.float32, mode='r', shape=(rows, 6))
+            self._mapped_rows = rows
+        return self._data
+
+    def get(self, frame_index):
+        """Returns the cached Detections of a frame, or None if it was never stored."""
+        if frame_index is None or not 0 <= frame_index < len(self.index):
+            return None
+        start, count = self.index[frame_index]
+        if start == _MISSING:
+            return None
+        if count == 0:
+            return Detections()
+        with self._lock:
+            rows = np.array(self._view(start + count)[start:start + count])
+        return Detections.from_array(rows)
+
+    def put(self, frame_index, detections, confidence):
+        """
+        Appends a frame's detections, found at 'confidence'. Detections found
+        above the segment's floor are not stored, since they lack the boxes in
+        between. Stops storing once the segment reaches the cache size limit.
+        """
+        if self.full or frame_index is None or not 0 <= frame_index < len(self.index):
+            return
+        if confidence > self.confidence_floor + 1e-9:
+            return
+        rows = detections.to_array()
+        with self._lock:
+            if self.index[frame_index, 0] != _MISSING:
+                return
+            if (self._rows + len(rows)) * 24 > self.max_bytes:
+                self.full = True
+                print(f"⚠️  [WARNING] Detection cache segment {self.base_path} reached the size limit; not caching further frames.")
+                return
+            with _file_lock(self.base_path + ".lock"):
+                # Another process sharing the segment may have stored this frame meanwhile
+                if self.index[frame_index, 0] != _MISSING:
+                    return
+                start = self._rows
+                if len(rows):
+                    with open(self._data_path, 'ab') as f:
+                        # Other processes append to the same file; its real end, read under the lock, wins
+                        start = os.fstat(f.fileno()).st_size // 24
+                        f.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+                # The index entry is written last, so a reader never sees rows that are not on disk yet
+                self.index[frame_index] = (start, len(rows))
+            self._rows = start + len(rows)
+
+    def size(self):
+        return self._rows * 24 + _HEADER.size + self.index.nbytes
+
+class DetectionCache:
+    """
+    On-disk cache of raw detections for local video files, so re-running the
+    same footage after changing thresholds, colours, zones or violation rules
+    replays the detections instead of running the model again.
+    Entries are keyed by the source file (path, size and mtime), the model
+    fingerprint (weights hash, backend, input size) and the inference
+    resolution (model input shape and ROI). Detections are stored down to
+    'min_confidence' (or the live threshold, if lower), and the live
+    threshold is applied on replay. A segment stored at a floor above the
+    requested threshold is a miss.
+    The cache directory is kept under 'max_size_mb' by deleting the least
+    recently used segments.
+    """
+    def __init__(self, model_key, cache_dir="cache/detections", max_size_mb=512, min_confidence=0.1):
+        self.model_key = model_key
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.min_confidence = min_confidence
+
+        self.hits = 0
+        self.misses = 0
+        self._segments = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds the cache from the 'detection_cache' config section, or returns None if it is disabled."""
+        cache_config = config.get('detection_cache', {})
+        if not cache_config.get('enabled', False):
+            return None
+        return cls(model_fingerprint(config),
+                   cache_dir=cache_config.get('cache_dir', 'cache/detections'),
+                   max_size_mb=cache_config.get('max_size_mb', 512),
+                   min_confidence=cache_config.get('min_confidence', 0.1))
+
+    def open(self, source, resolution, confidence):
+        """
+        Returns the segment for a video file at the given inference resolution
+        (any JSON-serialisable description of the model input), or None if
+        the source is not a local file with a known frame count. 'confidence'
+        is the confidence the caller infers at; a new segment takes it as its
+        floor.
+        """
+        if not isinstance(source, str) or not os.path.isfile(source):
+            return None
+        key = hashlib.sha1(json.dumps([source_fingerprint(source), self.model_key, resolution]).encode()).hexdigest()[:24]
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is not None:
+                return segment
+            cap = cv2.VideoCapture(source)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            if frame_count <= 0:
+                return None
+            base_path = os.path.join(self.cache_dir, key)
+            segment = _CacheSegment(base_path, frame_count, self.max_bytes, confidence)
+            self._segments[key] = segment
+            # The index file's mtime marks when the segment was last used, for eviction
+            os.utime(base_path + ".idx")
+            with open(base_path + ".json", 'w') as f:
+                json.dump({"source": os.path.abspath(source), "model": self.model_key, "resolution": resolution,
+                           "frames": frame_count, "confidence_floor": segment.confidence_floor,
+                           "last_used": time.time()}, f)
+            self._evict(exclude=set(self._segments))
+        return segment
+
+    def lookup(self, segment, frame_index, threshold):
+        """
+        Cached detections of a frame (counted as a hit), or None (counted as a
+        miss). A segment whose floor is above 'threshold' always misses.
+        """
+        usable = segment is not None and segment.confidence_floor <= threshold + 1e-9
+        detections = segment.get(frame_index) if usable else None
+        if detections is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return detections
+
+    def _evict(self, exclude):
+        """
+        Deletes the least recently used segments until the cache directory fits
+        'max_size_mb'. Segments that any process still has open are skipped.
+        The '.lock' files are kept, as another process may be waiting on one.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".idx"):
+                continue
+            key = name[:-4]
+            paths = [os.path.join(self.cache_dir, key + ext) for ext in (".idx", ".dat", ".json")]
+            size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+            total += size
+            if key not in exclude:
+                entries.append((os.path.getmtime(paths[0]), size, key, paths))
+        for _, size, key, paths in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._remove_unused(key, paths):
+                total -= size
+                print(f"[INFO] Detection cache: evicted {key} ({size / 1e6:.1f} MB)")
+
+    def _remove_unused(self, key, paths):
+        """Deletes a segment's files unless a process holds it open. Returns True if it was deleted."""
+        with _file_lock(os.path.join(self.cache_dir, key + ".lock")):
+            try:
+                index_file = open(paths[0], 'rb')
+            except FileNotFoundError:
+                return False
+            with index_file:
+                if not _lock(index_file, blocking=False):
+                    return False
+                _unlock(index_file)
+            # Still under '.lock', so no process can open the segment before it is gone
+            try:
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError:
+                # Windows refuses to delete a file that is still mapped
+                return False
+        return True
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "segments": len(self._segments), "bytes": sum(segment.size() for segment in self._segments.values())}
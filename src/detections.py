@@ -0,0 +1,125 @@
+import numpy as np
+
+class Detections:
+    """
+    Compact, array-based detection result for one frame.
+    'boxes' is an (N, 4) float32 array of x1, y1, x2, y2 pixel coordinates,
+    'confs' an (N,) float32 array and 'class_ids' an (N,) int32 array.
+    Filtering and offsetting work on the whole arrays at once, and the
+    result can be packed into a single (N, 6) array for cheap transport.
+    """
+    __slots__ = ('boxes', 'confs', 'class_ids', 'track_ids')
+
+    def __init__(self, boxes=None, confs=None, class_ids=None, track_ids=None):
+        self.boxes = np.zeros((0, 4), dtype=np.float32) if boxes is None else boxes
+        self.confs = np.zeros(0, dtype=np.float32) if confs is None else confs
+        self.class_ids = np.zeros(0, dtype=np.int32) if class_ids is None else class_ids
+        self.track_ids = track_ids  # set by the tracker, None for raw detections
+
+    @classmethod
+    def from_array(cls, data):
+        """Builds detections from an (N, 6) array of x1, y1, x2, y2, conf, class."""
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        return cls(data[:, :4], data[:, 4], data[:, 5].astype(np.int32))
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Joins the detections of several models for the same frame into one result."""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(np.concatenate([part.boxes for part in parts]),
+                   np.concatenate([part.confs for part in parts]),
+                   np.concatenate([part.class_ids for part in parts]))
+
+    def to_array(self):
+        """Packs the detections into a single (N, 6) float32 array."""
+        return np.column_stack((self.boxes, self.confs, self.class_ids)).astype(np.float32, copy=False)
+
+    def __len__(self):
+        return len(self.confs)
+
+    def filter(self, mask):
+        """Returns the detections selected by a boolean mask or index array."""
+        track_ids = self.track_ids[mask] if self.track_ids is not None else None
+        return Detections(self.boxes[mask], self.confs[mask], self.class_ids[mask], track_ids)
+
+    def scale(self, sx, sy):
+        """Returns the detections with x scaled by sx and y by sy, e.g. from model input to display coordinates."""
+        return Detections(self.boxes * np.array([sx, sy, sx, sy], dtype=np.float32), self.confs, self.class_ids, self.track_ids)
+
+    def offset(self, dx, dy):
+        """Returns the detections shifted by (dx, dy), e.g. from ROI to frame coordinates."""
+        return Detections(self.boxes + np.array([dx, dy, dx, dy], dtype=np.float32), self.confs, self.class_ids, self.track_ids)
+
+class ClassLookup:
+    """
+    Precomputed per-class tables for a model, indexed by class id.
+    Lets the camera loop resolve 'ignore' and violation classes for all
+    boxes of a frame with a single array lookup instead of a name per box.
+    """
+    def __init__(self, names, violation_classes=()):
+        if isinstance(names, dict):
+            size = max(names.keys(), default=-1) + 1
+            names = [names.get(i, str(i)) for i in range(size)]
+        self.names = list(names)
+        self.labels = [name.upper() for name in self.names]
+        self.ignore = np.array([name == "ignore" for name in self.names], dtype=bool)
+        self.violation = np.array([name in violation_classes for name in self.names], dtype=bool)
+
+    @classmethod
+    def concat(cls, lookups):
+        """Combines the lookups of several models into one, with each model's class ids following the previous model's."""
+        combined = cls([])
+        for lookup in lookups:
+            combined.names += lookup.names
+            combined.labels += lookup.labels
+        combined.ignore = np.concatenate([lookup.ignore for lookup in lookups]) if lookups else combined.ignore
+        combined.violation = np.concatenate([lookup.violation for lookup in lookups]) if lookups else combined.violation
+        return combined
+
+    def ignore_mask(self, class_ids):
+        return self.ignore[class_ids]
+
+    def violation_mask(self, class_ids):
+        return self.violation[class_ids]
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU matrix between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]).clip(0) * (boxes_a[:, 3] - boxes_a[:, 1]).clip(0)
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]).clip(0) * (boxes_b[:, 3] - boxes_b[:, 1]).clip(0)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    wh = (bottom_right - top_left).clip(0)
+    inter = wh[..., 0] * wh[..., 1]
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def non_max_suppression(boxes, scores, class_ids=None, iou_threshold=0.45, max_det=300):
+    """
+    Greedy non-maximum suppression. When class ids are given, boxes of
+    different classes never suppress each other (boxes are shifted apart per
+    class). Returns the indices of the kept boxes, highest score first.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if class_ids is not None:
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float32) * (boxes.max() + 1))[:, None]
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = np.argsort(-np.asarray(scores))
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
@@ -1,51 +1,151 @@
+import json
+import time
+import numpy as np
 import yaml
-from ultralytics import YOLO
+from src.backends import load_backend
+from src.detections import ClassLookup
+from src.model_pipeline import ModelPipeline, PipelineStage
 
-def load_detector_from_config(config_path="config/config.yaml"):
-    """
-    Loads the correct model and settings based on the 'detection_model'
-    key in the config file. It only loads helmet-specific classes when the
-    helmet model is selected, making the system flexible for other models.
-    """
+VIOLATION_MODEL_NAME = "Helmet detection"
+
+# Display names used in the GUI and config, mapped to their key under 'models'
+MODEL_KEY_MAP = {
+    "Helmet detection": "helmet",
+    "Person Detection": "person",
+    "Face Detection": "face",
+    "Vehicle detection": "vehicle"
+}
+
+# The config keys that decide which model(s) are loaded
+MODEL_CONFIG_KEYS = ('detection_model', 'pipeline_models', 'models')
+
+def load_config(config_path="config/config.yaml"):
+    """Reads and parses the YAML config file. Returns None on failure."""
     try:
         with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+            return yaml.safe_load(f)
     except FileNotFoundError:
         print(f"🔴 [ERROR] Configuration file not found at {config_path}")
-        return None, None
     except Exception as e:
         print(f"🔴 [ERROR] Failed to load or parse config file: {e}")
+    return None
+
+def _stage_violation_classes(model_key, class_data, stage_config):
+    """Violation classes of one pipeline model: explicit 'violation_classes', or the helmet model's no-helmet class."""
+    if 'violation_classes' in stage_config:
+        return tuple(stage_config.get('violation_classes') or ())
+    if model_key == MODEL_KEY_MAP[VIOLATION_MODEL_NAME]:
+        return (class_data.get('no_helmet_class'),)
+    return ()
+
+def model_config_key(config):
+    """The model part of a config; configs with the same key can share one loaded detector."""
+    return json.dumps({key: config.get(key) for key in MODEL_CONFIG_KEYS}, sort_keys=True, default=str)
+
+def is_violation_model(config):
+    """
+    True if the selected model is the helmet model, which enables violation
+    checking. With 'pipeline_models', true if any of its models checks violations.
+    """
+    pipeline_models = config.get('pipeline_models') or []
+    if pipeline_models:
+        helmet_key = MODEL_KEY_MAP[VIOLATION_MODEL_NAME]
+        return any(stage.get('model') == helmet_key or stage.get('violation_classes') for stage in pipeline_models)
+    return config.get('detection_model', '').strip() == VIOLATION_MODEL_NAME
+
+def _load_model(model_key, config):
+    """Loads the backend and class file of one entry under 'models'. Returns (model, class_data)."""
+    model_config = config['models'][model_key]
+    with open(model_config['class_file'], 'r') as f:
+        class_data = yaml.safe_load(f)
+    print(f"[INFO] Loading model: {model_key} from {model_config['model_path']} ({model_config.get('backend', 'ultralytics')} backend)")
+    model = load_backend(model_config, names=class_data.get('names', []))
+    return model, class_data
+
+def load_pipeline_from_config(config):
+    """
+    Builds a ModelPipeline from the 'pipeline_models' list. Each entry names a
+    key under 'models' and may set its own 'confidence', 'every' (run on every
+    Nth frame) and 'violation_classes'. Returns detector settings shaped like
+    those of a single model, with the pipeline as the model.
+    """
+    stages = []
+    helmet_class = None
+    no_helmet_class = None
+    for stage_config in config['pipeline_models']:
+        model_key = stage_config.get('model')
+        if model_key not in config.get('models', {}):
+            print(f"🔴 [ERROR] Pipeline model '{model_key}' is not configured in config.yaml under 'models'.")
+            return None, None
+        try:
+            model, class_data = _load_model(model_key, config)
+        except KeyError as e:
+            print(f"🔴 [FATAL] Missing required key {e} in config for model '{model_key}'.")
+            return None, None
+        except Exception as e:
+            print(f"🔴 [FATAL] Failed to load model or class file for '{model_key}': {e}")
+            return None, None
+
+        violation_classes = _stage_violation_classes(model_key, class_data, stage_config)
+        if None in violation_classes:
+            print(f"🔴 [FATAL] Pipeline model '{model_key}' checks violations, but 'no_helmet_class' is missing in its class file.")
+            return None, None
+        if model_key == MODEL_KEY_MAP[VIOLATION_MODEL_NAME]:
+            helmet_class = class_data.get('helmet_class')
+            no_helmet_class = class_data.get('no_helmet_class')
+
+        stage = PipelineStage(model_key, model, ClassLookup(model.names, violation_classes),
+                              confidence=stage_config.get('confidence', config.get('confidence_threshold', 0.5)),
+                              every=stage_config.get('every', 1))
+        stages.append(stage)
+        print(f"[INFO] Pipeline model '{model_key}': confidence {stage.confidence}, every {stage.every} frame(s), "
+              f"violation classes: {list(violation_classes) or 'none'}")
+
+    pipeline = ModelPipeline(stages)
+    perform_violation_check = bool(pipeline.class_lookup.violation.any())
+    print(f"[INFO] Violation checking is {'ENABLED' if perform_violation_check else 'DISABLED'} for this pipeline.")
+    detector_settings = {
+        "model": pipeline,
+        "pipeline": pipeline,
+        "class_lookup": pipeline.class_lookup,
+        "class_names": pipeline.names,
+        "confidence": config.get('confidence_threshold', 0.5),
+        "perform_violation_check": perform_violation_check,
+        "helmet_class": helmet_class,
+        "no_helmet_class": no_helmet_class,
+    }
+    return detector_settings, config
+
+def load_detector_from_config(config_path="config/config.yaml", config=None):
+    """
+    Loads the correct model and settings based on the 'detection_model'
+    key in the config file. It only loads helmet-specific classes when the
+    helmet model is selected, making the system flexible for other models.
+    A non-empty 'pipeline_models' list loads several models instead.
+    An already parsed config dict can be passed instead of a file path.
+    """
+    if config is None:
+        config = load_config(config_path)
+    if config is None:
         return None, None
+    if config.get('pipeline_models'):
+        return load_pipeline_from_config(config)
 
     selected_model_name = config.get('detection_model', '').strip()
     
-    model_key_map = {
-        "Helmet detection": "helmet",
-        "Person Detection": "person",
-        "Face Detection": "face",
-        "Vehicle detection": "vehicle"
-    }
-    model_key = model_key_map.get(selected_model_name)
+    model_key = MODEL_KEY_MAP.get(selected_model_name)
 
     if not model_key or model_key not in config.get('models', {}):
         print(f"🔴 [ERROR] Model '{selected_model_name}' is not configured in config.yaml under 'models'.")
         return None, None
 
     try:
-        model_config = config['models'][model_key]
-        model_path = model_config['model_path']
-        class_file = model_config['class_file']
-
-        print(f"[INFO] Loading model: {selected_model_name} from {model_path}")
-        model = YOLO(model_path)
-
-        with open(class_file, 'r') as f:
-            class_data = yaml.safe_load(f)
-        
+        class_file = config['models'][model_key]['class_file']
+        model, class_data = _load_model(model_key, config)
         class_names = class_data.get('names', [])
         
         # --- Conditionally load helmet-specific keys ---
-        perform_violation_check = (selected_model_name == "Helmet detection")
+        perform_violation_check = is_violation_model(config)
         helmet_class = None
         no_helmet_class = None
 
@@ -59,8 +159,14 @@ def load_detector_from_config(config_path="config/config.yaml"):
         else:
             print("[INFO] Violation checking is DISABLED for this model.")
 
+        # Class ids are resolved against the model's own names once, up front
+        violation_classes = (no_helmet_class,) if perform_violation_check else ()
+        class_lookup = ClassLookup(model.names, violation_classes)
+
         detector_settings = {
             "model": model,
+            "pipeline": None,
+            "class_lookup": class_lookup,
             "class_names": class_names,
             "confidence": config.get('confidence_threshold', 0.5),
             "perform_violation_check": perform_violation_check,
@@ -75,4 +181,19 @@ def load_detector_from_config(config_path="config/config.yaml"):
         return None, None
     except Exception as e:
         print(f"🔴 [FATAL] Failed to load model or class file for '{selected_model_name}': {e}")
-        return None, None
\ No newline at end of file
+        return None, None
+
+def warm_up_detector(detector_settings, config, passes=1):
+    """
+    Runs the loaded model on blank frames of the configured resize_dim, so the
+    first real frame does not pay for lazy initialisation (CUDA context,
+    kernel selection, ONNX session allocation). Returns the seconds it took.
+    """
+    width, height = config.get('resize_dim', [640, 480])
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    start = time.time()
+    for _ in range(passes):
+        detector_settings['model'].infer([frame], detector_settings['confidence'])
+    elapsed = time.time() - start
+    print(f"[INFO] Model warm-up: {passes} pass(es) in {elapsed:.2f}s.")
+    return elapsed
@@ -0,0 +1,131 @@
+import cv2
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+class EvidenceWriter:
+    """
+    Writes violation crops and alerts.log lines from a background thread so
+    that a burst of violations never stalls a camera thread.
+    Items wait in a bounded queue; when it is full the oldest item is dropped,
+    and once it passes half full new crops are downscaled before queueing.
+    The log file handle stays open and log lines are appended in batches.
+    """
+    def __init__(self, log_path="logs/alerts.log", output_dir="violations", queue_size=256,
+                 batch_size=16, max_crop_side=320, jpeg_quality=90, metrics=None):
+        self.log_path = log_path
+        self.output_dir = output_dir
+        self.queue_size = max(1, int(queue_size))
+        self.batch_size = max(1, int(batch_size))
+        self.max_crop_side = max_crop_side
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.metrics = metrics
+
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self._log_file = None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        log_dir = os.path.dirname(self.log_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+    def _enqueue(self, item):
+        """Adds an item to the queue, dropping the oldest one when full."""
+        with self._cond:
+            if len(self._items) >= self.queue_size:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.queued += 1
+            self._cond.notify()
+
+    def log_violation(self, cam_id, violation_count, track_id=None):
+        """Queues an alerts.log line for this camera."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        track_text = f" | New violation track: {track_id}" if track_id is not None else ""
+        self._enqueue(('log', f"[{now}] Camera {cam_id} | Violations in frame: {violation_count}{track_text}\n"))
+
+    def save_violation_image(self, frame, box, cam_id, frame_count, violation_index):
+        """
+        Copies the violation crop out of the frame and queues it for encoding.
+        Returns the path the crop will be written to.
+        """
+        x1, y1, x2, y2 = map(int, box)
+        crop = frame[max(0, y1):y2, max(0, x1):x2]
+        if crop.size == 0:
+            return None
+        # Back-pressure: shrink crops while the writer is falling behind
+        if self.max_crop_side and len(self._items) > self.queue_size // 2 and max(crop.shape[:2]) > self.max_crop_side:
+            scale = self.max_crop_side / max(crop.shape[:2])
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            crop = crop.copy()
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = os.path.join(self.output_dir, f"cam{cam_id}_{now}_frame{frame_count}_viol{violation_index}.jpg")
+        self._enqueue(('crop', filename, crop, cam_id))
+        return filename
+
+    def _write_batch(self, batch):
+        """Encodes the crops of a batch and appends its log lines in one write."""
+        log_lines = []
+        for item in batch:
+            try:
+                if item[0] == 'log':
+                    log_lines.append(item[1])
+                    continue
+                _, filename, crop, cam_id = item
+                write_start = time.perf_counter()
+                ok, buffer = cv2.imencode('.jpg', crop, self.encode_params)
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                with open(filename, 'wb') as f:
+                    f.write(buffer.tobytes())
+                self.written += 1
+                if self.metrics:
+                    self.metrics.observe(cam_id, 'evidence_write', time.perf_counter() - write_start)
+            except Exception as e:
+                print(f"🔴 [ERROR] Could not save violation image: {e}")
+
+        if log_lines:
+            try:
+                if self._log_file is None:
+                    self._log_file = open(self.log_path, 'a')
+                self._log_file.writelines(log_lines)
+                self._log_file.flush()
+                self.written += len(log_lines)
+            except Exception as e:
+                print(f"🔴 [ERROR] Could not write to {self.log_path}: {e}")
+
+        if self.metrics:
+            self.metrics.set_gauge('evidence', 'evidence_queued', self.queued)
+            self.metrics.set_gauge('evidence', 'evidence_written', self.written)
+            self.metrics.set_gauge('evidence', 'evidence_dropped', self.dropped)
+
+    def run(self):
+        """The main loop for the writer thread."""
+        print("[INFO] Evidence writer started.")
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._items or self.stop_event.is_set(), timeout=1.0)
+                if not self._items and self.stop_event.is_set():
+                    break
+                batch = [self._items.popleft() for _ in range(min(self.batch_size, len(self._items)))]
+            self._write_batch(batch)
+
+        if self._log_file is not None:
+            self._log_file.close()
+        print(f"[INFO] Evidence writer stopped: {self.queued} queued, {self.written} written, {self.dropped} dropped.")
+
+    def stop(self):
+        """Signals the writer thread to flush the queue and stop."""
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify()
@@ -0,0 +1,135 @@
+import cv2
+import os
+import threading
+import time
+
+class FrameGrabber:
+    """
+    Dedicated capture stage for a single camera.
+    A background thread keeps reading the stream so the OpenCV buffer never
+    backs up, and only the newest decoded frame is kept in a single-slot
+    buffer. Frames that are replaced before the detector picks them up are
+    counted as dropped, which shows how overloaded the camera is.
+    """
+    def __init__(self, cam_id, stream_url, skip_decode=False, pace_files=True, reconnect_delay=2):
+        self.cam_id = cam_id
+        self.stream_url = stream_url
+        self.skip_decode = skip_decode
+        self.reconnect_delay = reconnect_delay
+        self.is_file = isinstance(stream_url, str) and os.path.isfile(stream_url)
+        self.pace_files = pace_files and self.is_file
+
+        self.cap = None
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frame_index = None  # position in the file of the frame last returned by read()
+
+        self._frame = None
+        self._frame_index = None
+        self._position = 0
+        self._frame_id = 0
+        self._consumed_id = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _open(self):
+        """Opens (or reopens) the capture device."""
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = cv2.VideoCapture(self.stream_url)
+        self._position = 0
+        if not self.is_file:
+            # Keep the driver-side queue as short as possible for live streams
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return self.cap.isOpened()
+
+    def start(self):
+        """Opens the stream and starts the capture thread. Returns False if the stream cannot be opened."""
+        if not self._open():
+            return False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def read(self, timeout=1.0):
+        """
+        Returns (True, frame) with the newest frame that has not been returned
+        yet, or (False, None) if no new frame arrived within the timeout.
+        For files, 'frame_index' is then the frame's position in the file.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                has_frame = self._cond.wait_for(
+                    lambda: self._frame_id > self._consumed_id or self.stop_event.is_set(),
+                    timeout=timeout)
+            finally:
+                self._waiting -= 1
+            if not has_frame or self._frame_id <= self._consumed_id:
+                return False, None
+            self._consumed_id = self._frame_id
+            self.frame_index = self._frame_index
+            return True, self._frame
+
+    def _publish(self, frame, frame_index):
+        """Stores a new frame in the single slot, replacing any unread frame."""
+        with self._cond:
+            if self._frame_id > self._consumed_id:
+                self.frames_dropped += 1
+            self._frame = frame
+            self._frame_index = frame_index
+            self._frame_id += 1
+            self._cond.notify_all()
+
+    def run(self):
+        """The main loop for the capture thread."""
+        frame_interval = 0
+        if self.pace_files:
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        next_frame_time = time.perf_counter()
+
+        while not self.stop_event.is_set():
+            if self.skip_decode and self._waiting == 0 and self._frame_id > 0:
+                # Nobody is waiting for a frame: advance the stream without decoding it
+                ret = self.cap.grab()
+                if ret:
+                    self.frames_read += 1
+                    self.frames_dropped += 1
+                    self._position += 1
+            else:
+                ret, frame = self.cap.read()
+                if ret:
+                    self.frames_read += 1
+                    self._publish(frame, self._position)
+                    self._position += 1
+
+            if not ret:
+                print(f"⚠️  [WARNING] Camera {self.cam_id} disconnected. Retrying...")
+                if self.stop_event.wait(self.reconnect_delay):
+                    break
+                self._open()
+                next_frame_time = time.perf_counter()
+                continue
+
+            if frame_interval:
+                # Replay local video files at their native frame rate
+                next_frame_time += frame_interval
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame_time = time.perf_counter()
+
+        if self.cap is not None:
+            self.cap.release()
+
+    def stop(self):
+        """Signals the capture thread to stop and wakes up any waiting reader."""
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
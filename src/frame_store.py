@@ -0,0 +1,255 @@
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+class _FrameRing:
+    """
+    Preallocated frame buffers of one camera, exchanged by index instead of copied.
+    The writer fills a back buffer and publishes it by swapping the published
+    index. Every reader thread marks the buffer it is reading, and the writer
+    never picks the published buffer or one that is being read, so with one
+    reader this is a classic triple buffer. Index assignments are atomic in
+    CPython, so neither side takes a lock.
+    """
+    def __init__(self):
+        self.buffers = []
+        self.roi_rects = []
+        self.shape = None
+        self.writing = -1
+        self.published = -1
+        self.seq = 0
+        self.readers = {}  # reader thread id -> index of the buffer it is reading
+        self.allocations = 0
+        self.copies = 0
+
+    def back_buffer(self, shape):
+        """Returns the buffer the writer should fill next, allocating only on the first frame or a size change."""
+        if shape != self.shape:
+            self.buffers, self.roi_rects = [], []
+            self.shape = shape
+            self.writing = -1
+        if self.writing < 0:
+            self.writing = self._free_index()
+        return self.buffers[self.writing]
+
+    def _free_index(self):
+        busy = set(list(self.readers.values()))
+        busy.add(self.published)
+        for index in range(len(self.buffers)):
+            if index not in busy:
+                return index
+        self.buffers.append(np.empty(self.shape, dtype=np.uint8))
+        self.roi_rects.append(None)
+        self.allocations += 1
+        return len(self.buffers) - 1
+
+    def publish(self, roi_rect):
+        index = self.writing
+        self.roi_rects[index] = roi_rect
+        self.published = index
+        self.seq += 1
+        self.writing = self._free_index()
+
+    def acquire(self):
+        """Marks the latest published buffer as being read by this thread and returns its index."""
+        reader = threading.get_ident()
+        while True:
+            index = self.published
+            self.readers[reader] = index
+            # If the writer published again in between, the mark may be too late; retry
+            if self.published == index:
+                return index
+
+class LocalFrameStore:
+    """
+    In-process store for the latest annotated frame of each camera, used when
+    all cameras run as threads. Each camera owns a small ring of preallocated
+    buffers: the camera thread draws straight into a back buffer obtained from
+    begin_write() and publish() only swaps indices, so no frame is copied and
+    no global lock is taken. A frame returned by get() stays valid until the
+    same reader thread calls get() or get_roi() for that camera again.
+    """
+    def __init__(self):
+        self.rings = {}
+
+    def _ring(self, cam_id):
+        ring = self.rings.get(cam_id)
+        if ring is None:
+            ring = self.rings.setdefault(cam_id, _FrameRing())
+        return ring
+
+    def begin_write(self, cam_id, shape):
+        """Returns the preallocated back buffer the camera should render its next frame into."""
+        return self._ring(cam_id).back_buffer(tuple(shape))
+
+    def publish(self, cam_id, frame, roi_rect=None):
+        """Publishes the camera's back buffer. A frame that is not the back buffer is copied into it first."""
+        ring = self._ring(cam_id)
+        back = ring.back_buffer(frame.shape)
+        if frame is not back:
+            np.copyto(back, frame)
+            ring.copies += 1
+        ring.publish(roi_rect)
+
+    def latest(self, cam_id):
+        """Returns (frame, roi_frame, seq) for the last completed frame, or (None, None, 0)."""
+        ring = self.rings.get(cam_id)
+        if ring is None or ring.published < 0:
+            return None, None, 0
+        index = ring.acquire()
+        frame = ring.buffers[index]
+        roi_rect = ring.roi_rects[index]
+        roi_frame = None
+        if roi_rect is not None:
+            x, y, w, h = roi_rect
+            roi_frame = frame[y:y + h, x:x + w]
+        return frame, roi_frame, ring.seq
+
+    def sequence(self, cam_id):
+        """Number of frames the camera has published, to check for a new frame without reading it."""
+        ring = self.rings.get(cam_id)
+        return ring.seq if ring is not None else 0
+
+    def get(self, cam_id):
+        return self.latest(cam_id)[0]
+
+    def get_roi(self, cam_id):
+        return self.latest(cam_id)[1]
+
+    def clear_roi(self, cam_id):
+        ring = self.rings.get(cam_id)
+        if ring is not None and ring.published >= 0:
+            ring.roi_rects[ring.published] = None
+
+    def remove(self, cam_id):
+        """Forgets a camera that was stopped for good; a camera started later under the same id starts empty."""
+        self.rings.pop(cam_id, None)
+
+    def stats(self):
+        """Buffer allocations and frame copies so far, to compare against one copy per published frame."""
+        rings = list(self.rings.values())
+        return {
+            "published": sum(ring.seq for ring in rings),
+            "allocations": sum(ring.allocations for ring in rings),
+            "copies": sum(ring.copies for ring in rings),
+        }
+
+class SharedMemoryFrameStore:
+    """
+    Cross-process store for the latest annotated frame of each camera.
+    Every camera owns a ring of preallocated frame slots inside one
+    multiprocessing.shared_memory block, so frames reach the display process
+    with a single memory copy instead of being pickled.
+    A small header block holds, per camera, the publish sequence number, the
+    latest slot and the ROI rectangle of that frame.
+    Each camera needs at least MIN_SLOTS slots: the published one, the one
+    being written and one spare, so a reader can finish its copy before the
+    writer wraps around to its slot.
+    """
+    HEADER_FIELDS = 6  # seq, slot, roi_x, roi_y, roi_w, roi_h
+    MIN_SLOTS = 3
+
+    def __init__(self, num_cameras, frame_shape=(480, 640, 3), slots=3, names=None):
+        if slots < self.MIN_SLOTS:
+            raise ValueError(f"Frame store needs at least {self.MIN_SLOTS} slots per camera, got {slots}")
+        self.num_cameras = num_cameras
+        self.frame_shape = tuple(frame_shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.frame_shape))
+        create = names is None
+
+        if create:
+            self._frames_shm = shared_memory.SharedMemory(create=True, size=num_cameras * slots * frame_bytes)
+            self._header_shm = shared_memory.SharedMemory(create=True, size=num_cameras * self.HEADER_FIELDS * 8)
+        else:
+            self._frames_shm = shared_memory.SharedMemory(name=names[0])
+            self._header_shm = shared_memory.SharedMemory(name=names[1])
+        self._owner = create
+
+        self.buffers = np.ndarray((num_cameras, slots) + self.frame_shape, dtype=np.uint8, buffer=self._frames_shm.buf)
+        self.header = np.ndarray((num_cameras, self.HEADER_FIELDS), dtype=np.int64, buffer=self._header_shm.buf)
+        if create:
+            self.header[:] = 0
+        self._last_read = {}  # cam_id -> last consistent (frame, roi_rect, seq) read by this process
+
+    @property
+    def names(self):
+        """Shared memory block names, used to attach from worker processes."""
+        return (self._frames_shm.name, self._header_shm.name)
+
+    def attach_args(self):
+        """Arguments needed to attach to this store from another process."""
+        return (self.num_cameras, self.frame_shape, self.slots, self.names)
+
+    def begin_write(self, cam_id, shape):
+        """Returns the ring slot the camera's next frame will be published from, so it can be rendered in place."""
+        if tuple(shape) != self.frame_shape:
+            return np.empty(shape, dtype=np.uint8)
+        return self.buffers[cam_id, (int(self.header[cam_id, 0]) + 1) % self.slots]
+
+    def publish(self, cam_id, frame, roi_rect=None):
+        """Publishes the next slot of the camera's ring, copying the frame into it unless it was rendered there."""
+        header = self.header[cam_id]
+        seq = int(header[0]) + 1
+        slot = seq % self.slots
+        target = self.buffers[cam_id, slot]
+        if not np.shares_memory(frame, target):
+            np.copyto(target, frame)
+        header[2:6] = roi_rect if roi_rect is not None else (0, 0, 0, 0)
+        header[1] = slot
+        header[0] = seq  # written last so readers never see a half-written frame
+
+    def _read(self, cam_id):
+        """
+        Returns a consistent copy of the latest frame, its ROI rectangle and its
+        sequence number. If the writer overwrites the slot during every attempt,
+        the last consistent frame this process read is returned instead, or
+        (None, None, 0) if there is none.
+        """
+        header = self.header[cam_id]
+        for _ in range(3):
+            seq = int(header[0])
+            if seq == 0:
+                return None, None, 0
+            slot = int(header[1])
+            roi_rect = tuple(int(v) for v in header[2:6])
+            frame = self.buffers[cam_id, slot].copy()
+            # The writer only renders into this slot again after publishing slots - 2 newer frames
+            if int(header[0]) - seq < max(1, self.slots - 2):
+                self._last_read[cam_id] = (frame, roi_rect, seq)
+                return frame, roi_rect, seq
+        last = self._last_read.get(cam_id)
+        if last is None:
+            return None, None, 0
+        frame, roi_rect, seq = last
+        return frame.copy(), roi_rect, seq
+
+    def latest(self, cam_id):
+        """Returns (frame, roi_frame, seq) for the last published frame, or (None, None, 0)."""
+        frame, roi_rect, seq = self._read(cam_id)
+        if frame is None or roi_rect[2] == 0 or roi_rect[3] == 0:
+            return frame, None, seq
+        x, y, w, h = roi_rect
+        return frame, frame[y:y + h, x:x + w], seq
+
+    def sequence(self, cam_id):
+        """Number of frames the camera has published, to check for a new frame without copying it."""
+        return int(self.header[cam_id, 0])
+
+    def get(self, cam_id):
+        return self.latest(cam_id)[0]
+
+    def get_roi(self, cam_id):
+        return self.latest(cam_id)[1]
+
+    def clear_roi(self, cam_id):
+        self.header[cam_id, 2:6] = 0
+
+    def close(self):
+        """Detaches from the shared memory and, in the owning process, frees it."""
+        del self.buffers, self.header
+        self._frames_shm.close()
+        self._header_shm.close()
+        if self._owner:
+            self._frames_shm.unlink()
+            self._header_shm.unlink()
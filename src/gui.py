@@ -8,6 +8,9 @@ import subprocess
 import threading
 import queue
 import os
+import json
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
 
 CONFIG_PATH = "config/config.yaml"
 if not os.path.exists("config"):
@@ -28,10 +31,12 @@ class HelmetGUI:
         #     self.logo_image = None # Set to None if image fails to load
 
         self.log_queue = queue.Queue()
+        self.service_process = None  # The pipeline service, when this window started it
 
         self.load_config()
         self.setup_ui()
         self.process_log_queue()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def load_config(self):
         try:
@@ -134,8 +139,11 @@ class HelmetGUI:
 
         self._toggle_serial_port()
 
-        # ==== Run Button ====
-        ttk.Button(main_frame, text="RUN", command=self.run_script, bootstyle="success").pack(pady=10, ipady=10, ipadx=20)
+        # ==== Run / Stop Buttons ====
+        run_frame = ttk.Frame(main_frame)
+        run_frame.pack(pady=10)
+        ttk.Button(run_frame, text="RUN", command=self.run_script, bootstyle="success").pack(side=LEFT, padx=5, ipady=10, ipadx=20)
+        ttk.Button(run_frame, text="STOP", command=self.stop_script, bootstyle="danger").pack(side=LEFT, padx=5, ipady=10, ipadx=20)
 
         # ==== Logs ====
         log_frame = ttk.LabelFrame(main_frame, text="Logs", padding=10)
@@ -177,37 +185,85 @@ class HelmetGUI:
             
         self.root.after(100, self.process_log_queue)
 
+    def send_service_command(self, command, timeout=30):
+        """
+        Sends 'start', 'stop', 'restart', 'shutdown' or 'status' to the pipeline
+        service (service.py). Returns its JSON reply, or None if it is not running.
+        """
+        service_config = self.config.get('service', {})
+        url = f"http://{service_config.get('host', '127.0.0.1')}:{service_config.get('port', 8765)}/{command}"
+        request = Request(url, data=None if command == "status" else b"{}", method="GET" if command == "status" else "POST")
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            return json.loads(e.read() or b"{}")
+        except (URLError, OSError):
+            return None
+
+    def start_service(self):
+        """Starts service.py with a run queued, streaming its output to the log panel."""
+        python_executable = "python" if os.name == 'nt' else "python3"
+        self.log_queue.put(f"--- Starting pipeline service: {python_executable} service.py ---\n")
+        try:
+            self.service_process = subprocess.Popen(
+                [python_executable, "service.py", "--start"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                bufsize=1
+            )
+        except FileNotFoundError:
+            self.log_queue.put(f"Error: '{python_executable}' not found. Please ensure Python is in your PATH.\n")
+            return
+
+        def reader(process):
+            for line in iter(process.stdout.readline, ''):
+                self.log_queue.put(line)
+            process.stdout.close()
+            process.wait()
+            self.log_queue.put("--- Pipeline service stopped ---\n")
+
+        threading.Thread(target=reader, args=(self.service_process,), daemon=True).start()
+
     def run_script(self):
+        """
+        Starts a run in the long-lived pipeline service, which keeps the model
+        loaded between runs, starting the service first if it is not running.
+        """
         def runner():
-            python_executable = "python" if os.name == 'nt' else "python3"
-            self.log_queue.put(f"--- Starting process: {python_executable} main.py ---\n")
-            try:
-                process = subprocess.Popen(
-                    [python_executable, "main.py"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    encoding='utf-8',
-                    bufsize=1
-                )
-                for line in iter(process.stdout.readline, ''):
-                    self.log_queue.put(line)
-                
-                process.stdout.close()
-                process.wait()
-                self.log_queue.put("--- Process finished ---\n")
-            except FileNotFoundError:
-                msg = f"Error: '{python_executable}' not found. Please ensure Python is in your PATH.\n"
-                self.log_queue.put(msg)
-            except Exception as e:
-                self.log_queue.put(f"--- An unexpected error occurred: {e} ---\n")
+            reply = self.send_service_command("start")
+            if reply is None:
+                self.start_service()
+            elif reply.get('ok'):
+                self.log_queue.put("--- Run started ---\n")
+            else:
+                self.log_queue.put(f"--- Could not start: {reply.get('message')} ---\n")
 
         self.log_output.config(state='normal')
         self.log_output.delete(1.0, tk.END)
         self.log_output.config(state='disabled')
-        
+
+        threading.Thread(target=runner, daemon=True).start()
+
+    def stop_script(self):
+        """Stops the active run; the service and its loaded model stay up for the next RUN."""
+        def runner():
+            reply = self.send_service_command("stop")
+            if reply is None:
+                self.log_queue.put("--- Pipeline service is not running ---\n")
+            else:
+                self.log_queue.put(f"--- Run {reply.get('message')} ---\n")
+
         threading.Thread(target=runner, daemon=True).start()
 
+    def on_close(self):
+        """Shuts down the pipeline service if this window started it, then closes the window."""
+        if self.service_process is not None and self.service_process.poll() is None:
+            self.send_service_command("shutdown", timeout=5)
+        self.root.destroy()
+
 if __name__ == '__main__':
     root = ttk.Window(themename="cosmo")
     app = HelmetGUI(root)
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from src.camera_worker import drop_ignored
+from src.detections import ClassLookup, Detections
+from src.model_pipeline import ModelPipeline
+
+class _InferenceRequest:
+    """A single frame submitted by a camera thread, waiting for its detections."""
+    def __init__(self, cam_id, frame, detector=None):
+        self.cam_id = cam_id
+        self.frame = frame
+        self.detector = detector  # (model, confidence, class_lookup), or None for the server's own
+        self.detections = Detections()
+        self.error = None
+        self.done = threading.Event()
+
+class InferenceServer:
+    """
+    Central inference service shared by all camera threads.
+    Each camera submits its latest frame and blocks until the result is ready.
+    The server gathers frames from the cameras into one batch, bounded by
+    'max_batch_size' and a 'max_wait_ms' deadline, runs a single forward pass
+    and hands every camera back its own detections.
+    A camera may pass its own (model, confidence, class_lookup); frames for
+    different models go through separate forward passes, so after a config
+    reload swaps the model each camera moves over on its next frame.
+    A frame superseded by a newer one from the same camera (a camera
+    restarted while its old thread still waited) is answered with None,
+    not empty Detections, so the caller can tell "not run" from "no people";
+    it is counted per camera in 'superseded' and the 'inference_superseded' gauge.
+    """
+    def __init__(self, model, confidence, class_lookup=None, max_batch_size=8, max_wait_ms=10, metrics=None):
+        self.model = model
+        self.class_lookup = class_lookup or ClassLookup(model.names)
+        self.confidence = confidence
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.metrics = metrics
+        self.requests = queue.Queue()
+        self.superseded = {}  # cam_id -> frames answered None because a newer one arrived
+        self.stop_event = threading.Event()
+
+    def infer(self, cam_id, frame, detector=None):
+        """
+        Called from a camera thread. Queues the frame and waits for the batch
+        containing it to finish. Returns the detections for this frame only,
+        or None if a newer frame from the same camera superseded it.
+        """
+        request = _InferenceRequest(cam_id, frame, detector)
+        self.requests.put(request)
+        while not request.done.wait(timeout=0.5):
+            if self.stop_event.is_set():
+                return Detections()
+        if request.error:
+            raise request.error
+        return request.detections
+
+    def _collect_batch(self, first):
+        """
+        Starting from the first queued request, keeps gathering frames until the
+        batch is full or the wait deadline expires. Only one frame per camera
+        is kept; an older frame from the same camera is answered empty.
+        """
+        batch = {first.cam_id: first}
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            stale = batch.get(request.cam_id)
+            if stale:
+                self._supersede(stale)
+            batch[request.cam_id] = request
+        return list(batch.values())
+
+    def _supersede(self, request):
+        """Answers a frame that a newer frame from the same camera replaced in the batch."""
+        count = self.superseded.get(request.cam_id, 0) + 1
+        self.superseded[request.cam_id] = count
+        request.detections = None
+        request.done.set()
+        print(f"⚠️  [WARNING] Camera {request.cam_id}: frame superseded in the inference batch ({count} so far).")
+        if self.metrics:
+            self.metrics.set_gauge(request.cam_id, 'inference_superseded', count)
+
+    def _run_batch(self, batch):
+        """Runs one forward pass per model in the batch and distributes the results."""
+        groups = {}
+        for request in batch:
+            detector = request.detector or (self.model, self.confidence, self.class_lookup)
+            groups.setdefault((id(detector[0]), detector[1]), (detector, []))[1].append(request)
+        for (model, confidence, class_lookup), requests in groups.values():
+            try:
+                frames = [request.frame for request in requests]
+                if isinstance(model, ModelPipeline):
+                    results = model.infer(frames, confidence, cam_ids=[request.cam_id for request in requests])
+                else:
+                    results = model.infer(frames, confidence)
+                for request, detections in zip(requests, results):
+                    request.detections = drop_ignored(detections, class_lookup)
+            except Exception as e:
+                for request in requests:
+                    request.error = e
+            finally:
+                for request in requests:
+                    request.done.set()
+
+    def run(self):
+        """The main loop for the inference thread."""
+        print(f"[INFO] Batched inference server started (max batch {self.max_batch_size}, max wait {self.max_wait * 1000:.0f} ms).")
+        while not self.stop_event.is_set():
+            try:
+                first = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self._run_batch(self._collect_batch(first))
+
+        # Release any camera thread still waiting on a result
+        while True:
+            try:
+                self.requests.get_nowait().done.set()
+            except queue.Empty:
+                break
+        print("[INFO] Batched inference server stopped.")
+
+    def stop(self):
+        """Signals the inference thread to stop."""
+        self.stop_event.set()
@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+class StageClock:
+    """
+    Times consecutive stages of one camera's loop. Each lap() reports the
+    time since the previous lap to the metrics sink under the given stage
+    name. With no sink configured the clock only reads the timer.
+    """
+    def __init__(self, sink, cam_id):
+        self.sink = sink
+        self.cam_id = cam_id
+        self.last = time.perf_counter()
+
+    def start(self):
+        """Restarts the clock, e.g. at the top of the loop or after a skipped stage."""
+        self.last = time.perf_counter()
+        return self.last
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        if self.sink is not None:
+            self.sink.observe(self.cam_id, stage, now - self.last)
+        self.last = now
+        return now
+
+    def since(self, stage, start):
+        """Reports the time elapsed since 'start' (a value returned by start or lap)."""
+        if self.sink is not None:
+            self.sink.observe(self.cam_id, stage, time.perf_counter() - start)
+
+class SampleRecorder:
+    """
+    Metrics sink that keeps every raw sample, used by the benchmark to
+    compute exact percentiles at the end of a run.
+    """
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def observe(self, cam_id, stage, seconds):
+        with self.lock:
+            self.samples[(cam_id, stage)].append(seconds)
+
+    def count(self, cam_id, stage):
+        with self.lock:
+            return len(self.samples.get((cam_id, stage), ()))
+
+    def stage_summary(self, percentiles=(50, 95, 99)):
+        """Per-stage latency statistics in milliseconds, over all cameras."""
+        with self.lock:
+            by_stage = defaultdict(list)
+            for (_, stage), values in self.samples.items():
+                by_stage[stage].extend(values)
+        summary = {}
+        for stage, values in sorted(by_stage.items()):
+            values_ms = np.asarray(values) * 1000
+            stats = {"count": len(values_ms), "mean_ms": float(values_ms.mean())}
+            for p, value in zip(percentiles, np.percentile(values_ms, percentiles)):
+                stats[f"p{p}_ms"] = float(value)
+            summary[stage] = stats
+        return summary
+
+    def set_gauge(self, cam_id, name, value):
+        with self.lock:
+            self.gauges[(cam_id, name)] = value
+
+    def gauge(self, cam_id, name, default=None):
+        with self.lock:
+            return self.gauges.get((cam_id, name), default)
+
+# Latency buckets in seconds, from sub-millisecond stages up to slow model passes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Metrics sink for live runs. Stage timings feed one histogram per camera
+    and stage, and gauges hold the latest value of per-camera counters.
+    Everything is rendered in the Prometheus text format for /metrics.
+    """
+    def __init__(self, prefix="helmet"):
+        self.prefix = prefix
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def observe(self, cam_id, stage, seconds):
+        key = (str(cam_id), stage)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def set_gauge(self, cam_id, name, value):
+        with self.lock:
+            self.gauges[(str(cam_id), name)] = value
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self.lock:
+            histograms = sorted((key, list(h.counts), h.total, h.count, h.buckets) for key, h in self.histograms.items())
+            gauges = sorted(self.gauges.items())
+
+        name = f"{self.prefix}_stage_latency_seconds"
+        lines = [f"# HELP {name} Latency of each pipeline stage per camera.", f"# TYPE {name} histogram"]
+        for (camera, stage), counts, total, count, buckets in histograms:
+            labels = f'camera="{camera}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {total}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+
+        declared = set()
+        for (camera, gauge_name), value in gauges:
+            full_name = f"{self.prefix}_{gauge_name}"
+            if full_name not in declared:
+                lines.append(f"# TYPE {full_name} gauge")
+                declared.add(full_name)
+            lines.append(f'{full_name}{{camera="{camera}"}} {float(value)}')
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves a MetricsRegistry on a local HTTP /metrics endpoint."""
+    def __init__(self, registry, host="127.0.0.1", port=9100):
+        self.registry = registry
+        registry_ref = registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the application log
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+
+    def run(self):
+        host, port = self.httpd.server_address[:2]
+        print(f"[INFO] Metrics endpoint available at http://{host}:{port}/metrics")
+        self.httpd.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,77 @@
+from src.detections import ClassLookup, Detections
+
+class PipelineStage:
+    """One model of a ModelPipeline with its own classes, confidence and cadence."""
+    def __init__(self, name, model, class_lookup, confidence=0.5, every=1):
+        self.name = name
+        self.model = model
+        self.class_lookup = class_lookup
+        self.confidence = confidence
+        self.every = max(1, int(every))
+        self.class_offset = 0
+        self.runs = 0
+
+class ModelPipeline:
+    """
+    Runs several detection models on the same decoded frame, so a camera is
+    decoded and resized once however many models watch it.
+    Every stage keeps its own class file, confidence and violation classes.
+    Class ids of later stages are shifted past those of earlier ones, so the
+    merged result uses one combined ClassLookup and the rest of the camera
+    loop (tracking, drawing, evidence) works unchanged.
+    A stage with 'every: N' only runs on every Nth frame of a camera; in
+    between, its last detections for that camera are reused.
+    Exposes the same infer() as the single-model backends.
+    """
+    def __init__(self, stages):
+        self.stages = stages
+        offset = 0
+        for stage in stages:
+            stage.class_offset = offset
+            offset += len(stage.class_lookup.names)
+        self.class_lookup = ClassLookup.concat([stage.class_lookup for stage in stages])
+        self.names = list(self.class_lookup.names)
+        self._frame_counts = {}
+        self._cached = {}  # (stage index, cam_id) -> last detections
+
+    def reset(self, cam_id):
+        """Forgets the cached detections of a camera, e.g. after its ROI changed, so every stage runs next frame."""
+        self._frame_counts.pop(cam_id, None)
+        for index in range(len(self.stages)):
+            self._cached.pop((index, cam_id), None)
+
+    def _run_stage(self, stage, frames):
+        results = stage.model.infer(frames, stage.confidence)
+        stage.runs += len(frames)
+        shifted = []
+        for detections in results:
+            detections = detections.filter(~stage.class_lookup.ignore_mask(detections.class_ids))
+            shifted.append(Detections(detections.boxes, detections.confs, detections.class_ids + stage.class_offset))
+        return shifted
+
+    def infer(self, frames, confidence=None, cam_ids=None):
+        """
+        Runs every stage that is due on the given frames and returns one merged
+        Detections per frame. 'cam_ids' identifies the camera of each frame for
+        the per-stage cadence; without it every stage runs on every frame.
+        'confidence' is ignored in favour of each stage's own threshold.
+        """
+        cam_ids = list(cam_ids) if cam_ids is not None else [None] * len(frames)
+        parts = [[] for _ in frames]
+        for index, stage in enumerate(self.stages):
+            due = [i for i, cam_id in enumerate(cam_ids)
+                   if cam_id is None or self._frame_counts.get(cam_id, 0) % stage.every == 0]
+            if due:
+                for i, detections in zip(due, self._run_stage(stage, [frames[i] for i in due])):
+                    parts[i].append(detections)
+                    if cam_ids[i] is not None:
+                        self._cached[(index, cam_ids[i])] = detections
+            due = set(due)
+            for i, cam_id in enumerate(cam_ids):
+                if i not in due:
+                    parts[i].append(self._cached.get((index, cam_id), Detections()))
+
+        for cam_id in cam_ids:
+            if cam_id is not None:
+                self._frame_counts[cam_id] = self._frame_counts.get(cam_id, 0) + 1
+        return [Detections.concatenate(frame_parts) for frame_parts in parts]
@@ -0,0 +1,121 @@
+import math
+import cv2
+import numpy as np
+
+TITLE_BAR_HEIGHT = 22
+
+class MosaicRenderer:
+    """
+    Tiles the latest frame of every camera into one preallocated canvas, so
+    the display loop makes a single imshow() call however many cameras run.
+    A tile is only redrawn when its camera published a new frame (tracked
+    by the frame store's sequence number) or an overlay was drawn on it.
+    Frames keep their aspect ratio inside the tile; locate() maps canvas
+    coordinates back to a camera and its frame coordinates for ROI drawing.
+    A title of None leaves that tile empty (a camera id with no camera).
+    """
+    def __init__(self, num_cameras, titles=None, canvas_size=(1920, 1080), columns=0):
+        self.num_cameras = num_cameras
+        self.titles = titles or [f"Camera {i}" for i in range(num_cameras)]
+        self.columns = columns or max(1, math.ceil(math.sqrt(num_cameras)))
+        self.rows = max(1, math.ceil(num_cameras / self.columns))
+        width, height = canvas_size
+        self.tile_w = width // self.columns
+        self.tile_h = height // self.rows
+        self.canvas = np.zeros((self.tile_h * self.rows, self.tile_w * self.columns, 3), dtype=np.uint8)
+
+        self.last_seq = [0] * num_cameras
+        self.placements = [None] * num_cameras  # (frame_shape, x, y, w, h, scale) of the frame inside each tile
+        self.dirty = set()
+        self.tiles_drawn = 0
+        for cam_id in range(num_cameras):
+            self._draw_title(cam_id)
+
+    @classmethod
+    def from_config(cls, config, num_cameras, titles=None):
+        mosaic_config = config.get('display', {}).get('mosaic', {})
+        return cls(num_cameras, titles,
+                   canvas_size=tuple(mosaic_config.get('canvas_size', [1920, 1080])),
+                   columns=mosaic_config.get('columns', 0))
+
+    def tile_origin(self, cam_id):
+        row, column = divmod(cam_id, self.columns)
+        return column * self.tile_w, row * self.tile_h
+
+    def _placement(self, cam_id, frame_shape):
+        """Where a frame of this shape goes inside the tile, below the title bar, centred and aspect-preserving."""
+        placement = self.placements[cam_id]
+        if placement is not None and placement[0] == frame_shape:
+            return placement
+        tile_x, tile_y = self.tile_origin(cam_id)
+        area_h = self.tile_h - TITLE_BAR_HEIGHT
+        scale = min(self.tile_w / frame_shape[1], area_h / frame_shape[0])
+        w, h = max(1, int(frame_shape[1] * scale)), max(1, int(frame_shape[0] * scale))
+        x = tile_x + (self.tile_w - w) // 2
+        y = tile_y + TITLE_BAR_HEIGHT + (area_h - h) // 2
+        # Clear the tile once, in case the previous frame size left a border behind
+        self.canvas[tile_y + TITLE_BAR_HEIGHT:tile_y + self.tile_h, tile_x:tile_x + self.tile_w] = 0
+        placement = (frame_shape, x, y, w, h, scale)
+        self.placements[cam_id] = placement
+        return placement
+
+    def _draw_title(self, cam_id):
+        tile_x, tile_y = self.tile_origin(cam_id)
+        bar = self.canvas[tile_y:tile_y + TITLE_BAR_HEIGHT, tile_x:tile_x + self.tile_w]
+        bar[:] = (40, 40, 40)
+        if self.titles[cam_id] is None:
+            return
+        cv2.putText(bar, self.titles[cam_id], (6, TITLE_BAR_HEIGHT - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+    def render(self, frame_store):
+        """Redraws the tiles whose camera published a new frame. Returns True if the canvas changed."""
+        changed = False
+        for cam_id in range(self.num_cameras):
+            if self.titles[cam_id] is None:
+                continue
+            # Compare sequence numbers first; latest() copies the frame out of shared memory in process mode
+            if frame_store.sequence(cam_id) == self.last_seq[cam_id] and cam_id not in self.dirty:
+                continue
+            frame, _, seq = frame_store.latest(cam_id)
+            if frame is None:
+                continue
+            _, x, y, w, h, _ = self._placement(cam_id, frame.shape)
+            cv2.resize(frame, (w, h), dst=self.canvas[y:y + h, x:x + w], interpolation=cv2.INTER_LINEAR)
+            self.last_seq[cam_id] = seq
+            self.dirty.discard(cam_id)
+            self.tiles_drawn += 1
+            changed = True
+        return changed
+
+    def draw_rectangle(self, cam_id, start, end, color, thickness=2):
+        """Draws a rectangle given in frame coordinates over a tile until that tile is next redrawn."""
+        placement = self.placements[cam_id]
+        if placement is None:
+            return
+        _, x, y, _, _, scale = placement
+        p1 = (x + int(start[0] * scale), y + int(start[1] * scale))
+        p2 = (x + int(end[0] * scale), y + int(end[1] * scale))
+        cv2.rectangle(self.canvas, p1, p2, color, thickness)
+        self.dirty.add(cam_id)
+
+    def locate(self, x, y, cam_id=None):
+        """
+        Maps a canvas point to (cam_id, frame_x, frame_y). With 'cam_id' given,
+        the point is mapped into that camera's frame and clamped to it, so a
+        drag that leaves the tile still ends on the frame border. Returns None
+        if the point is not over a camera that has shown a frame.
+        """
+        if cam_id is None:
+            column, row = x // self.tile_w, y // self.tile_h
+            if column >= self.columns or row >= self.rows:
+                return None
+            cam_id = int(row * self.columns + column)
+            if cam_id >= self.num_cameras:
+                return None
+        placement = self.placements[cam_id]
+        if placement is None:
+            return None
+        frame_shape, tile_x, tile_y, _, _, scale = placement
+        frame_x = min(max(int((x - tile_x) / scale), 0), frame_shape[1] - 1)
+        frame_y = min(max(int((y - tile_y) / scale), 0), frame_shape[0] - 1)
+        return cam_id, frame_x, frame_y
@@ -0,0 +1,93 @@
+import cv2
+import time
+
+class MotionGate:
+    """
+    Cheap motion check run before detection on a camera's processed frame.
+    The frame is downscaled, converted to grayscale and compared with the
+    frame used for the last inference (or fed to a background subtractor).
+    Detection is skipped when the fraction of changed pixels is below the
+    camera's sensitivity, but forced at least every 'refresh_interval_sec'.
+    """
+    def __init__(self, method="diff", pixel_threshold=25, min_changed_fraction=0.002,
+                 refresh_interval_sec=5.0, downscale_width=160):
+        self.method = method
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval_sec = refresh_interval_sec
+        self.downscale_width = downscale_width
+
+        self.inferred = 0
+        self.skipped = 0
+        self.last_changed_fraction = 0.0
+        self.last_mask = None
+        self._reference = None
+        self._pending_reference = None
+        self._subtractor = None
+        self._last_inference_time = 0.0
+
+    @classmethod
+    def from_config(cls, config, cam_id):
+        """
+        Builds the gate for one camera from the 'motion_gate' config section,
+        where 'cameras' may override any setting per camera id.
+        """
+        gate_config = dict(config.get('motion_gate', {}))
+        overrides = gate_config.pop('cameras', None) or {}
+        gate_config.pop('enabled', None)
+        gate_config.update(overrides.get(cam_id, overrides.get(str(cam_id), {})) or {})
+        return cls(**gate_config)
+
+    def reset(self):
+        """Forgets the reference frame, e.g. when the ROI changes. The next check always infers."""
+        self._reference = None
+        self._subtractor = None
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        width = min(self.downscale_width, w)
+        small = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_mask(self, frame):
+        """Returns the downscaled mask of changed pixels, or None when there is no reference yet."""
+        gray = self._prepare(frame)
+        if self.method == "mog2":
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+                self._subtractor.apply(gray)
+                return None
+            return self._subtractor.apply(gray)
+
+        reference = self._reference
+        if reference is None or reference.shape != gray.shape:
+            self._reference = gray
+            return None
+        diff = cv2.absdiff(gray, reference)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self._pending_reference = gray
+        return mask
+
+    def check(self, frame, now=None):
+        """Returns True if detection should run on this frame, False to reuse the previous detections."""
+        now = time.time() if now is None else now
+        self._pending_reference = None
+        mask = self.changed_mask(frame)
+        self.last_mask = mask
+        if mask is None:
+            motion = True
+            self.last_changed_fraction = 1.0
+        else:
+            self.last_changed_fraction = cv2.countNonZero(mask) / mask.size
+            motion = self.last_changed_fraction >= self.min_changed_fraction
+
+        if motion or now - self._last_inference_time >= self.refresh_interval_sec:
+            # Differences are measured against the frame of the last inference
+            if self._pending_reference is not None:
+                self._reference = self._pending_reference
+            self._last_inference_time = now
+            self.inferred += 1
+            return True
+        self.skipped += 1
+        return False
@@ -0,0 +1,163 @@
+import multiprocessing as mp
+import threading
+from src.camera_worker import camera_loop, RESIZE_DIM
+from src.detector import load_detector_from_config
+from src.frame_store import SharedMemoryFrameStore
+from src.metrics import MetricsRegistry, MetricsServer
+from src.worker_services import start_worker_services, stop_worker_services
+
+class SharedViolationStatus:
+    """
+    Per-camera violation flags in a shared array, readable by the alarm in
+    the main process. Behaves like the {cam_id: bool} violation_status dict.
+    """
+    def __init__(self, num_cameras, ctx=mp):
+        self.flags = ctx.Array('b', num_cameras, lock=False)
+        # Violation start times, written by the camera processes for alarm latency metrics
+        self.onsets = ctx.Array('d', num_cameras, lock=False)
+
+    def __getitem__(self, cam_id):
+        return bool(self.flags[cam_id])
+
+    def __setitem__(self, cam_id, value):
+        self.flags[cam_id] = 1 if value else 0
+
+    def get(self, cam_id, default=False):
+        return bool(self.flags[cam_id]) if 0 <= cam_id < len(self.flags) else default
+
+    def values(self):
+        return [bool(flag) for flag in self.flags]
+
+    def items(self):
+        return list(enumerate(self.values()))
+
+class SharedRoiTable:
+    """
+    Per-camera ROI rectangles in a shared array, written by the mouse callback
+    in the main process and read by the camera processes. A width of 0 means
+    no ROI. Behaves like the {cam_id: (x, y, w, h)} roi_coords dict.
+    """
+    def __init__(self, num_cameras, ctx=mp):
+        self.coords = ctx.Array('i', num_cameras * 4, lock=False)
+
+    def get(self, cam_id, default=None):
+        x, y, w, h = self.coords[cam_id * 4:cam_id * 4 + 4]
+        return (x, y, w, h) if w > 0 else default
+
+    def __contains__(self, cam_id):
+        return self.get(cam_id) is not None
+
+    def __getitem__(self, cam_id):
+        roi = self.get(cam_id)
+        if roi is None:
+            raise KeyError(cam_id)
+        return roi
+
+    def __setitem__(self, cam_id, roi):
+        self.coords[cam_id * 4:cam_id * 4 + 4] = list(roi)
+
+    def __delitem__(self, cam_id):
+        self.coords[cam_id * 4:cam_id * 4 + 4] = [0, 0, 0, 0]
+
+def camera_group_process(group_index, cam_ids, camera_feeds, config_path, store_args, shared_handles):
+    """
+    Entry point of a camera worker process. Loads its own copy of the detector
+    and runs one camera_loop thread per camera in its group. Frames and
+    violation flags go back to the main process through shared memory.
+    With metrics enabled, each process serves its own /metrics endpoint on
+    the configured port + 1 + group_index.
+    """
+    detector_settings, config = load_detector_from_config(config_path)
+    if not detector_settings:
+        print(f"🔴 [FATAL] Worker for cameras {cam_ids} could not load detector. Exiting.")
+        return
+
+    frame_store = SharedMemoryFrameStore(*store_args)
+    shared_data = {
+        'frame_store': frame_store,
+        'lock': threading.Lock(),
+        'stop_events': shared_handles['stop_events'],
+        'violation_status': shared_handles['violation_status'],
+        'roi_coords': shared_handles['roi_coords'],
+        'violation_onsets': shared_handles['violation_status'].onsets,
+        'violation_changed': shared_handles['violation_changed'],
+        'config': config
+    }
+
+    metrics_server = None
+    metrics_config = config.get('metrics', {})
+    if metrics_config.get('enabled', False):
+        shared_data['metrics'] = MetricsRegistry()
+        metrics_server = MetricsServer(shared_data['metrics'], metrics_config.get('host', '127.0.0.1'),
+                                       metrics_config.get('port', 9100) + 1 + group_index)
+        threading.Thread(target=metrics_server.run, daemon=True).start()
+
+    services = start_worker_services(detector_settings, config, shared_data, len(cam_ids))
+
+    threads = []
+    for cam_id in cam_ids:
+        thread = threading.Thread(target=camera_loop, args=(cam_id, camera_feeds[cam_id], detector_settings, shared_data), daemon=True)
+        threads.append(thread)
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+    stop_worker_services(services)
+    if metrics_server:
+        metrics_server.stop()
+    frame_store.close()
+
+class CameraProcessPool:
+    """
+    Runs the cameras in separate processes, in groups of 'cameras_per_process',
+    so pre/post-processing and drawing are not limited by a single GIL.
+    Exposes the same shared_data structure as the threaded mode to the main
+    process: a shared-memory frame store, shared violation flags and ROIs.
+    """
+    def __init__(self, config, config_path="config/config.yaml"):
+        self.config = config
+        self.config_path = config_path
+        self.camera_feeds = config.get('camera_feeds', [])
+        num_cameras = len(self.camera_feeds)
+        self.ctx = mp.get_context('spawn')
+
+        pool_config = config.get('process_pool', {})
+        self.cameras_per_process = max(1, int(pool_config.get('cameras_per_process', 1)))
+
+        width, height = config.get('resize_dim', RESIZE_DIM)
+        self.frame_store = SharedMemoryFrameStore(num_cameras, (height, width, 3), slots=int(pool_config.get('ring_slots', 3)))
+        self.shared_data = {
+            'frame_store': self.frame_store,
+            'lock': threading.Lock(),
+            'stop_events': [self.ctx.Event() for _ in range(num_cameras)],
+            'violation_status': SharedViolationStatus(num_cameras, self.ctx),
+            'roi_coords': SharedRoiTable(num_cameras, self.ctx),
+            'config': config
+        }
+        self.shared_data['violation_onsets'] = self.shared_data['violation_status'].onsets
+        self.shared_data['violation_changed'] = self.ctx.Event()
+        self.processes = []
+
+    def start(self):
+        """Starts one worker process per group of cameras."""
+        shared_handles = {key: self.shared_data[key] for key in ('stop_events', 'violation_status', 'roi_coords', 'violation_changed')}
+        cam_ids = list(range(len(self.camera_feeds)))
+        for group_index, start in enumerate(range(0, len(cam_ids), self.cameras_per_process)):
+            group = cam_ids[start:start + self.cameras_per_process]
+            process = self.ctx.Process(
+                target=camera_group_process,
+                args=(group_index, group, self.camera_feeds, self.config_path, self.frame_store.attach_args(), shared_handles),
+                daemon=True)
+            process.start()
+            self.processes.append(process)
+        print(f"[INFO] Started {len(self.processes)} camera worker processes.")
+
+    def stop(self):
+        """Stops all camera processes and frees the shared memory."""
+        for event in self.shared_data['stop_events']:
+            event.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.frame_store.close()
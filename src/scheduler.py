@@ -0,0 +1,213 @@
+import threading
+import time
+
+PRIORITY_NAMES = ("quiet", "motion", "violation")
+
+class _CameraSchedule:
+    """Scheduling state of one camera."""
+    def __init__(self, target_fps, now):
+        self.target_fps = target_fps
+        self.priority = 0
+        # Never, so a clock that starts at 0 (as in tests) does not see a recent grant, motion or violation
+        self.last_granted = float('-inf')
+        self.last_motion = float('-inf')
+        self.last_violation = float('-inf')
+        self.window_start = now
+        self.offered = 0
+        self.inferred = 0
+        self.granted = 0
+        self.deferred = 0
+        self.forced = 0
+        self.offered_fps = 0.0
+        self.effective_fps = 0.0
+
+class InferenceScheduler:
+    """
+    Shares a global inference budget ('budget_fps' inferences per second)
+    between the cameras of one process, so an overloaded box slows down the
+    quiet cameras first instead of all cameras alike.
+    Every camera is guaranteed one inference per 'min_refresh_sec'. The rest
+    of the budget is shared by weight: cameras with a violation in the last
+    'violation_hold_sec' weigh 'violation_weight', cameras with motion (or
+    people in view) in the last 'motion_hold_sec' weigh 'motion_weight', and
+    quiet cameras weigh 'quiet_weight'. No camera gets more than the rate its
+    frames arrive at; what it cannot use goes to the others. Quiet cameras can
+    also be given a smaller model input with 'quiet_input_scale'.
+    Camera threads call admit() before inferring, grant() when they do
+    infer and record() afterwards; the scheduler thread rebalances every
+    'rebalance_sec' and publishes the per-camera target, effective and
+    offered FPS as metrics.
+    """
+    def __init__(self, budget_fps=20.0, min_refresh_sec=2.0, violation_hold_sec=10.0, motion_hold_sec=3.0,
+                 violation_weight=4.0, motion_weight=2.0, quiet_weight=1.0, quiet_input_scale=1.0,
+                 rebalance_sec=1.0, metrics=None):
+        self.budget_fps = float(budget_fps)
+        self.min_refresh_sec = float(min_refresh_sec)
+        self.violation_hold_sec = violation_hold_sec
+        self.motion_hold_sec = motion_hold_sec
+        self.weights = (quiet_weight, motion_weight, violation_weight)
+        self.quiet_input_scale = quiet_input_scale
+        self.rebalance_sec = rebalance_sec
+        self.metrics = metrics
+
+        self.cameras = {}
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    @classmethod
+    def from_config(cls, config, budget_share=1.0, metrics=None):
+        """
+        Builds the scheduler from the 'scheduler' config section, or returns None
+        if it is disabled. 'budget_share' is the fraction of 'budget_fps' for
+        this process when cameras are spread over several processes.
+        """
+        scheduler_config = dict(config.get('scheduler', {}))
+        if not scheduler_config.pop('enabled', False):
+            return None
+        scheduler_config['budget_fps'] = scheduler_config.get('budget_fps', 20.0) * budget_share
+        return cls(metrics=metrics, **scheduler_config)
+
+    def _camera(self, cam_id, now):
+        camera = self.cameras.get(cam_id)
+        if camera is None:
+            # Until the first rebalance a new camera gets an even share
+            camera = _CameraSchedule(self.budget_fps / (len(self.cameras) + 1), now)
+            self.cameras[cam_id] = camera
+        return camera
+
+    def admit(self, cam_id, now=None):
+        """
+        Called by a camera thread for every frame it would infer. Returns True
+        if the camera is within its share of the budget, or is due for its
+        minimum refresh; False to reuse its previous detections. Admission
+        does not use up the slot: the camera calls grant() once it actually
+        runs inference, so a frame the motion gate skips costs nothing.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            camera = self._camera(cam_id, now)
+            camera.offered += 1
+            elapsed = now - camera.last_granted
+            if elapsed < 1.0 / max(camera.target_fps, 1e-6) and elapsed < self.min_refresh_sec:
+                camera.deferred += 1
+                return False
+            return True
+
+    def grant(self, cam_id, now=None):
+        """Called by a camera thread when it runs inference on a frame; starts the wait for its next slot."""
+        now = time.time() if now is None else now
+        with self._lock:
+            camera = self._camera(cam_id, now)
+            if now - camera.last_granted < 1.0 / max(camera.target_fps, 1e-6):
+                # Over its share: the minimum refresh, or a frame without previous detections
+                camera.forced += 1
+            camera.last_granted = now
+            camera.granted += 1
+
+    def record(self, cam_id, inferred, motion=False, violation=False, now=None):
+        """Reports what a camera did with a frame: whether it ran inference and whether it saw motion or a violation."""
+        now = time.time() if now is None else now
+        with self._lock:
+            camera = self._camera(cam_id, now)
+            camera.inferred += bool(inferred)
+            if motion:
+                camera.last_motion = now
+            if violation:
+                camera.last_violation = now
+
+    def remove(self, cam_id):
+        """Drops a camera that was stopped, so it no longer holds a share of the budget."""
+        with self._lock:
+            self.cameras.pop(cam_id, None)
+
+    def input_scale(self, cam_id):
+        """Scale factor for the camera's model input: 'quiet_input_scale' while it is quiet, otherwise 1."""
+        camera = self.cameras.get(cam_id)
+        return self.quiet_input_scale if camera is not None and camera.priority == 0 else 1.0
+
+    def _allocate(self, demands, weights):
+        """
+        Water-filling: every camera gets the minimum refresh rate, then the rest
+        of the budget is split by weight, capped at each camera's demand, with
+        the unused share handed on to the cameras that still want more.
+        """
+        floor = 1.0 / self.min_refresh_sec if self.min_refresh_sec > 0 else 0.0
+        rates = {cam_id: min(floor, demand) if demand > 0 else floor for cam_id, demand in demands.items()}
+        remaining = self.budget_fps - sum(rates.values())
+        hungry = {cam_id for cam_id, demand in demands.items() if demand > rates[cam_id]}
+        while remaining > 1e-6 and hungry:
+            total_weight = sum(weights[cam_id] for cam_id in hungry)
+            spent = 0.0
+            for cam_id in list(hungry):
+                share = remaining * weights[cam_id] / total_weight
+                grant = min(share, demands[cam_id] - rates[cam_id])
+                rates[cam_id] += grant
+                spent += grant
+                if rates[cam_id] >= demands[cam_id] - 1e-6:
+                    hungry.discard(cam_id)
+            remaining -= spent
+            if spent <= 1e-6:
+                break
+        return rates
+
+    def rebalance(self, now=None):
+        """Recomputes every camera's priority and target rate from the last window's activity."""
+        now = time.time() if now is None else now
+        with self._lock:
+            demands, weights = {}, {}
+            for cam_id, camera in self.cameras.items():
+                elapsed = max(now - camera.window_start, 1e-6)
+                camera.offered_fps = camera.offered / elapsed
+                camera.effective_fps = camera.inferred / elapsed
+                camera.offered = camera.inferred = 0
+                camera.window_start = now
+
+                if now - camera.last_violation < self.violation_hold_sec:
+                    priority = 2
+                elif now - camera.last_motion < self.motion_hold_sec:
+                    priority = 1
+                else:
+                    priority = 0
+                if priority != camera.priority:
+                    print(f"[SCHED] Cam {cam_id}: {PRIORITY_NAMES[camera.priority]} -> {PRIORITY_NAMES[priority]}")
+                camera.priority = priority
+                demands[cam_id] = camera.offered_fps
+                weights[cam_id] = self.weights[priority]
+
+            for cam_id, rate in self._allocate(demands, weights).items():
+                self.cameras[cam_id].target_fps = rate
+
+        if self.metrics:
+            for cam_id, camera in list(self.cameras.items()):
+                self.metrics.set_gauge(cam_id, 'sched_target_fps', camera.target_fps)
+                self.metrics.set_gauge(cam_id, 'sched_effective_fps', camera.effective_fps)
+                self.metrics.set_gauge(cam_id, 'sched_offered_fps', camera.offered_fps)
+                self.metrics.set_gauge(cam_id, 'sched_priority', camera.priority)
+                self.metrics.set_gauge(cam_id, 'sched_deferred', camera.deferred)
+                self.metrics.set_gauge(cam_id, 'sched_forced', camera.forced)
+
+    def snapshot(self):
+        """Per-camera scheduling state and decision counts, for reports and sizing."""
+        with self._lock:
+            return {cam_id: {"priority": PRIORITY_NAMES[camera.priority],
+                             "target_fps": round(camera.target_fps, 2),
+                             "effective_fps": round(camera.effective_fps, 2),
+                             "offered_fps": round(camera.offered_fps, 2),
+                             "granted": camera.granted,
+                             "deferred": camera.deferred,
+                             "forced": camera.forced}
+                    for cam_id, camera in sorted(self.cameras.items())}
+
+    def run(self):
+        """The main loop for the scheduler thread."""
+        print(f"[INFO] Inference scheduler started: budget {self.budget_fps:.1f} inferences/s, "
+              f"min refresh {self.min_refresh_sec:.1f}s.")
+        while not self.stop_event.wait(self.rebalance_sec):
+            self.rebalance()
+        for cam_id, state in self.snapshot().items():
+            print(f"[INFO] Cam {cam_id}: scheduler granted {state['granted']}, deferred {state['deferred']}, "
+                  f"forced {state['forced']} (last {state['effective_fps']:.1f} fps, {state['priority']}).")
+
+    def stop(self):
+        """Signals the scheduler thread to stop."""
+        self.stop_event.set()
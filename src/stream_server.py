@@ -0,0 +1,223 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2
+
+BOUNDARY = "frame"
+
+class _StreamChannel:
+    """Latest JPEG of one camera, shared by all of its viewers."""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.viewers = 0
+        self.jpeg = None
+        self.seq = 0  # frame store sequence number of the encoded frame
+        self.encoded = 0  # frames encoded so far; viewers wait on this, as 'seq' restarts with the camera
+
+    def wait_newer(self, encoded, timeout):
+        """Blocks until more than 'encoded' frames have been encoded. Returns (jpeg, encoded) or (None, encoded) on timeout."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.encoded > encoded, timeout=timeout):
+                return None, encoded
+            return self.jpeg, self.encoded
+
+    def reset(self):
+        """Drops the frame of a camera that was restarted; connected viewers stay and get its new frames."""
+        with self.condition:
+            self.jpeg = None
+            self.seq = 0
+
+class StreamServer:
+    """
+    Serves the annotated frames of every camera over HTTP for headless
+    deployments: MJPEG at /stream/<cam_id> and a single JPEG at
+    /snapshot/<cam_id>.jpg. One encoder thread JPEG-encodes each new frame
+    once and fans the bytes out to every viewer of that camera; cameras
+    without viewers are not encoded at all. Each client can lower its own
+    frame rate with ?fps=N, up to 'max_fps'.
+    """
+    def __init__(self, frame_store, num_cameras, host="127.0.0.1", port=8080, max_fps=15, jpeg_quality=80,
+                 titles=None, metrics=None):
+        self.frame_store = frame_store
+        self.num_cameras = num_cameras
+        self.max_fps = max_fps
+        self.jpeg_quality = jpeg_quality
+        self.titles = titles or [f"Camera {i}" for i in range(num_cameras)]
+        self.metrics = metrics
+        self.channels = [_StreamChannel() for _ in range(num_cameras)]
+        self.viewer_joined = threading.Event()
+        self.stop_event = threading.Event()
+        self.encoder_thread = None
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                try:
+                    if url.path in ("/", ""):
+                        server._send_index(self)
+                    elif len(parts) == 2 and parts[0] == "stream":
+                        fps = float(parse_qs(url.query).get("fps", [server.max_fps])[0])
+                        server._send_stream(self, server._channel_id(parts[1]), fps)
+                    elif len(parts) == 2 and parts[0] == "snapshot":
+                        server._send_snapshot(self, server._channel_id(parts[1].split(".")[0]))
+                    else:
+                        self.send_error(404)
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Viewer went away
+
+            def log_message(self, format, *args):
+                pass  # Keep viewer requests out of the application log
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+
+    @classmethod
+    def from_config(cls, config, frame_store, num_cameras, titles=None, metrics=None):
+        stream_config = config.get('stream_server', {})
+        return cls(frame_store, num_cameras,
+                   host=stream_config.get('host', '127.0.0.1'),
+                   port=stream_config.get('port', 8080),
+                   max_fps=stream_config.get('max_fps', 15),
+                   jpeg_quality=stream_config.get('jpeg_quality', 80),
+                   titles=titles, metrics=metrics)
+
+    def _channel_id(self, text):
+        cam_id = int(text)
+        if not 0 <= cam_id < self.num_cameras or self.titles[cam_id] is None:
+            raise ValueError(cam_id)
+        return cam_id
+
+    def set_titles(self, titles, restarted=()):
+        """
+        Updates the camera list after a config reload. 'titles' is indexed by
+        camera id, with None for ids without a camera. The channels of the
+        cameras in 'restarted', and of those whose title changed, are reset.
+        """
+        titles = list(titles)
+        for cam_id, title in enumerate(titles):
+            if cam_id >= len(self.channels):
+                self.channels.append(_StreamChannel())
+            elif cam_id in restarted or cam_id >= len(self.titles) or title != self.titles[cam_id]:
+                self.channels[cam_id].reset()
+        self.titles = titles
+        self.num_cameras = len(titles)
+
+    def _join(self, cam_id, channel, delta):
+        with channel.condition:
+            channel.viewers += delta
+            viewers = channel.viewers
+        if delta > 0:
+            self.viewer_joined.set()
+        if self.metrics:
+            self.metrics.set_gauge(cam_id, 'stream_viewers', viewers)
+
+    def _send_index(self, handler):
+        links = "".join(f'<li><a href="/stream/{i}">{title}</a> (<a href="/snapshot/{i}.jpg">snapshot</a>)</li>'
+                        for i, title in enumerate(self.titles) if title is not None)
+        body = f"<html><body><h3>Helmet Detection streams</h3><ul>{links}</ul></body></html>".encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _send_snapshot(self, handler, cam_id):
+        channel = self.channels[cam_id]
+        self._join(cam_id, channel, 1)
+        try:
+            # Wait for a frame encoded after this request arrived, so the snapshot is current
+            jpeg, _ = channel.wait_newer(channel.encoded, timeout=2.0)
+            jpeg = jpeg or channel.jpeg
+        finally:
+            self._join(cam_id, channel, -1)
+        if jpeg is None:
+            handler.send_error(503, "No frame available yet")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def _send_stream(self, handler, cam_id, fps):
+        channel = self.channels[cam_id]
+        min_interval = 1.0 / max(0.1, min(fps, self.max_fps))
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+
+        self._join(cam_id, channel, 1)
+        try:
+            last_encoded = 0
+            while not self.stop_event.is_set():
+                jpeg, last_encoded = channel.wait_newer(last_encoded, timeout=1.0)
+                if jpeg is None:
+                    continue
+                sent_at = time.perf_counter()
+                handler.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                # Per-client rate limit: frames encoded meanwhile are skipped, not queued
+                remaining = min_interval - (time.perf_counter() - sent_at)
+                if remaining > 0:
+                    self.stop_event.wait(remaining)
+        finally:
+            self._join(cam_id, channel, -1)
+
+    def _encode_loop(self):
+        """Encodes the newest frame of every watched camera, at most 'max_fps' times per second."""
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)]
+        interval = 1.0 / self.max_fps
+        while not self.stop_event.is_set():
+            watched = [cam_id for cam_id, channel in enumerate(list(self.channels)) if channel.viewers > 0]
+            if not watched:
+                self.viewer_joined.wait(timeout=0.5)
+                self.viewer_joined.clear()
+                continue
+
+            tick_start = time.perf_counter()
+            for cam_id in watched:
+                channel = self.channels[cam_id]
+                store_seq = self.frame_store.sequence(cam_id)
+                if store_seq < channel.seq:
+                    # The camera was restarted and its frame store slot numbers from 0 again
+                    channel.reset()
+                if store_seq == channel.seq:
+                    continue
+                frame, _, seq = self.frame_store.latest(cam_id)
+                if frame is None:
+                    continue
+                encode_start = time.perf_counter()
+                ok, buffer = cv2.imencode(".jpg", frame, params)
+                if not ok:
+                    continue
+                if self.metrics:
+                    self.metrics.observe(cam_id, 'stream_encode', time.perf_counter() - encode_start)
+                with channel.condition:
+                    channel.jpeg = buffer.tobytes()
+                    channel.seq = seq
+                    channel.encoded += 1
+                    channel.condition.notify_all()
+            self.stop_event.wait(max(0.0, interval - (time.perf_counter() - tick_start)))
+
+    def run(self):
+        host, port = self.httpd.server_address[:2]
+        print(f"[INFO] Camera streams available at http://{host}:{port}/")
+        self.encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encoder_thread.start()
+        self.httpd.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.stop_event.set()
+        self.viewer_joined.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.encoder_thread:
+            self.encoder_thread.join(timeout=2)
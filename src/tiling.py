@@ -0,0 +1,178 @@
+import math
+import time
+import cv2
+import numpy as np
+from src.detections import Detections
+
+def tile_starts(length, tile, overlap):
+    """Start offsets of overlapping tiles of size 'tile' covering [0, length)."""
+    if length <= tile:
+        return [0]
+    stride = max(1, int(tile * (1.0 - overlap)))
+    count = math.ceil((length - tile) / stride) + 1
+    # Spread the tiles evenly so the last one ends exactly at the border
+    step = (length - tile) / (count - 1)
+    return [int(round(i * step)) for i in range(count)]
+
+def merge_detections(detections, iou_threshold=0.5, metric="ios"):
+    """
+    Vectorized cross-tile NMS. Builds the pairwise overlap matrix of all boxes
+    once, ordered by score, and drops every box that overlaps a higher-scoring
+    box of the same class by more than the threshold. 'ios' (intersection over
+    the smaller box) also merges a box cut by a tile border with the full box
+    from the neighbouring tile, which plain IoU misses.
+    This is "Fast NMS" (upper triangle of the overlap matrix), not greedy NMS:
+    a box can be dropped by a higher-scoring box that was itself dropped, so
+    in a chain of overlapping boxes it may keep fewer boxes than greedy NMS
+    (src.detections.non_max_suppression) would.
+    """
+    if len(detections) < 2:
+        return detections
+    order = np.argsort(-detections.confs)
+    boxes = detections.boxes[order]
+    class_ids = detections.class_ids[order]
+    areas = (boxes[:, 2] - boxes[:, 0]).clip(0) * (boxes[:, 3] - boxes[:, 1]).clip(0)
+    top_left = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:], boxes[None, :, 2:])
+    wh = (bottom_right - top_left).clip(0)
+    inter = wh[..., 0] * wh[..., 1]
+    if metric == "ios":
+        overlap = inter / (np.minimum(areas[:, None], areas[None, :]) + 1e-9)
+    else:
+        overlap = inter / (areas[:, None] + areas[None, :] - inter + 1e-9)
+    overlap[class_ids[:, None] != class_ids[None, :]] = 0
+    # Only higher-scoring boxes (earlier rows) may suppress a box
+    overlap = np.triu(overlap, k=1)
+    keep = overlap.max(axis=0) <= iou_threshold
+    return detections.filter(order[keep])
+
+class TiledDetector:
+    """
+    Runs detection on overlapping native-resolution tiles of a camera frame,
+    so small, distant objects are not lost by downscaling the whole frame.
+    All tiles of a frame go through the model as one batch and the results
+    are merged with merge_detections(). Tiles outside the ROI are never
+    cut, and with 'skip_static' a tile whose pixels have not changed since
+    it was last inferred reuses its previous detections, with a forced
+    refresh every 'refresh_interval_sec'. 'include_full_frame' (on by
+    default) adds a downscaled view of the whole region to the batch, so
+    objects larger than a tile are still found.
+    """
+    def __init__(self, tile_size=640, overlap=0.2, iou_threshold=0.5, match_metric="ios", skip_static=True,
+                 pixel_threshold=25, min_changed_fraction=0.002, refresh_interval_sec=5.0,
+                 include_full_frame=True, downscale_width=320):
+        self.tile_size = int(tile_size)
+        self.overlap = float(overlap)
+        self.iou_threshold = iou_threshold
+        self.match_metric = match_metric
+        self.skip_static = skip_static
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval_sec = refresh_interval_sec
+        self.include_full_frame = include_full_frame
+        self.downscale_width = downscale_width
+
+        self.tiles_inferred = 0
+        self.tiles_skipped = 0
+        self._layout_key = None
+        self._tiles = []
+        self._cached = {}
+        self._last_inferred = {}
+        self._reference = None
+
+    @classmethod
+    def from_config(cls, config, cam_id):
+        """
+        Builds the tiler for one camera from the 'tiling' config section, where
+        'cameras' may override any setting (including 'enabled') per camera id.
+        Returns None when tiling is disabled for this camera.
+        """
+        tiling_config = dict(config.get('tiling', {}))
+        overrides = tiling_config.pop('cameras', None) or {}
+        tiling_config.update(overrides.get(cam_id, overrides.get(str(cam_id), {})) or {})
+        if not tiling_config.pop('enabled', False):
+            return None
+        return cls(**tiling_config)
+
+    def reset(self):
+        """Forgets cached tile detections, e.g. when the ROI changes."""
+        self._layout_key = None
+        self._cached = {}
+        self._last_inferred = {}
+        self._reference = None
+
+    def tiles(self, frame_shape, region=None):
+        """Tile rectangles (x1, y1, x2, y2) covering 'region' of the frame, recomputed only when the layout changes."""
+        height, width = frame_shape[:2]
+        region = tuple(region) if region else (0, 0, width, height)
+        key = (height, width, region)
+        if key != self._layout_key:
+            x1, y1, x2, y2 = region
+            size_x, size_y = min(self.tile_size, x2 - x1), min(self.tile_size, y2 - y1)
+            self._tiles = [(x1 + tx, y1 + ty, x1 + tx + size_x, y1 + ty + size_y)
+                           for ty in tile_starts(y2 - y1, size_y, self.overlap)
+                           for tx in tile_starts(x2 - x1, size_x, self.overlap)]
+            self._layout_key = key
+            self._cached = {}
+            self._last_inferred = {}
+            self._reference = None
+        return self._tiles
+
+    def _changed_tiles(self, frame, tiles, now):
+        """Indices of the tiles that changed since they were last inferred or are due for a refresh."""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.downscale_width / width)
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self._reference is None or self._reference.shape != gray.shape:
+            self._reference = gray.copy()
+            return list(range(len(tiles))), gray, scale
+
+        changed = cv2.absdiff(gray, self._reference) > self.pixel_threshold
+        active = []
+        for index, (x1, y1, x2, y2) in enumerate(tiles):
+            sx1, sy1, sx2, sy2 = int(x1 * scale), int(y1 * scale), max(int(x2 * scale), int(x1 * scale) + 1), max(int(y2 * scale), int(y1 * scale) + 1)
+            fraction = changed[sy1:sy2, sx1:sx2].mean() if changed[sy1:sy2, sx1:sx2].size else 1.0
+            stale = now - self._last_inferred.get(index, 0.0) >= self.refresh_interval_sec
+            if index not in self._cached or stale or fraction >= self.min_changed_fraction:
+                active.append(index)
+        return active, gray, scale
+
+    def detect(self, frame, infer, region=None):
+        """
+        Detects objects in 'region' (x1, y1, x2, y2, native pixels; default the
+        whole frame). 'infer' takes a list of images and returns one Detections
+        per image. Returns the merged detections in native frame coordinates.
+        """
+        tiles = self.tiles(frame.shape, region)
+        now = time.time()
+        if self.skip_static:
+            active, gray, scale = self._changed_tiles(frame, tiles, now)
+        else:
+            active, gray, scale = list(range(len(tiles))), None, 1.0
+        self.tiles_inferred += len(active)
+        self.tiles_skipped += len(tiles) - len(active)
+
+        images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in (tiles[i] for i in active)]
+        full_scale = None
+        if self.include_full_frame and len(tiles) > 1:
+            x1, y1, x2, y2 = region if region else (0, 0, frame.shape[1], frame.shape[0])
+            full_scale = self.tile_size / max(x2 - x1, y2 - y1)
+            images.append(cv2.resize(frame[y1:y2, x1:x2], None, fx=full_scale, fy=full_scale, interpolation=cv2.INTER_AREA))
+
+        results = infer(images) if images else []
+        for index, detections in zip(active, results):
+            x1, y1 = tiles[index][:2]
+            self._cached[index] = detections.offset(x1, y1)
+            self._last_inferred[index] = now
+            if gray is not None:
+                tx1, ty1, tx2, ty2 = tiles[index]
+                self._reference[int(ty1 * scale):int(ty2 * scale), int(tx1 * scale):int(tx2 * scale)] = \
+                    gray[int(ty1 * scale):int(ty2 * scale), int(tx1 * scale):int(tx2 * scale)]
+
+        parts = [self._cached.get(index, Detections()) for index in range(len(tiles))]
+        if full_scale is not None:
+            x1, y1 = (region or (0, 0))[:2]
+            parts.append(results[-1].scale(1 / full_scale, 1 / full_scale).offset(x1, y1))
+        merged = Detections.concatenate(parts)
+        return merge_detections(merged, self.iou_threshold, self.match_metric)
@@ -0,0 +1,176 @@
+from collections import namedtuple
+import numpy as np
+from src.detections import Detections, box_iou
+
+TrackerResult = namedtuple('TrackerResult', ['detections', 'violations', 'new_violations'])
+TrackerResult.__doc__ = """
+Output of the tracker for one frame: the tracked boxes (with track_ids),
+a bool array marking tracks that are confirmed violations, and the ids of
+tracks that became violations in this frame.
+"""
+
+# Constant-velocity model over [cx, cy, area, aspect, vx, vy, v_area], as in SORT
+_F = np.eye(7, dtype=np.float64)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_H = np.eye(4, 7, dtype=np.float64)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0])
+
+def _boxes_to_z(boxes):
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.column_stack((boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)))
+
+def _states_to_boxes(states):
+    area = np.maximum(states[:, 2], 1e-6)
+    w = np.sqrt(area * np.maximum(states[:, 3], 1e-6))
+    h = area / np.maximum(w, 1e-6)
+    return np.column_stack((states[:, 0] - w / 2, states[:, 1] - h / 2,
+                            states[:, 0] + w / 2, states[:, 1] + h / 2)).astype(np.float32)
+
+class SortTracker:
+    """
+    Lightweight SORT-style multi-object tracker for one camera.
+    All tracks live in NumPy arrays and their Kalman filters are predicted and
+    updated together. Detections are matched to tracks greedily by IoU.
+    A track becomes a violation after 'min_violation_frames' consecutive
+    frames matched to a violation-class box, and stops being one after as
+    many consecutive non-violation frames.
+    """
+    def __init__(self, iou_threshold=0.3, max_age=15, min_violation_frames=3):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_violation_frames = max(1, int(min_violation_frames))
+        self.next_id = 1
+        self._reset_arrays()
+
+    @classmethod
+    def from_config(cls, config):
+        tracker_config = config.get('tracker', {})
+        return cls(iou_threshold=tracker_config.get('iou_threshold', 0.3),
+                   max_age=tracker_config.get('max_age', 15),
+                   min_violation_frames=tracker_config.get('min_violation_frames', 3))
+
+    def _reset_arrays(self):
+        self.states = np.zeros((0, 7))
+        self.covariances = np.zeros((0, 7, 7))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.class_ids = np.zeros(0, dtype=np.int32)
+        self.confs = np.zeros(0, dtype=np.float32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.violation_streak = np.zeros(0, dtype=np.int32)
+        self.clear_streak = np.zeros(0, dtype=np.int32)
+        self.is_violation = np.zeros(0, dtype=bool)
+
+    def reset(self):
+        """Drops all tracks, e.g. when the ROI changes."""
+        self._reset_arrays()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predict(self):
+        self.states = self.states @ _F.T
+        self.covariances = _F @ self.covariances @ _F.T + _Q
+
+    def _result(self, new_violations=()):
+        detections = Detections(_states_to_boxes(self.states), self.confs.copy(), self.class_ids.copy(), self.ids.copy())
+        return TrackerResult(detections, self.is_violation.copy(), list(new_violations))
+
+    def predict(self):
+        """
+        Advances all tracks by one frame without a detection pass, so boxes are
+        carried forward on frames where inference was skipped. Tracks do not
+        age on these frames.
+        """
+        if len(self):
+            self._predict()
+        result = self._result()
+        visible = self.misses == 0
+        return TrackerResult(result.detections.filter(visible), result.violations[visible], [])
+
+    def update(self, detections, violation_mask):
+        """
+        Predicts all tracks, matches them against this frame's detections and
+        updates the matched Kalman filters. Unmatched detections start new
+        tracks; tracks unmatched for more than 'max_age' updates are removed.
+        """
+        if len(self):
+            self._predict()
+
+        num_tracks, num_dets = len(self), len(detections)
+        matched_tracks, matched_dets = [], []
+        if num_tracks and num_dets:
+            ious = box_iou(_states_to_boxes(self.states), detections.boxes)
+            # Greedy matching: highest IoU pairs first
+            order = np.argsort(-ious, axis=None)
+            used_tracks = np.zeros(num_tracks, dtype=bool)
+            used_dets = np.zeros(num_dets, dtype=bool)
+            for flat_index in order:
+                t, d = divmod(int(flat_index), num_dets)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if used_tracks[t] or used_dets[d]:
+                    continue
+                used_tracks[t] = used_dets[d] = True
+                matched_tracks.append(t)
+                matched_dets.append(d)
+
+        matched_tracks = np.array(matched_tracks, dtype=np.int64)
+        matched_dets = np.array(matched_dets, dtype=np.int64)
+
+        # Batched Kalman update for every matched track
+        self.misses += 1
+        if len(matched_tracks):
+            P = self.covariances[matched_tracks]
+            S = _H @ P @ _H.T + _R
+            K = P @ _H.T @ np.linalg.inv(S)
+            residual = _boxes_to_z(detections.boxes[matched_dets]) - self.states[matched_tracks] @ _H.T
+            self.states[matched_tracks] += np.einsum('nij,nj->ni', K, residual)
+            self.covariances[matched_tracks] = (np.eye(7) - K @ _H) @ P
+            self.confs[matched_tracks] = detections.confs[matched_dets]
+            self.class_ids[matched_tracks] = detections.class_ids[matched_dets]
+            self.misses[matched_tracks] = 0
+
+            is_violation_box = np.asarray(violation_mask, dtype=bool)[matched_dets]
+            self.violation_streak[matched_tracks] = np.where(is_violation_box, self.violation_streak[matched_tracks] + 1, 0)
+            self.clear_streak[matched_tracks] = np.where(is_violation_box, 0, self.clear_streak[matched_tracks] + 1)
+
+        was_violation = self.is_violation.copy()
+        self.is_violation |= self.violation_streak >= self.min_violation_frames
+        self.is_violation &= self.clear_streak < self.min_violation_frames
+        new_violations = self.ids[self.is_violation & ~was_violation].tolist()
+
+        # Start new tracks for unmatched detections
+        unmatched = np.setdiff1d(np.arange(num_dets), matched_dets)
+        if len(unmatched):
+            n = len(unmatched)
+            new_states = np.zeros((n, 7))
+            new_states[:, :4] = _boxes_to_z(detections.boxes[unmatched])
+            new_violation_box = np.asarray(violation_mask, dtype=bool)[unmatched]
+            new_is_violation = new_violation_box & (self.min_violation_frames <= 1)
+            self.states = np.concatenate((self.states, new_states))
+            self.covariances = np.concatenate((self.covariances, np.repeat(_P0[None], n, axis=0)))
+            new_ids = np.arange(self.next_id, self.next_id + n)
+            self.next_id += n
+            self.ids = np.concatenate((self.ids, new_ids))
+            self.class_ids = np.concatenate((self.class_ids, detections.class_ids[unmatched]))
+            self.confs = np.concatenate((self.confs, detections.confs[unmatched]))
+            self.misses = np.concatenate((self.misses, np.zeros(n, dtype=np.int32)))
+            self.violation_streak = np.concatenate((self.violation_streak, new_violation_box.astype(np.int32)))
+            self.clear_streak = np.concatenate((self.clear_streak, (~new_violation_box).astype(np.int32)))
+            self.is_violation = np.concatenate((self.is_violation, new_is_violation))
+            new_violations += new_ids[new_is_violation].tolist()
+
+        # Drop tracks that have not been matched for too long
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            for name in ('states', 'covariances', 'ids', 'class_ids', 'confs', 'misses',
+                         'violation_streak', 'clear_streak', 'is_violation'):
+                setattr(self, name, getattr(self, name)[alive])
+
+        # Only report tracks seen in this update; lost tracks are kept silently for re-matching
+        visible = self.misses == 0
+        result = self._result(new_violations)
+        return TrackerResult(result.detections.filter(visible), result.violations[visible], result.new_violations)
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera INTEGER NOT NULL,
+    track_id INTEGER,
+    class_name TEXT,
+    confidence REAL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    evidence TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_violations_camera_ts ON violations (camera, ts);
+CREATE INDEX IF NOT EXISTS idx_violations_ts_camera ON violations (ts, camera);
+"""
+
+COLUMNS = ("id", "ts", "camera", "track_id", "class_name", "confidence", "x1", "y1", "x2", "y2", "evidence")
+
+def connect(db_path, timeout=30.0):
+    """Opens the database in WAL mode, so queries never block the writer and several processes can write."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+class ViolationStore:
+    """
+    Records every violation event (camera, time, track, class, confidence,
+    box and evidence path) in an indexed SQLite database.
+    Camera threads only append to an in-memory queue; a background thread
+    inserts the queued events in one transaction per batch. When the queue
+    is full the oldest events are dropped rather than blocking detection.
+    """
+    def __init__(self, db_path="logs/violations.db", batch_size=256, flush_interval_sec=0.5,
+                 queue_size=10000, metrics=None):
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval_sec
+        self.queue_size = max(1, int(queue_size))
+        self.metrics = metrics
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self.stop_event = threading.Event()
+        # Create the schema up front so queries work before the first write
+        connect(self.db_path).close()
+
+    def record(self, cam_id, box, confidence=None, class_name=None, track_id=None, evidence=None, timestamp=None):
+        """Queues one violation event for insertion."""
+        x1, y1, x2, y2 = (int(v) for v in box)
+        row = (timestamp or time.time(), int(cam_id), None if track_id is None else int(track_id), class_name,
+               None if confidence is None else float(confidence), x1, y1, x2, y2, evidence)
+        with self._cond:
+            if len(self._rows) >= self.queue_size:
+                self._rows.popleft()
+                self.dropped += 1
+            self._rows.append(row)
+            self.recorded += 1
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+
+    def _write_batch(self, conn, rows):
+        write_start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO violations (ts, camera, track_id, class_name, confidence, x1, y1, x2, y2, evidence) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            print(f"🔴 [ERROR] Could not write {len(rows)} violation(s) to {self.db_path}: {e}")
+        if self.metrics:
+            self.metrics.observe('violation_store', 'violation_store_write', time.perf_counter() - write_start)
+            self.metrics.set_gauge('violation_store', 'violation_store_written', self.written)
+            self.metrics.set_gauge('violation_store', 'violation_store_dropped', self.dropped)
+
+    def run(self):
+        """The main loop for the writer thread. Waits for a full batch or the flush interval."""
+        print(f"[INFO] Violation store writing to {self.db_path}")
+        conn = connect(self.db_path)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._rows) >= self.batch_size or self.stop_event.is_set(),
+                                    timeout=self.flush_interval)
+                if not self._rows and self.stop_event.is_set():
+                    break
+                rows = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            if rows:
+                self._write_batch(conn, rows)
+        conn.close()
+        print(f"[INFO] Violation store stopped: {self.written} written, {self.dropped} dropped.")
+
+    def stop(self):
+        """Signals the writer thread to flush the queue and stop."""
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify()
+
+def _time_filter(camera=None, start=None, end=None):
+    clauses, params = [], []
+    if camera is not None:
+        clauses.append("camera = ?")
+        params.append(int(camera))
+    if start is not None:
+        clauses.append("ts >= ?")
+        params.append(float(start))
+    if end is not None:
+        clauses.append("ts < ?")
+        params.append(float(end))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def query_violations(db_path, camera=None, start=None, end=None, limit=1000, newest_first=True):
+    """Returns the violation events in [start, end) (Unix timestamps), optionally for one camera, as dicts."""
+    where, params = _time_filter(camera, start, end)
+    order = "DESC" if newest_first else "ASC"
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM violations{where} ORDER BY ts {order} LIMIT ?",
+                            params + [int(limit)]).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+def count_by_camera(db_path, start=None, end=None):
+    """Returns {camera: number of violation events} in [start, end)."""
+    where, params = _time_filter(None, start, end)
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT camera, COUNT(*) FROM violations{where} GROUP BY camera ORDER BY camera", params).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+def _parse_time(text):
+    """Accepts an ISO date/time ('2024-05-14', '2024-05-14 08:30') or a Unix timestamp."""
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the violation database.")
+    parser.add_argument("--db", default="logs/violations.db")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    query_parser = subparsers.add_parser("query", help="List violation events")
+    query_parser.add_argument("--camera", type=int, default=None)
+    query_parser.add_argument("--limit", type=int, default=100)
+    query_parser.add_argument("--oldest-first", action="store_true")
+    counts_parser = subparsers.add_parser("counts", help="Count violation events per camera")
+    for sub in (query_parser, counts_parser):
+        sub.add_argument("--since", default=None, help="Start time, e.g. '2024-05-14' or '2024-05-14 08:00'")
+        sub.add_argument("--until", default=None, help="End time (exclusive)")
+        sub.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"🔴 [FATAL] Violation database not found: {args.db}")
+    start, end = _parse_time(args.since), _parse_time(args.until)
+
+    if args.command == "counts":
+        counts = count_by_camera(args.db, start, end)
+        if args.json:
+            print(json.dumps(counts, indent=2))
+        else:
+            for camera, count in counts.items():
+                print(f"Camera {camera}: {count}")
+            print(f"Total: {sum(counts.values())}")
+        return
+
+    events = query_violations(args.db, args.camera, start, end, args.limit, newest_first=not args.oldest_first)
+    if args.json:
+        print(json.dumps(events, indent=2))
+        return
+    for event in events:
+        track = f"#{event['track_id']}" if event['track_id'] is not None else "-"
+        confidence = f"{event['confidence']:.2f}" if event['confidence'] is not None else "-"
+        print(f"{_format_time(event['ts'])} | Camera {event['camera']} | Track {track} | {event['class_name'] or '-'} "
+              f"{confidence} | Box ({event['x1']}, {event['y1']}, {event['x2']}, {event['y2']}) | {event['evidence'] or '-'}")
+    print(f"{len(events)} event(s)")
+
+if __name__ == '__main__':
+    main()
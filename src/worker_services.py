@@ -0,0 +1,99 @@
+import threading
+from src.clip_recorder import ClipRecorder
+from src.detection_cache import DetectionCache
+from src.evidence_writer import EvidenceWriter
+from src.inference_server import InferenceServer
+from src.scheduler import InferenceScheduler
+from src.violation_store import ViolationStore
+
+def start_worker_services(detector_settings, config, shared_data, num_cameras):
+    """
+    Starts the background services used by the camera threads of one process:
+    the batched inference server (when 'inference_mode' is 'batched') and the
+    evidence writer, the violation database and, with 'clips.enabled', the
+    violation clip recorder (when violation checking is enabled). Each service is
+    registered in shared_data. Returns a list of (service, thread) pairs.
+    With 'detection_cache.enabled', the on-disk detection cache is registered
+    as well (it has no thread of its own), and with 'scheduler.enabled' the
+    inference scheduler, which gets this process's share of the budget.
+    """
+    services = []
+    confidence = detector_settings['confidence']
+    detection_cache = DetectionCache.from_config(config)
+    if detection_cache:
+        shared_data['detection_cache'] = detection_cache
+        print(f"[INFO] Detection cache enabled at {detection_cache.cache_dir}")
+        if detector_settings.get('pipeline') is None:
+            # Cached boxes go down to the cache's floor; camera threads apply the live threshold
+            confidence = min(confidence, detection_cache.min_confidence)
+    total_cameras = max(num_cameras, len(config.get('camera_feeds', [])))
+    scheduler = InferenceScheduler.from_config(config, num_cameras / total_cameras if total_cameras else 1.0,
+                                               metrics=shared_data.get('metrics'))
+    if scheduler:
+        shared_data['scheduler'] = scheduler
+        services.append(scheduler)
+    if config.get('inference_mode', 'per_thread') == 'batched':
+        batch_config = config.get('batch_inference', {})
+        inference_server = InferenceServer(
+            detector_settings['model'],
+            confidence,
+            class_lookup=detector_settings['class_lookup'],
+            max_batch_size=batch_config.get('max_batch_size', num_cameras),
+            max_wait_ms=batch_config.get('max_wait_ms', 10),
+            metrics=shared_data.get('metrics'))
+        shared_data['inference_server'] = inference_server
+        services.append(inference_server)
+    else:
+        print("[INFO] Per-thread inference mode selected.")
+
+    if detector_settings.get('perform_violation_check', False):
+        evidence_config = config.get('evidence', {})
+        evidence_writer = EvidenceWriter(
+            log_path=evidence_config.get('log_path', 'logs/alerts.log'),
+            output_dir=evidence_config.get('output_dir', 'violations'),
+            queue_size=evidence_config.get('queue_size', 256),
+            batch_size=evidence_config.get('batch_size', 16),
+            max_crop_side=evidence_config.get('max_crop_side', 320),
+            jpeg_quality=evidence_config.get('jpeg_quality', 90),
+            metrics=shared_data.get('metrics'))
+        shared_data['evidence_writer'] = evidence_writer
+        services.append(evidence_writer)
+
+        store_config = config.get('violation_store', {})
+        if store_config.get('enabled', True):
+            violation_store = ViolationStore(
+                db_path=store_config.get('db_path', 'logs/violations.db'),
+                batch_size=store_config.get('batch_size', 256),
+                flush_interval_sec=store_config.get('flush_interval_sec', 0.5),
+                queue_size=store_config.get('queue_size', 10000),
+                metrics=shared_data.get('metrics'))
+            shared_data['violation_store'] = violation_store
+            services.append(violation_store)
+
+        clip_config = config.get('clips', {})
+        if clip_config.get('enabled', False):
+            clip_recorder = ClipRecorder(
+                output_dir=clip_config.get('output_dir', 'clips'),
+                pre_sec=clip_config.get('pre_sec', 5.0),
+                post_sec=clip_config.get('post_sec', 5.0),
+                record_fps=clip_config.get('record_fps', 10),
+                memory_budget_mb=clip_config.get('memory_budget_mb', 32),
+                jpeg_quality=clip_config.get('jpeg_quality', 75),
+                max_clip_sec=clip_config.get('max_clip_sec', 60.0),
+                metrics=shared_data.get('metrics'))
+            shared_data['clip_recorder'] = clip_recorder
+            services.append(clip_recorder)
+
+    running = []
+    for service in services:
+        thread = threading.Thread(target=service.run, daemon=True)
+        thread.start()
+        running.append((service, thread))
+    return running
+
+def stop_worker_services(services):
+    """Stops the services started by start_worker_services, in reverse order."""
+    for service, thread in reversed(services):
+        service.stop()
+        if thread.is_alive():
+            thread.join(timeout=5)
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+class ZoneMask:
+    """
+    Polygon zones of one camera, rasterised once into a label mask at the
+    display resolution. Detections are kept only if their anchor point (box
+    centre, or bottom centre for 'anchor: bottom') falls inside a zone, which
+    is a single array lookup per frame regardless of polygon complexity.
+    """
+    def __init__(self, zones, frame_size, anchor="center"):
+        width, height = frame_size
+        self.names = []
+        self.polygons = []
+        self.anchor = anchor
+        self.mask = np.zeros((height, width), dtype=np.uint8)  # 0 = outside, i + 1 = zone i
+        for index, zone in enumerate(zones):
+            points = np.asarray(zone['points'], dtype=np.int32).reshape(-1, 2)
+            self.names.append(zone.get('name', f"zone{index}"))
+            self.polygons.append(points)
+            cv2.fillPoly(self.mask, [points], index + 1)
+
+    @classmethod
+    def from_config(cls, config, cam_id, frame_size):
+        """Builds the zones of 'zones.cameras.<cam_id>' in config.yaml, or returns None if it has none."""
+        zone_config = config.get('zones', {})
+        cameras = zone_config.get('cameras') or {}
+        zones = cameras.get(cam_id, cameras.get(str(cam_id)))
+        if not zones:
+            return None
+        return cls(zones, frame_size, zone_config.get('anchor', 'center'))
+
+    def zone_ids(self, detections, dx=0, dy=0):
+        """Zone label (0 = outside) of every box; (dx, dy) shifts ROI boxes into frame coordinates."""
+        if not len(detections):
+            return np.zeros(0, dtype=np.uint8)
+        boxes = detections.boxes
+        xs = (boxes[:, 0] + boxes[:, 2]) / 2 + dx
+        ys = (boxes[:, 3] if self.anchor == "bottom" else (boxes[:, 1] + boxes[:, 3]) / 2) + dy
+        height, width = self.mask.shape
+        xs, ys = xs.astype(np.int32), ys.astype(np.int32)
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        labels = np.zeros(len(xs), dtype=np.uint8)
+        labels[inside] = self.mask[ys[inside], xs[inside]]
+        return labels
+
+    def filter(self, detections, dx=0, dy=0):
+        """Drops the detections whose anchor point is outside every zone."""
+        if not len(detections):
+            return detections
+        return detections.filter(self.zone_ids(detections, dx, dy) > 0)
+
+    def draw(self, frame, color=(255, 0, 255)):
+        cv2.polylines(frame, self.polygons, True, color, 2)
+        for name, points in zip(self.names, self.polygons):
+            x, y = points[0]
+            cv2.putText(frame, name, (int(x) + 4, int(y) + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
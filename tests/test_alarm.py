@@ -0,0 +1,91 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from src.alarm import AlarmZone, CentralAlarm, HttpBuzzer
+
+
+class FakeBuzzer:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.commands = []
+
+    def send(self, state):
+        self.commands.append(state)
+        if self.fail:
+            self.fail -= 1
+            return False
+        return True
+
+    def close(self):
+        pass
+
+
+def make_alarm(zones, violation_status):
+    alarm = CentralAlarm({'alarm_zones': []}, violation_status)
+    alarm.zones = zones
+    return alarm
+
+
+def test_zones_follow_only_their_cameras():
+    gate, yard = FakeBuzzer(), FakeBuzzer()
+    status = {0: False, 1: False}
+    alarm = make_alarm([AlarmZone("gate", gate, [0]), AlarmZone("yard", yard, [1])], status)
+    status[1] = True
+    alarm._update_zones()
+    assert gate.commands == [] and yard.commands == [True]
+    assert alarm.buzzer_state
+    status[1] = False
+    alarm._update_zones()
+    alarm._update_zones()
+    assert yard.commands == [True, False] and not alarm.buzzer_state
+
+
+def test_failed_command_is_retried_on_the_next_check():
+    buzzer = FakeBuzzer(fail=1)
+    status = {0: True}
+    zone = AlarmZone("default", buzzer)
+    alarm = make_alarm([zone], status)
+    alarm._update_zones()
+    assert buzzer.commands == [True] and not zone.buzzer_state
+    alarm._update_zones()
+    assert buzzer.commands == [True, True] and zone.buzzer_state
+    alarm._update_zones()
+    assert buzzer.commands == [True, True]
+
+
+def serve_buzzer(status):
+    paths = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            paths.append(self.path)
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, paths
+
+
+def test_http_buzzer_reports_whether_the_device_accepted_the_command():
+    for status, accepted in ((200, True), (404, False), (400, False)):
+        httpd, paths = serve_buzzer(status)
+        try:
+            buzzer = HttpBuzzer(f"127.0.0.1:{httpd.server_address[1]}", retries=0)
+            assert buzzer.send(True) is accepted
+            assert paths == ["/buzz_on"]
+            buzzer.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+def test_http_buzzer_fails_when_the_device_is_unreachable():
+    httpd, _ = serve_buzzer(200)
+    port = httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+    assert not HttpBuzzer(f"127.0.0.1:{port}", retries=0, timeout=0.5).send(False)
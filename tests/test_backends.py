@@ -0,0 +1,88 @@
+import numpy as np
+from src.backends import OnnxBackend, compare_detections
+from src.detections import Detections
+
+
+def dets(*rows):
+    return Detections.from_array(rows)
+
+
+def onnx_backend(imgsz=64, iou_threshold=0.45):
+    # Letterboxing and decoding only need the input size, not an ONNX Runtime session
+    backend = OnnxBackend.__new__(OnnxBackend)
+    backend.imgsz = imgsz
+    backend.iou_threshold = iou_threshold
+    return backend
+
+
+def prediction(*rows, num_classes=2):
+    """Raw (4 + num_classes, N) model output from (cx, cy, w, h, conf, class_id) rows."""
+    pred = np.zeros((4 + num_classes, len(rows)), dtype=np.float32)
+    for index, (cx, cy, w, h, conf, class_id) in enumerate(rows):
+        pred[:4, index] = cx, cy, w, h
+        pred[4 + class_id, index] = conf
+    return pred
+
+
+def test_letterbox_pads_a_wide_frame_top_and_bottom():
+    image, gain, pad_x, pad_y = onnx_backend()._letterbox(np.full((32, 64, 3), 7, dtype=np.uint8))
+    assert image.shape == (64, 64, 3)
+    assert (gain, pad_x, pad_y) == (1.0, 0, 16)
+    assert (image[:16] == 114).all() and (image[48:] == 114).all()
+    assert (image[16:48] == 7).all()
+
+
+def test_letterbox_scales_a_tall_frame_and_pads_left_and_right():
+    image, gain, pad_x, pad_y = onnx_backend()._letterbox(np.full((128, 64, 3), 7, dtype=np.uint8))
+    assert image.shape == (64, 64, 3)
+    assert (gain, pad_x, pad_y) == (0.5, 16, 0)
+    assert (image[:, :16] == 114).all() and (image[:, 48:] == 114).all()
+    assert (image[:, 16:48] == 7).all()
+
+
+def test_decode_maps_boxes_back_to_the_frame_and_applies_nms_per_class():
+    # A 64x128 frame letterboxed to 64: gain 0.5, 16 px of padding above and below
+    pred = prediction(
+        (20, 26, 10, 10, 0.9, 0),  # kept
+        (21, 26, 10, 10, 0.8, 0),  # overlaps the first box of its class: suppressed
+        (20, 26, 10, 10, 0.7, 1),  # same place, other class: kept
+        (40, 40, 10, 10, 0.3, 0),  # below the confidence threshold
+        (60, 20, 10, 10, 0.6, 0),  # crosses the frame's top and right edges: clipped
+    )
+    decoded = onnx_backend()._decode(pred, 0.5, (64, 128, 3), 0.5, 0, 16)
+    assert np.allclose(decoded.boxes, [[30, 10, 50, 30], [30, 10, 50, 30], [110, 0, 128, 18]])
+    assert np.allclose(decoded.confs, [0.9, 0.7, 0.6])
+    assert decoded.class_ids.tolist() == [0, 1, 0]
+
+
+def test_decode_without_confident_boxes_is_empty():
+    pred = prediction((20, 26, 10, 10, 0.3, 0))
+    assert len(onnx_backend()._decode(pred, 0.5, (64, 128, 3), 0.5, 0, 16)) == 0
+
+
+def test_identical_detections_agree_fully():
+    frames = [dets([0, 0, 10, 10, 0.9, 0], [20, 0, 30, 10, 0.8, 1]), dets([5, 5, 15, 15, 0.7, 0])]
+    report = compare_detections(frames, frames)
+    assert report["map"] == 1.0 and report["box_agreement"] == 1.0
+    assert np.isclose(report["mean_iou"], 1.0)
+    assert report["reference_boxes"] == report["candidate_boxes"] == 3
+
+
+def test_map_ranks_candidates_by_confidence():
+    reference = [dets([0, 0, 10, 10, 0.9, 0], [20, 0, 30, 10, 0.9, 0])]
+    # One box found, one missed, one false positive
+    confident_hit = [dets([0, 0, 10, 10, 0.9, 0], [50, 50, 60, 60, 0.8, 0])]
+    confident_miss = [dets([0, 0, 10, 10, 0.8, 0], [50, 50, 60, 60, 0.9, 0])]
+    report = compare_detections(reference, confident_hit)
+    assert np.isclose(report["map"], 0.5) and report["box_agreement"] == 0.5
+    report = compare_detections(reference, confident_miss)
+    assert np.isclose(report["map"], 0.25) and report["box_agreement"] == 0.5
+
+
+def test_boxes_only_match_the_same_class_above_the_iou_threshold():
+    reference = [dets([0, 0, 10, 10, 0.9, 0])]
+    assert compare_detections(reference, [dets([0, 0, 10, 10, 0.9, 1])])["box_agreement"] == 0.0
+    shifted = [dets([5, 0, 15, 10, 0.9, 0])]  # IoU 1/3
+    assert compare_detections(reference, shifted)["box_agreement"] == 0.0
+    report = compare_detections(reference, shifted, iou_threshold=0.3)
+    assert report["box_agreement"] == 1.0 and np.isclose(report["mean_iou"], 1 / 3)
@@ -0,0 +1,54 @@
+import threading
+from src import camera_manager
+from src.camera_manager import CameraManager
+from src.frame_store import LocalFrameStore
+
+
+def idle_camera_loop(cam_id, stream_url, detector_settings, shared_data):
+    shared_data['stop_events'][cam_id].wait()
+
+
+def make_manager(monkeypatch):
+    monkeypatch.setattr(camera_manager, 'camera_loop', idle_camera_loop)
+    shared_data = {'lock': threading.Lock(), 'violation_status': {}, 'roi_coords': {}, 'stop_events': {},
+                   'frame_store': LocalFrameStore()}
+    return CameraManager({}, shared_data)
+
+
+def test_apply_starts_only_changed_cameras(monkeypatch):
+    manager = make_manager(monkeypatch)
+    try:
+        assert manager.apply({0: "rtsp://a", 1: "rtsp://b"}) == ([0, 1], [])
+        first = manager.threads[0]
+        assert manager.apply({0: "rtsp://a", 1: "rtsp://c", 2: "rtsp://d"}) == ([1, 2], [])
+        assert manager.threads[0] is first
+        assert manager.running() == {0: "rtsp://a", 1: "rtsp://c", 2: "rtsp://d"}
+    finally:
+        manager.stop_all()
+
+
+def test_apply_stops_removed_cameras_and_drops_their_state(monkeypatch):
+    manager = make_manager(monkeypatch)
+    shared_data = manager.shared_data
+    try:
+        manager.apply({0: "rtsp://a", 1: "rtsp://b"})
+        shared_data['violation_status'][1] = True
+        shared_data['roi_coords'][1] = (0, 0, 10, 10)
+        assert manager.apply({0: "rtsp://a"}) == ([], [1])
+        assert 1 not in shared_data['violation_status'] and 1 not in shared_data['roi_coords']
+        assert shared_data['stop_events'][1].is_set()
+        assert manager.running() == {0: "rtsp://a"}
+    finally:
+        manager.stop_all()
+
+
+def test_dead_camera_is_restarted(monkeypatch):
+    manager = make_manager(monkeypatch)
+    try:
+        manager.apply({0: "rtsp://a"})
+        manager.shared_data['stop_events'][0].set()
+        manager.threads[0].join(timeout=2)
+        assert manager.apply({0: "rtsp://a"}) == ([0], [])
+        assert manager.running() == {0: "rtsp://a"}
+    finally:
+        manager.stop_all()
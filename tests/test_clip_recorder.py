@@ -0,0 +1,46 @@
+import numpy as np
+from src.clip_recorder import ClipRecorder
+
+SHAPE = (10, 10, 3)
+FRAME_BYTES = int(np.prod(SHAPE))
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def recorder(tmp_path, budget_frames):
+    return ClipRecorder(output_dir=str(tmp_path), record_fps=0, memory_budget_mb=budget_frames * FRAME_BYTES / (1024 * 1024))
+
+
+def queued(rec, cam_id):
+    return [int(item[3][0, 0, 0]) for item in rec._incoming if item[0] == 'frame' and item[1] == cam_id]
+
+
+def test_waiting_raw_frames_stay_within_the_camera_budget(tmp_path):
+    rec = recorder(tmp_path, 3)
+    rec.add_frame(1, frame(100))
+    for value in range(5):
+        rec.add_frame(0, frame(value))
+    rec.trigger(0)
+    # Only camera 0 pays for its backlog; camera 1 and the trigger are kept
+    assert queued(rec, 0) == [2, 3, 4]
+    assert queued(rec, 1) == [100]
+    assert rec.buffers[0].queued == 3 * FRAME_BYTES
+    assert rec.frames_dropped == 2
+    assert any(item[0] == 'trigger' for item in rec._incoming)
+    rec.stop()
+    rec.run()
+
+
+def test_compressed_frames_make_room_for_waiting_ones(tmp_path):
+    rec = recorder(tmp_path, 3)
+    rec.add_frame(0, frame(1))
+    rec.stop()
+    rec.run()
+    buffer = rec.buffers[0]
+    assert buffer.queued == 0 and len(buffer.frames) == 1
+    # With the whole budget taken by waiting raw frames, the next JPEG pushes out the older ones
+    buffer.queued = buffer.budget_bytes
+    buffer.append(buffer.frames[-1][0], b"x", 0.0)
+    assert list(buffer.frames) == []
@@ -0,0 +1,92 @@
+from cluster import ClusterCoordinator, plan_assignment
+
+
+def loads(assignment, costs, nodes):
+    load = {node: 0.0 for node in nodes}
+    for cam_id, node in assignment.items():
+        load[node] += costs[cam_id]
+    return {node: load[node] / capacity for node, capacity in nodes.items()}
+
+
+def test_first_assignment_spreads_cameras_by_capacity():
+    assignment = plan_assignment(range(6), {"a": 2, "b": 1}, {}, {})
+    assert sorted(assignment) == list(range(6))
+    assert list(assignment.values()).count("a") == 4
+
+
+def test_joining_node_takes_cameras_off_the_busiest_node():
+    current = {cam_id: "a" for cam_id in range(4)}
+    assignment = plan_assignment(range(4), {"a": 1, "b": 1}, current, {})
+    assert list(assignment.values()).count("b") == 2
+
+
+def test_cameras_of_a_departed_node_move_and_the_rest_stay():
+    current = {0: "a", 1: "a", 2: "b", 3: "b", 4: "c"}
+    assignment = plan_assignment(range(5), {"a": 1, "b": 1}, current, {})
+    assert all(assignment[cam_id] == current[cam_id] for cam_id in (0, 1, 2, 3))
+    assert assignment[4] in ("a", "b")
+
+
+def test_no_nodes_leaves_every_camera_unassigned():
+    assert plan_assignment(range(3), {}, {0: "a"}, {}) == {}
+
+
+def test_rebalance_moves_load_off_an_overloaded_node():
+    costs = {0: 0.9, 1: 0.2, 2: 0.2, 3: 0.2}
+    current = {0: "a", 1: "a", 2: "b", 3: "b"}
+    nodes = {"a": 1, "b": 1}
+    assignment = plan_assignment(range(4), nodes, current, costs)
+    assert assignment[0] == "a" and assignment[1] == "b"
+    assert max(loads(assignment, costs, nodes).values()) < max(loads(current, costs, nodes).values())
+
+
+def test_balanced_load_within_tolerance_is_left_alone():
+    costs = {0: 0.5, 1: 0.4, 2: 0.45}
+    current = {0: "a", 1: "b", 2: "b"}
+    assert plan_assignment(range(3), {"a": 1, "b": 1}, current, costs, tolerance=0.25) == current
+
+
+def test_pinned_cameras_are_not_moved_for_balance():
+    costs = {0: 0.9, 1: 0.2, 2: 0.2, 3: 0.2}
+    current = {0: "a", 1: "a", 2: "b", 3: "b"}
+    assert plan_assignment(range(4), {"a": 1, "b": 1}, current, costs, pinned={1}) == current
+
+
+def heartbeat(coordinator, node_id, now, busy=None):
+    cameras = {str(cam_id): {"busy": cost} for cam_id, cost in (busy or {}).items()}
+    reply = coordinator.heartbeat({"node_id": node_id, "capacity": 1, "cameras": cameras}, now=now)
+    return sorted(int(cam_id) for cam_id in reply["cameras"])
+
+
+def make_coordinator():
+    return ClusterCoordinator([f"rtsp://cam{i}" for i in range(4)], port=0, node_timeout_sec=5.0, rebalance_sec=30.0)
+
+
+def test_coordinator_reassigns_cameras_of_a_node_that_times_out():
+    coordinator = make_coordinator()
+    try:
+        assert heartbeat(coordinator, "a", 0.0) == [0, 1, 2, 3]
+        assert len(heartbeat(coordinator, "b", 1.0)) == 2
+        heartbeat(coordinator, "a", 4.0)
+        assert coordinator.expire_nodes(now=5.5) == []
+        assert coordinator.expire_nodes(now=7.0) == ["b"]
+        assert heartbeat(coordinator, "a", 7.0) == [0, 1, 2, 3]
+    finally:
+        coordinator.httpd.server_close()
+
+
+def test_coordinator_pins_recently_moved_cameras():
+    coordinator = make_coordinator()
+    try:
+        heartbeat(coordinator, "a", 0.0)
+        moved = heartbeat(coordinator, "b", 1.0)
+        # Right after the move the cameras on 'b' look expensive, but they stay put until measured there
+        heartbeat(coordinator, "b", 2.0, busy={cam_id: 0.9 for cam_id in moved})
+        heartbeat(coordinator, "a", 2.0, busy={cam_id: 0.1 for cam_id in range(4) if cam_id not in moved})
+        before = dict(coordinator.assignment)
+        coordinator.rebalance(now=30.0)
+        assert coordinator.assignment == before
+        coordinator.rebalance(now=62.0)
+        assert coordinator.assignment != before
+    finally:
+        coordinator.httpd.server_close()
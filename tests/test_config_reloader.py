@@ -0,0 +1,92 @@
+import threading
+from src import config_reloader
+from src.config_reloader import ConfigReloader, assign_camera_ids, camera_title, config_changes, needs_restart
+
+HELMET = {'detection_model': "Helmet detection", 'confidence_threshold': 0.5, 'camera_feeds': []}
+
+
+def test_assign_keeps_ids_of_unchanged_streams():
+    current = {0: "rtsp://a", 1: "rtsp://b", 2: "rtsp://c"}
+    assert assign_camera_ids(current, ["rtsp://c", "rtsp://a", "rtsp://b"]) == {2: 0, 0: 1, 1: 2}
+
+
+def test_assign_gives_new_streams_the_lowest_free_ids():
+    current = {0: "rtsp://a", 1: "rtsp://b", 3: "rtsp://d"}
+    assert assign_camera_ids(current, ["rtsp://d", "rtsp://x", "rtsp://y"]) == {3: 0, 0: 1, 1: 2}
+
+
+def test_assign_handles_duplicate_streams():
+    current = {0: "rtsp://a", 1: "rtsp://a"}
+    assert assign_camera_ids(current, ["rtsp://a", "rtsp://b", "rtsp://a"]) == {0: 0, 2: 1, 1: 2}
+    assert assign_camera_ids({}, ["rtsp://a", "rtsp://b"]) == {0: 0, 1: 1}
+
+
+def test_camera_title_falls_back_to_index():
+    config = {'camera_titles': ["Gate", ""]}
+    assert [camera_title(config, i) for i in range(3)] == ["Gate", "Camera 1", "Camera 2"]
+
+
+def test_config_changes_lists_changed_added_and_removed_keys():
+    old = {'confidence_threshold': 0.5, 'esp_ip': "10.0.0.2", 'camera_feeds': ["a"]}
+    new = {'confidence_threshold': 0.6, 'camera_feeds': ["a"], 'alarm_cooldown_sec': 3}
+    assert config_changes(old, new) == ['alarm_cooldown_sec', 'confidence_threshold', 'esp_ip']
+    assert config_changes(old, dict(old)) == []
+
+
+def test_needs_restart_only_when_violation_checking_flips():
+    assert needs_restart({'perform_violation_check': True}, {'perform_violation_check': False})
+    assert needs_restart({'perform_violation_check': False}, {'perform_violation_check': True})
+    assert not needs_restart({'perform_violation_check': True}, {'perform_violation_check': True})
+
+
+def make_reloader(tmp_path, config, detector_settings):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("{}")
+    shared_data = {'config': config, 'detector_settings': detector_settings, 'stop_events': {0: threading.Event()}}
+    run = {'shared_data': shared_data, 'config': config, 'detector_settings': detector_settings,
+           'alarm_system': None, 'restart': False}
+    return ConfigReloader(str(config_path), run)
+
+
+def fake_loader(monkeypatch, perform_violation_check):
+    loaded = []
+
+    def load_detector_from_config(config):
+        loaded.append(config['detection_model'])
+        return {'perform_violation_check': perform_violation_check, 'confidence': 0.5}, None
+
+    monkeypatch.setattr(config_reloader, 'load_detector_from_config', load_detector_from_config)
+    monkeypatch.setattr(config_reloader, 'warm_up_detector', lambda settings, config: None)
+    return loaded
+
+
+def test_threshold_change_is_applied_in_place(tmp_path, monkeypatch):
+    loaded = fake_loader(monkeypatch, True)
+    reloader = make_reloader(tmp_path, HELMET, {'perform_violation_check': True, 'confidence': 0.5})
+    assert reloader.apply(dict(HELMET, confidence_threshold=0.7))
+    run = reloader.run_state
+    assert loaded == [] and not run['restart']
+    assert run['shared_data']['detector_settings']['confidence'] == 0.7
+    assert run['shared_data']['config']['confidence_threshold'] == 0.7
+    assert not reloader.apply(dict(HELMET, confidence_threshold=0.7))
+
+
+def test_model_swap_keeping_violation_checking_is_applied(tmp_path, monkeypatch):
+    loaded = fake_loader(monkeypatch, True)
+    reloader = make_reloader(tmp_path, HELMET, {'perform_violation_check': True, 'confidence': 0.5})
+    new_config = dict(HELMET, pipeline_models=[{'model': "helmet"}])
+    assert reloader.apply(new_config)
+    assert loaded == ["Helmet detection"] and not reloader.run_state['restart']
+    assert reloader.run_state['detector_settings']['perform_violation_check']
+
+
+def test_model_swap_flipping_violation_checking_restarts(tmp_path, monkeypatch):
+    fake_loader(monkeypatch, False)
+    reloader = make_reloader(tmp_path, HELMET, {'perform_violation_check': True, 'confidence': 0.5})
+    assert reloader.apply(dict(HELMET, detection_model="Person Detection"))
+    run = reloader.run_state
+    assert run['restart'] and run['config']['detection_model'] == "Person Detection"
+    assert run['shared_data']['stop_events'][0].is_set()
+    # The running cameras keep the old settings until they stop
+    assert run['shared_data']['detector_settings']['perform_violation_check']
+    assert reloader.stop_event.is_set()
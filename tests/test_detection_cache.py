@@ -0,0 +1,144 @@
+import gc
+import multiprocessing
+import os
+import cv2
+import numpy as np
+from src.detection_cache import DetectionCache
+from src.detections import Detections
+
+RESOLUTION = [[48, 64], None]
+
+
+def write_video(path, frames=10):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 20 % 256, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def boxes(*confs):
+    return Detections.from_array([[i, i, i + 10, i + 10, conf, 0] for i, conf in enumerate(confs)])
+
+
+def test_detections_survive_a_new_cache_instance(tmp_path):
+    video = write_video(tmp_path / "clip.avi")
+    cache = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    segment = cache.open(video, RESOLUTION, 0.1)
+    assert cache.lookup(segment, 3, 0.5) is None
+    segment.put(3, boxes(0.9, 0.2), 0.1)
+    segment.put(4, Detections(), 0.1)
+
+    reopened = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    segment = reopened.open(video, RESOLUTION, 0.1)
+    assert segment.confidence_floor == 0.1
+    assert np.allclose(reopened.lookup(segment, 3, 0.5).confs, [0.9, 0.2])
+    assert len(reopened.lookup(segment, 4, 0.5)) == 0
+    assert (reopened.hits, reopened.misses) == (2, 0)
+
+
+def test_floor_above_the_threshold_is_a_miss(tmp_path):
+    video = write_video(tmp_path / "clip.avi")
+    cache = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    segment = cache.open(video, RESOLUTION, 0.3)
+    segment.put(0, boxes(0.9), 0.3)
+    assert cache.lookup(segment, 0, 0.3) is not None
+    assert cache.lookup(segment, 0, 0.2) is None
+    # A later run at a lower threshold finds the floor in the segment header
+    other = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    assert other.lookup(other.open(video, RESOLUTION, 0.05), 0, 0.05) is None
+
+
+def test_detections_found_above_the_floor_are_not_stored(tmp_path):
+    video = write_video(tmp_path / "clip.avi")
+    cache = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    segment = cache.open(video, RESOLUTION, 0.1)
+    segment.put(0, boxes(0.9), 0.5)
+    assert segment.get(0) is None
+    segment.put(0, boxes(0.9), 0.05)
+    assert segment.get(0) is not None
+
+
+def test_index_without_header_is_rebuilt(tmp_path):
+    video = write_video(tmp_path / "clip.avi")
+    cache = DetectionCache("model", cache_dir=str(tmp_path / "cache"))
+    base_path = cache.open(video, RESOLUTION, 0.1).base_path
+    with open(base_path + ".idx", "wb") as f:
+        np.zeros((10, 2), dtype=np.int64).tofile(f)
+    segment = DetectionCache("model", cache_dir=str(tmp_path / "cache")).open(video, RESOLUTION, 0.2)
+    assert segment.confidence_floor == 0.2
+    assert segment.get(0) is None
+
+
+def fill_segment(video, cache_dir, frames, barrier):
+    cache = DetectionCache("model", cache_dir=cache_dir)
+    barrier.wait()
+    segment = cache.open(video, RESOLUTION, 0.1)
+    for frame_index in frames:
+        segment.put(frame_index, boxes(0.5 + frame_index / 100), 0.1)
+    segment.index.flush()
+
+
+def test_processes_creating_the_same_segment_keep_each_others_entries(tmp_path):
+    video = write_video(tmp_path / "clip.avi")
+    cache_dir = str(tmp_path / "cache")
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(2)
+    workers = [context.Process(target=fill_segment, args=(video, cache_dir, frames, barrier))
+               for frames in (range(0, 10, 2), range(1, 10, 2))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    segment = DetectionCache("model", cache_dir=cache_dir).open(video, RESOLUTION, 0.1)
+    assert all(np.allclose(segment.get(i).confs, [0.5 + i / 100]) for i in range(10))
+    assert os.path.exists(segment.base_path + ".lock")
+
+
+def append_frames(video, cache_dir, frames, barrier):
+    segment = DetectionCache("model", cache_dir=cache_dir).open(video, RESOLUTION, 0.1)
+    barrier.wait()
+    for frame_index in frames:
+        segment.put(frame_index, boxes(*[0.5 + frame_index / 10000] * (1 + frame_index % 3)), 0.1)
+
+
+def test_processes_appending_to_one_segment_keep_their_rows_apart(tmp_path):
+    frame_count, processes = 2000, 4
+    video = write_video(tmp_path / "clip.avi", frames=frame_count)
+    cache_dir = str(tmp_path / "cache")
+    DetectionCache("model", cache_dir=cache_dir).open(video, RESOLUTION, 0.1)
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    workers = [context.Process(target=append_frames, args=(video, cache_dir, range(first, frame_count, processes), barrier))
+               for first in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    segment = DetectionCache("model", cache_dir=cache_dir).open(video, RESOLUTION, 0.1)
+    for frame_index in range(frame_count):
+        detections = segment.get(frame_index)
+        assert len(detections) == 1 + frame_index % 3
+        assert np.allclose(detections.confs, 0.5 + frame_index / 10000)
+
+
+def test_eviction_skips_segments_open_elsewhere(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = write_video(tmp_path / "first.avi")
+    second = write_video(tmp_path / "second.avi")
+    in_use = DetectionCache("model", cache_dir=cache_dir)
+    segment = in_use.open(first, RESOLUTION, 0.1)
+    segment.put(0, boxes(0.9), 0.1)
+    base_path = segment.base_path
+
+    # A second cache (another process, or the one a config reload builds) that is far over its size limit
+    DetectionCache("model", cache_dir=cache_dir, max_size_mb=0).open(second, RESOLUTION, 0.1)
+    assert os.path.exists(base_path + ".idx") and segment.get(0) is not None
+
+    del segment
+    in_use._segments.clear()
+    gc.collect()
+    DetectionCache("model", cache_dir=cache_dir, max_size_mb=0).open(second, RESOLUTION, 0.1)
+    assert not os.path.exists(base_path + ".idx") and not os.path.exists(base_path + ".dat")
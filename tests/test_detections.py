@@ -0,0 +1,79 @@
+import numpy as np
+from src.detections import ClassLookup, Detections, box_iou, non_max_suppression
+
+
+def test_from_array_and_to_array_round_trip():
+    data = np.array([[0, 0, 10, 10, 0.9, 1], [5, 5, 20, 20, 0.4, 0]], dtype=np.float32)
+    detections = Detections.from_array(data)
+    assert len(detections) == 2
+    assert detections.class_ids.dtype == np.int32
+    assert np.array_equal(detections.to_array(), data)
+
+
+def test_from_array_accepts_empty_input():
+    detections = Detections.from_array([])
+    assert len(detections) == 0
+    assert detections.to_array().shape == (0, 6)
+
+
+def test_filter_keeps_track_ids_aligned():
+    detections = Detections.from_array([[0, 0, 1, 1, 0.9, 0], [0, 0, 2, 2, 0.8, 1], [0, 0, 3, 3, 0.7, 2]])
+    detections.track_ids = np.array([7, 8, 9])
+    kept = detections.filter(detections.confs >= 0.8)
+    assert kept.track_ids.tolist() == [7, 8]
+    assert kept.class_ids.tolist() == [0, 1]
+
+
+def test_scale_and_offset():
+    detections = Detections.from_array([[10, 20, 30, 40, 0.5, 0]])
+    assert detections.scale(2, 0.5).boxes.tolist() == [[20, 10, 60, 20]]
+    assert detections.offset(5, -5).boxes.tolist() == [[15, 15, 35, 35]]
+
+
+def test_concatenate_skips_empty_parts():
+    a = Detections.from_array([[0, 0, 1, 1, 0.9, 0]])
+    b = Detections.from_array([[0, 0, 2, 2, 0.8, 3]])
+    assert Detections.concatenate([Detections(), a]) is a
+    merged = Detections.concatenate([a, Detections(), b])
+    assert merged.class_ids.tolist() == [0, 3]
+    assert len(Detections.concatenate([])) == 0
+
+
+def test_class_lookup_masks():
+    lookup = ClassLookup({0: "helmet", 1: "no_helmet", 3: "ignore"}, violation_classes=("no_helmet",))
+    assert lookup.names == ["helmet", "no_helmet", "2", "ignore"]
+    assert lookup.labels[1] == "NO_HELMET"
+    class_ids = np.array([0, 1, 3, 1])
+    assert lookup.violation_mask(class_ids).tolist() == [False, True, False, True]
+    assert lookup.ignore_mask(class_ids).tolist() == [False, False, True, False]
+
+
+def test_class_lookup_concat_follows_model_order():
+    person = ClassLookup(["person"])
+    helmet = ClassLookup(["helmet", "no_helmet"], violation_classes=("no_helmet",))
+    combined = ClassLookup.concat([person, helmet])
+    assert combined.names == ["person", "helmet", "no_helmet"]
+    assert combined.violation.tolist() == [False, False, True]
+
+
+def test_box_iou():
+    ious = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    assert np.allclose(ious, [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+
+def test_nms_suppresses_overlaps_and_orders_by_score():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    keep = non_max_suppression(boxes, np.array([0.6, 0.9, 0.8]), iou_threshold=0.5)
+    assert keep.tolist() == [1, 2]
+
+
+def test_nms_keeps_overlapping_boxes_of_different_classes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11]], dtype=np.float32)
+    keep = non_max_suppression(boxes, np.array([0.9, 0.8]), class_ids=np.array([0, 1]), iou_threshold=0.5)
+    assert keep.tolist() == [0, 1]
+
+
+def test_nms_respects_max_det_and_empty_input():
+    boxes = np.array([[i * 20, 0, i * 20 + 10, 10] for i in range(5)], dtype=np.float32)
+    assert len(non_max_suppression(boxes, np.ones(5), max_det=3)) == 3
+    assert non_max_suppression(np.zeros((0, 4)), np.zeros(0)).tolist() == []
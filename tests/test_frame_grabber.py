@@ -0,0 +1,49 @@
+import threading
+import numpy as np
+from src.frame_grabber import FrameGrabber
+
+
+def frame(value):
+    return np.full((2, 2, 3), value, dtype=np.uint8)
+
+
+def test_read_returns_newest_frame_and_counts_replaced_ones():
+    grabber = FrameGrabber(0, "rtsp://camera")
+    grabber._publish(frame(1), 0)
+    grabber._publish(frame(2), 1)
+    grabber._publish(frame(3), 2)
+    ok, latest = grabber.read(timeout=0.1)
+    assert ok and latest[0, 0, 0] == 3
+    assert grabber.frame_index == 2
+    assert grabber.frames_dropped == 2
+
+
+def test_frame_is_returned_only_once():
+    grabber = FrameGrabber(0, "rtsp://camera")
+    grabber._publish(frame(1), 0)
+    assert grabber.read(timeout=0.1)[0]
+    assert grabber.read(timeout=0.05) == (False, None)
+    assert grabber.frames_dropped == 0
+
+
+def test_consumed_frames_are_not_counted_as_dropped():
+    grabber = FrameGrabber(0, "rtsp://camera")
+    for index in range(4):
+        grabber._publish(frame(index), index)
+        assert grabber.read(timeout=0.1)[0]
+    assert grabber.frames_dropped == 0
+
+
+def test_read_wakes_up_on_publish_from_another_thread():
+    grabber = FrameGrabber(0, "rtsp://camera")
+    timer = threading.Timer(0.05, grabber._publish, args=(frame(9), 0))
+    timer.start()
+    ok, latest = grabber.read(timeout=2.0)
+    timer.join()
+    assert ok and latest[0, 0, 0] == 9
+
+
+def test_stop_releases_a_waiting_reader():
+    grabber = FrameGrabber(0, "rtsp://camera")
+    threading.Timer(0.05, grabber.stop).start()
+    assert grabber.read(timeout=2.0) == (False, None)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from src.frame_store import LocalFrameStore, SharedMemoryFrameStore
+
+SHAPE = (4, 6, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+class RacingBuffers:
+    """Frame buffers whose writer publishes a full ring of frames during every read."""
+    def __init__(self, store):
+        self.store = store
+        self.buffers = store.buffers
+
+    def __getitem__(self, key):
+        self.store.header[key[0], 0] += self.store.slots
+        return self.buffers[key]
+
+
+def test_local_store_publishes_in_place_and_numbers_frames():
+    store = LocalFrameStore()
+    assert store.latest(0) == (None, None, 0)
+    back = store.begin_write(0, SHAPE)
+    back[:] = 7
+    store.publish(0, back, roi_rect=(1, 1, 2, 2))
+    latest, roi, seq = store.latest(0)
+    assert seq == 1 and latest[0, 0, 0] == 7 and roi.shape == (2, 2, 3)
+    assert store.stats()["copies"] == 0
+    store.remove(0)
+    assert store.sequence(0) == 0
+
+
+def test_shared_store_reads_latest_frame_and_roi():
+    store = SharedMemoryFrameStore(1, frame_shape=SHAPE)
+    try:
+        assert store.latest(0) == (None, None, 0)
+        store.publish(0, frame(1))
+        store.publish(0, frame(2), roi_rect=(0, 0, 3, 2))
+        latest, roi, seq = store.latest(0)
+        assert seq == 2 and latest[0, 0, 0] == 2 and roi.shape == (2, 3, 3)
+    finally:
+        store.close()
+
+
+def test_shared_store_returns_last_good_frame_instead_of_a_torn_one():
+    store = SharedMemoryFrameStore(1, frame_shape=SHAPE)
+    try:
+        store.publish(0, frame(5))
+        assert store.latest(0)[2] == 1
+        store.publish(0, frame(6))
+        store.buffers = RacingBuffers(store)
+        latest, _, seq = store.latest(0)
+        assert seq == 1 and latest[0, 0, 0] == 5
+    finally:
+        store.buffers = store.buffers.buffers
+        store.close()
+
+
+def test_shared_store_without_a_good_frame_returns_nothing():
+    store = SharedMemoryFrameStore(1, frame_shape=SHAPE)
+    try:
+        store.publish(0, frame(5))
+        store.buffers = RacingBuffers(store)
+        assert store.latest(0) == (None, None, 0)
+    finally:
+        store.buffers = store.buffers.buffers
+        store.close()
+
+
+def test_shared_store_rejects_fewer_than_three_slots():
+    with pytest.raises(ValueError):
+        SharedMemoryFrameStore(1, frame_shape=SHAPE, slots=2)
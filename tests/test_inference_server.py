@@ -0,0 +1,54 @@
+import threading
+import numpy as np
+from src.detections import Detections
+from src.inference_server import InferenceServer, _InferenceRequest
+from src.metrics import SampleRecorder
+
+
+class FakeModel:
+    names = {0: "helmet"}
+
+    def __init__(self):
+        self.batches = []
+
+    def infer(self, frames, confidence):
+        self.batches.append(len(frames))
+        return [Detections.from_array([[0, 0, 4, 4, frame[0, 0, 0] / 255, 0]]) for frame in frames]
+
+
+def frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_cameras_share_one_forward_pass():
+    model = FakeModel()
+    server = InferenceServer(model, 0.5, max_batch_size=2, max_wait_ms=500)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    results = {}
+    cameras = [threading.Thread(target=lambda cam_id: results.update({cam_id: server.infer(cam_id, frame(100 + cam_id))}),
+                                args=(cam_id,)) for cam_id in range(2)]
+    try:
+        for camera in cameras:
+            camera.start()
+        for camera in cameras:
+            camera.join(timeout=5)
+    finally:
+        server.stop()
+        thread.join(timeout=2)
+    assert model.batches == [2]
+    assert np.allclose(results[1].confs, [101 / 255])
+
+
+def test_superseded_frame_is_answered_none_and_counted():
+    metrics = SampleRecorder()
+    server = InferenceServer(FakeModel(), 0.5, max_batch_size=4, max_wait_ms=10, metrics=metrics)
+    old, new = _InferenceRequest(0, frame(1)), _InferenceRequest(0, frame(2))
+    other = _InferenceRequest(1, frame(3))
+    server.requests.put(new)
+    server.requests.put(other)
+    batch = server._collect_batch(old)
+    assert batch == [new, other]
+    assert old.done.is_set() and old.detections is None
+    assert server.superseded == {0: 1}
+    assert metrics.gauge(0, 'inference_superseded') == 1
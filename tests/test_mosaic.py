@@ -0,0 +1,45 @@
+import numpy as np
+from src.frame_store import SharedMemoryFrameStore
+from src.mosaic import MosaicRenderer
+
+SHAPE = (48, 64, 3)
+
+
+class CountingStore(SharedMemoryFrameStore):
+    """Shared-memory store that counts the frames copied out by latest()."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def latest(self, cam_id):
+        self.reads += 1
+        return super().latest(cam_id)
+
+
+def test_only_cameras_with_new_frames_are_copied_and_redrawn():
+    store = CountingStore(3, frame_shape=SHAPE)
+    mosaic = MosaicRenderer(3, canvas_size=(320, 240))
+    try:
+        assert not mosaic.render(store) and store.reads == 0
+        for cam_id in range(3):
+            store.publish(cam_id, np.full(SHAPE, 50 * (cam_id + 1), dtype=np.uint8))
+        assert mosaic.render(store) and store.reads == 3 and mosaic.tiles_drawn == 3
+
+        assert not mosaic.render(store) and store.reads == 3
+        store.publish(1, np.full(SHAPE, 255, dtype=np.uint8))
+        assert mosaic.render(store) and store.reads == 4 and mosaic.tiles_drawn == 4
+    finally:
+        store.close()
+
+
+def test_overlay_marks_a_tile_for_redraw():
+    store = CountingStore(1, frame_shape=SHAPE)
+    mosaic = MosaicRenderer(1, canvas_size=(320, 240))
+    try:
+        store.publish(0, np.zeros(SHAPE, dtype=np.uint8))
+        mosaic.render(store)
+        mosaic.draw_rectangle(0, (0, 0), (10, 10), (0, 0, 255))
+        assert mosaic.render(store) and store.reads == 2
+        assert not mosaic.render(store) and store.reads == 2
+    finally:
+        store.close()
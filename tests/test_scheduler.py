@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from src.scheduler import InferenceScheduler
+
+
+def offer(scheduler, cam_id, fps, start, seconds, motion=False, violation=False):
+    """Offers frames at 'fps' for 'seconds' on the fake clock, inferring every admitted one."""
+    for i in range(int(fps * seconds)):
+        now = start + i / fps
+        inferred = scheduler.admit(cam_id, now=now)
+        if inferred:
+            scheduler.grant(cam_id, now=now)
+        scheduler.record(cam_id, inferred, motion=motion, violation=violation, now=now)
+
+
+def targets(scheduler):
+    return {cam_id: camera.target_fps for cam_id, camera in scheduler.cameras.items()}
+
+
+def test_every_camera_keeps_the_minimum_rate():
+    scheduler = InferenceScheduler(budget_fps=2.0, min_refresh_sec=2.0)
+    for cam_id in range(3):
+        offer(scheduler, cam_id, 30, 0.0, 1.0)
+    scheduler.rebalance(now=1.0)
+    rates = targets(scheduler)
+    assert all(rate >= 0.5 - 1e-9 for rate in rates.values())
+    assert sum(rates.values()) == pytest.approx(2.0)
+
+
+def test_starved_camera_is_forced_after_min_refresh():
+    scheduler = InferenceScheduler(budget_fps=1.0, min_refresh_sec=2.0)
+    assert scheduler.admit(0, now=0.0)
+    scheduler.grant(0, now=0.0)
+    scheduler.cameras[0].target_fps = 0.01
+    assert not scheduler.admit(0, now=1.0)
+    assert scheduler.admit(0, now=2.5)
+    scheduler.grant(0, now=2.5)
+    state = scheduler.snapshot()[0]
+    assert (state["granted"], state["deferred"], state["forced"]) == (2, 1, 1)
+
+
+def test_admitted_frame_that_is_not_inferred_keeps_the_slot():
+    scheduler = InferenceScheduler(budget_fps=10.0)
+    scheduler.admit(0, now=0.0)
+    scheduler.grant(0, now=0.0)
+    scheduler.cameras[0].target_fps = 2.0
+    # Admitted, but the motion gate skipped the frame: no grant
+    assert scheduler.admit(0, now=0.6)
+    # Motion starts on the next frame, which is still within the camera's share
+    assert scheduler.admit(0, now=0.7)
+    scheduler.grant(0, now=0.7)
+    state = scheduler.snapshot()[0]
+    assert (state["granted"], state["deferred"], state["forced"]) == (2, 0, 0)
+
+
+def test_spare_budget_is_split_by_priority_weight():
+    scheduler = InferenceScheduler(budget_fps=10.0, min_refresh_sec=2.0, violation_weight=4.0, quiet_weight=1.0)
+    offer(scheduler, 0, 30, 0.0, 1.0, violation=True)
+    offer(scheduler, 1, 30, 0.0, 1.0)
+    scheduler.rebalance(now=1.0)
+    assert scheduler.cameras[0].priority == 2 and scheduler.cameras[1].priority == 0
+    # 0.5 fps floor each, the remaining 9 fps split 4:1
+    assert targets(scheduler) == pytest.approx({0: 0.5 + 7.2, 1: 0.5 + 1.8})
+
+
+def test_priority_falls_back_after_the_hold_time():
+    scheduler = InferenceScheduler(motion_hold_sec=3.0)
+    offer(scheduler, 0, 10, 0.0, 1.0, motion=True)
+    scheduler.rebalance(now=1.0)
+    assert scheduler.cameras[0].priority == 1
+    scheduler.rebalance(now=5.0)
+    assert scheduler.cameras[0].priority == 0
+
+
+def test_rate_is_capped_at_offered_fps_and_the_rest_goes_to_others():
+    scheduler = InferenceScheduler(budget_fps=20.0, min_refresh_sec=2.0)
+    offer(scheduler, 0, 2, 0.0, 2.0)
+    offer(scheduler, 1, 30, 0.0, 2.0)
+    scheduler.rebalance(now=2.0)
+    assert targets(scheduler) == pytest.approx({0: 2.0, 1: 18.0})
+
+
+def test_allocation_stays_within_budget():
+    rng = np.random.default_rng(0)
+    scheduler = InferenceScheduler(budget_fps=15.0, min_refresh_sec=2.0)
+    for _ in range(200):
+        count = int(rng.integers(1, 12))
+        demands = {cam_id: float(rng.uniform(0, 30)) for cam_id in range(count)}
+        weights = {cam_id: float(rng.choice([1.0, 2.0, 4.0])) for cam_id in range(count)}
+        rates = scheduler._allocate(demands, weights)
+        assert sum(rates.values()) <= 15.0 + 1e-6
+        assert all(rates[cam_id] <= max(demands[cam_id], 0.5) + 1e-6 for cam_id in demands)
+        if sum(demands.values()) <= 15.0:
+            assert rates == pytest.approx(demands)
@@ -0,0 +1,53 @@
+import threading
+import numpy as np
+from src.frame_store import LocalFrameStore
+from src.stream_server import StreamServer
+
+
+def publish(store, cam_id, count, value):
+    for _ in range(count):
+        store.publish(cam_id, np.full((8, 8, 3), value, dtype=np.uint8))
+
+
+def start_encoder(server):
+    server.channels[0].viewers = 1
+    thread = threading.Thread(target=server._encode_loop, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_viewer_keeps_streaming_after_camera_restart():
+    store = LocalFrameStore()
+    server = StreamServer(store, 1, port=0, max_fps=100)
+    channel = server.channels[0]
+    publish(store, 0, 5, 10)
+    thread = start_encoder(server)
+    try:
+        jpeg, encoded = channel.wait_newer(0, timeout=2.0)
+        assert jpeg is not None and channel.seq == 5
+
+        # A restart under the same id and title numbers the frames from 0 again
+        store.remove(0)
+        publish(store, 0, 1, 200)
+        jpeg, newer = channel.wait_newer(encoded, timeout=2.0)
+        assert jpeg is not None and newer > encoded
+        assert channel.seq == 1
+    finally:
+        server.stop_event.set()
+        thread.join(timeout=2)
+        server.httpd.server_close()
+
+
+def test_set_titles_resets_restarted_cameras_in_place():
+    store = LocalFrameStore()
+    server = StreamServer(store, 2, port=0, titles=["Gate", "Yard"])
+    gate, yard = server.channels
+    gate.jpeg, gate.seq = b"old", 7
+    yard.jpeg, yard.seq = b"old", 3
+    server.set_titles(["Gate", "Yard", "Dock"], restarted=[0])
+    try:
+        assert server.channels[0] is gate and gate.jpeg is None and gate.seq == 0
+        assert yard.jpeg == b"old"
+        assert len(server.channels) == 3 and server.num_cameras == 3
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,69 @@
+import numpy as np
+from src.detections import Detections
+from src.tiling import TiledDetector, merge_detections, tile_starts
+
+
+def dets(*rows):
+    return Detections.from_array(rows)
+
+
+def test_tile_starts_cover_the_length_and_end_at_the_border():
+    assert tile_starts(500, 640, 0.2) == [0]
+    starts = tile_starts(1920, 640, 0.2)
+    assert starts[0] == 0 and starts[-1] == 1920 - 640
+    assert all(b - a <= 640 * 0.8 for a, b in zip(starts, starts[1:]))
+
+
+def test_border_cut_box_merges_with_the_full_box():
+    # The left tile ends at x=600 and cut the head; the right tile saw all of it
+    full = [560, 100, 640, 180, 0.9, 0]
+    cut = [560, 100, 600, 180, 0.7, 0]
+    merged = merge_detections(dets(full, cut), metric="ios")
+    assert np.allclose(merged.to_array(), [full])
+    # Plain IoU (0.5) misses the duplicate
+    assert len(merge_detections(dets(full, cut), metric="iou")) == 2
+
+
+def test_border_cut_boxes_of_different_classes_are_kept():
+    merged = merge_detections(dets([560, 100, 640, 180, 0.9, 0], [560, 100, 600, 180, 0.7, 1]))
+    assert len(merged) == 2
+
+
+def test_merge_is_fast_nms_not_greedy():
+    # b overlaps a, and c overlaps b but not a: greedy NMS keeps a and c, Fast NMS keeps only a
+    a = [0, 0, 10, 10, 0.9, 0]
+    b = [4, 0, 14, 10, 0.8, 0]
+    c = [9, 0, 19, 10, 0.7, 0]
+    merged = merge_detections(dets(a, b, c), iou_threshold=0.3, metric="iou")
+    assert np.allclose(merged.to_array(), [a])
+
+
+def test_detector_merges_an_object_split_across_tiles():
+    frame = np.zeros((100, 180, 3), dtype=np.uint8)
+    tiler = TiledDetector(tile_size=100, overlap=0.2, skip_static=False, include_full_frame=False)
+    tiles = tiler.tiles(frame.shape)
+    assert tiles == [(0, 0, 100, 100), (80, 0, 180, 100)]
+    object_box = (70, 20, 110, 60)
+
+    def infer(images):
+        results = []
+        for (x1, y1, x2, y2), image in zip(tiles, images):
+            assert image.shape[:2] == (y2 - y1, x2 - x1)
+            bx1, by1 = max(object_box[0], x1) - x1, max(object_box[1], y1) - y1
+            bx2, by2 = min(object_box[2], x2) - x1, min(object_box[3], y2) - y1
+            confidence = 0.9 if (x1, x2) == (80, 180) else 0.6
+            results.append(dets([bx1, by1, bx2, by2, confidence, 0]))
+        return results
+
+    merged = tiler.detect(frame, infer)
+    assert len(merged) == 1
+    assert merged.boxes[0].tolist() == [80, 20, 110, 60]
+    assert tiler.tiles_inferred == 2
+
+
+def test_full_frame_view_is_included_by_default():
+    frame = np.zeros((100, 180, 3), dtype=np.uint8)
+    tiler = TiledDetector(tile_size=100, skip_static=False)
+    shapes = []
+    tiler.detect(frame, lambda images: shapes.extend(image.shape[:2] for image in images) or [Detections()] * len(images))
+    assert shapes[-1] == (56, 100)
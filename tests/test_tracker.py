@@ -0,0 +1,107 @@
+import numpy as np
+from src.detections import Detections
+from src.tracker import SortTracker
+
+
+def dets(*boxes, class_id=0):
+    boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    return Detections(boxes, np.full(len(boxes), 0.9, dtype=np.float32), np.full(len(boxes), class_id, dtype=np.int32))
+
+
+def test_new_detections_start_tracks_with_increasing_ids():
+    tracker = SortTracker()
+    result = tracker.update(dets([0, 0, 10, 10], [50, 50, 60, 60]), [False, False])
+    assert result.detections.track_ids.tolist() == [1, 2]
+    assert not result.violations.any()
+    assert result.new_violations == []
+
+
+def test_track_keeps_its_id_across_frames():
+    tracker = SortTracker()
+    tracker.update(dets([0, 0, 10, 10]), [False])
+    result = tracker.update(dets([1, 0, 11, 10]), [False])
+    assert result.detections.track_ids.tolist() == [1]
+    assert len(tracker) == 1
+
+
+def test_violation_confirmed_after_streak_and_reported_once():
+    tracker = SortTracker(min_violation_frames=3)
+    box = [0, 0, 10, 10]
+    assert tracker.update(dets(box), [True]).new_violations == []
+    assert tracker.update(dets(box), [True]).new_violations == []
+    confirmed = tracker.update(dets(box), [True])
+    assert confirmed.new_violations == [1]
+    assert confirmed.violations.tolist() == [True]
+    again = tracker.update(dets(box), [True])
+    assert again.new_violations == []
+    assert again.violations.tolist() == [True]
+
+
+def test_broken_streak_does_not_confirm():
+    tracker = SortTracker(min_violation_frames=3)
+    box = [0, 0, 10, 10]
+    for violating in (True, True, False, True, True):
+        result = tracker.update(dets(box), [violating])
+    assert result.violations.tolist() == [False]
+
+
+def test_violation_clears_after_as_many_clean_frames():
+    tracker = SortTracker(min_violation_frames=2)
+    box = [0, 0, 10, 10]
+    tracker.update(dets(box), [True])
+    assert tracker.update(dets(box), [True]).violations.tolist() == [True]
+    assert tracker.update(dets(box), [False]).violations.tolist() == [True]
+    assert tracker.update(dets(box), [False]).violations.tolist() == [False]
+
+
+def test_single_frame_confirmation_reports_new_track():
+    tracker = SortTracker(min_violation_frames=1)
+    result = tracker.update(dets([0, 0, 10, 10]), [True])
+    assert result.new_violations == [1]
+
+
+def test_predict_carries_boxes_forward_without_aging():
+    tracker = SortTracker(max_age=1)
+    tracker.update(dets([0, 0, 10, 10]), [False])
+    for _ in range(5):
+        result = tracker.predict()
+        assert result.detections.track_ids.tolist() == [1]
+        assert result.new_violations == []
+    assert tracker.misses.tolist() == [0]
+
+
+def test_unmatched_track_hidden_then_dropped_after_max_age():
+    tracker = SortTracker(max_age=2)
+    tracker.update(dets([0, 0, 10, 10]), [False])
+    far = [200, 200, 210, 210]
+    result = tracker.update(dets(far), [False])
+    assert result.detections.track_ids.tolist() == [2]
+    assert len(tracker) == 2
+    tracker.update(dets(far), [False])
+    tracker.update(dets(far), [False])
+    assert tracker.ids.tolist() == [2]
+
+
+def test_greedy_matching_prefers_highest_iou():
+    tracker = SortTracker(iou_threshold=0.1)
+    tracker.update(dets([0, 0, 10, 10], [20, 0, 30, 10]), [False, False])
+    # The second box overlaps track 2 best, the first overlaps track 1 best
+    result = tracker.update(dets([19, 0, 29, 10], [1, 0, 11, 10]), [False, False])
+    ids = dict(zip(result.detections.boxes[:, 0].round().astype(int).tolist(), result.detections.track_ids.tolist()))
+    assert sorted(result.detections.track_ids.tolist()) == [1, 2]
+    assert ids[min(ids)] == 1
+
+
+def test_below_iou_threshold_starts_new_track():
+    tracker = SortTracker(iou_threshold=0.5)
+    tracker.update(dets([0, 0, 10, 10]), [False])
+    result = tracker.update(dets([8, 0, 18, 10]), [False])
+    assert result.detections.track_ids.tolist() == [2]
+
+
+def test_reset_drops_tracks():
+    tracker = SortTracker()
+    tracker.update(dets([0, 0, 10, 10]), [False])
+    tracker.reset()
+    assert len(tracker) == 0
+    assert len(tracker.predict().detections) == 0
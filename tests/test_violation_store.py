@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime
+import pytest
+from src.violation_store import ViolationStore, count_by_camera, query_violations
+
+DAY = datetime(2024, 5, 14).timestamp()
+HOUR = 3600.0
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "violations.db")
+    store = ViolationStore(path, batch_size=4, flush_interval_sec=0.05)
+    writer = threading.Thread(target=store.run)
+    writer.start()
+    # Camera 0 at 08:00, 09:00 and 10:00, camera 1 at 09:30 and the next day, camera 2 the day before
+    for cam_id, offset in ((0, 8), (0, 9), (0, 10), (1, 9.5), (1, 30), (2, -10)):
+        store.record(cam_id, (10.4, 20, 30, 40.6), confidence=0.8, class_name="no_helmet", track_id=cam_id + 1,
+                     evidence=f"violations/cam{cam_id}.jpg", timestamp=DAY + offset * HOUR)
+    store.stop()
+    writer.join(timeout=5)
+    assert (store.recorded, store.written, store.dropped) == (6, 6, 0)
+    return path
+
+
+def test_query_returns_events_in_range_newest_first(db_path):
+    events = query_violations(db_path, start=DAY, end=DAY + 24 * HOUR)
+    assert [(event['camera'], event['ts']) for event in events] == [
+        (0, DAY + 10 * HOUR), (1, DAY + 9.5 * HOUR), (0, DAY + 9 * HOUR), (0, DAY + 8 * HOUR)]
+    assert events[0]['x1'] == 10 and events[0]['y2'] == 40
+    assert events[0]['class_name'] == "no_helmet" and events[0]['evidence'] == "violations/cam0.jpg"
+
+
+def test_query_filters_by_camera_with_exclusive_end(db_path):
+    events = query_violations(db_path, camera=0, start=DAY + 9 * HOUR, end=DAY + 10 * HOUR, newest_first=False)
+    assert [event['ts'] for event in events] == [DAY + 9 * HOUR]
+    assert len(query_violations(db_path, limit=2)) == 2
+
+
+def test_count_by_camera(db_path):
+    assert count_by_camera(db_path) == {0: 3, 1: 2, 2: 1}
+    assert count_by_camera(db_path, start=DAY, end=DAY + 24 * HOUR) == {0: 3, 1: 1}
+
+
+def run_cli(*args):
+    result = subprocess.run([sys.executable, "-m", "src.violation_store", *args], capture_output=True, text=True,
+                            cwd=ROOT, check=True)
+    return result.stdout
+
+
+def test_cli_counts_and_query(db_path):
+    counts = json.loads(run_cli("--db", db_path, "counts", "--since", "2024-05-14", "--until", "2024-05-15", "--json"))
+    assert counts == {"0": 3, "1": 1}
+    events = json.loads(run_cli("--db", db_path, "query", "--camera", "1", "--json"))
+    assert [event['ts'] for event in events] == [DAY + 30 * HOUR, DAY + 9.5 * HOUR]
+    table = run_cli("--db", db_path, "query", "--since", "2024-05-14 09:15", "--until", "2024-05-15")
+    assert "Camera 1 | Track #2 | no_helmet 0.80" in table
+    assert table.strip().endswith("2 event(s)")
+
+
+def test_cli_rejects_a_missing_database(tmp_path):
+    result = subprocess.run([sys.executable, "-m", "src.violation_store", "--db", str(tmp_path / "none.db"), "counts"],
+                            capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode != 0 and "not found" in result.stderr